@@ -8,11 +8,18 @@ from app.config import config
 from .extensions import db, jwt, bcrypt, cors, limiter # <-- ADDED limiter
 from .api import api_bp
 from . import services
+from .password_hashing import password_hasher, PasswordHasherBusy
+from .json_provider import init_json_provider
+from .compression import init_compression
+from .sync import init_change_tracking
+from .outbox import init_outbox
+from .report_jobs import init_report_jobs
 # from .db_seeder import seed_static_recommendations # <-- REMOVED
 
 def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    init_json_provider(app) # <-- ADDED orjson/stdlib JSON provider
 
     # Extension initializations
     db.init_app(app)
@@ -24,7 +31,12 @@ def create_app(config_name='default'):
         origins = [o.strip() for o in origins.split(',') if o.strip()]
     cors.init_app(app, resources={r"/api/*": {"origins": origins}})
     limiter.init_app(app) # <-- ADDED limiter init
+    password_hasher.init_app(app)
     Migrate(app, db)
+    init_compression(app) # <-- ADDED gzip/brotli response compression
+    init_change_tracking() # <-- ADDED change log for delta sync
+    init_outbox(app) # <-- ADDED transactional outbox events
+    init_report_jobs(app) # <-- ADDED periodic report job sweep
     
     # --- Load ML Models ---
     with app.app_context():
@@ -53,6 +65,7 @@ def create_app(config_name='default'):
 
     # Import models to ensure they are registered
     from . import models
+    from . import tasks # <-- ADDED registers background job tasks
 
     # --- Add Logging ---
     if not app.debug and not app.testing:
@@ -74,22 +87,30 @@ def create_app(config_name='default'):
         app.logger.error(f"Internal Server Error: {e}", exc_info=True)
         return jsonify(error="Internal Server Error", message="An unexpected error occurred"), 500
     
+    @app.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy(e):
+        response = jsonify(error="Service Unavailable", message="Server is busy, please retry shortly")
+        response.headers['Retry-After'] = '2'
+        return response, 503
+
     @app.errorhandler(404)
     def not_found_error(e):
         # Use str(e) to get the default "Not Found" message or a custom one
         return jsonify(error="Not Found", message=str(e).replace("404 Not Found: ", "")), 404
 
-    # --- JWT Blocklist callback (DB-backed) ---
-    from app.models import TokenBlocklist
+    # --- JWT Blocklist callback (in-memory cache in front of the DB table) ---
+    from app.token_revocation import revocation_cache
     from flask_jwt_extended import JWTManager
 
+    revocation_cache.init_app(app)
+
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
         try:
             jti = jwt_payload.get('jti')
             if not jti:
                 return False
-            return db.session.query(TokenBlocklist.id).filter(TokenBlocklist.jti == jti).first() is not None
+            return revocation_cache.is_revoked(jti)
         except Exception:
             # Fail closed: if error occurs, treat as revoked
             return True
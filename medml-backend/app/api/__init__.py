@@ -13,5 +13,9 @@ from . import (
     dashboard, 
     consultations,
     reports,
+    exports,
+    sync,
+    uploads,
+    jobs,
     # errors # <-- This module can be added for global API error handling
 )
\ No newline at end of file
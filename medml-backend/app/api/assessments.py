@@ -8,16 +8,51 @@ from app.schemas import (
     DiabetesAssessmentSchema, LiverAssessmentSchema, 
     HeartAssessmentSchema, MentalHealthAssessmentSchema
 )
-from app.api.decorators import admin_required, get_current_admin_id
+from app.api.decorators import admin_required, get_current_admin_id, parse_jwt_identity
+from app.idempotency import IdempotentRequest, IdempotencyKeyReused
+from app.tasks import schedule_auto_scoring
+from app.pagination import encode_cursor, decode_cursor, parse_datetime_arg, parse_limit_arg, page_response
 from pydantic import ValidationError
 from flask_jwt_extended import jwt_required
-from .responses import created, unprocessable_entity, server_error, ok
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
+from .responses import created, unprocessable_entity, server_error, ok, bad_request, forbidden
+
+# Assessment type -> (model, request schema)
+ASSESSMENT_TYPES = {
+    "diabetes": (DiabetesAssessment, DiabetesAssessmentSchema),
+    "liver": (LiverAssessment, LiverAssessmentSchema),
+    "heart": (HeartAssessment, HeartAssessmentSchema),
+    "mental_health": (MentalHealthAssessment, MentalHealthAssessmentSchema),
+}
+
+# Assessment type -> (model, Patient relationship)
+ASSESSMENT_HISTORY = {
+    "diabetes": (DiabetesAssessment, "diabetes_assessments"),
+    "liver": (LiverAssessment, "liver_assessments"),
+    "heart": (HeartAssessment, "heart_assessments"),
+    "mental_health": (MentalHealthAssessment, "mental_health_assessments"),
+}
 
 def _create_assessment(patient_id, AssessmentModel, SchemaModel):
     """
     Internal helper function to CREATE a new assessment for a patient.
     This supports the 1:N history requirement from the SRD.
+    A retried request with the same Idempotency-Key replays the first response.
     """
+    updater_id = get_current_admin_id()
+
+    # --- ADDED: Replay a retried request instead of inserting a duplicate ---
+    try:
+        idempotent = IdempotentRequest.from_request(f"admin:{updater_id}")
+        replay = idempotent.stored_response() if idempotent else None
+    except ValueError as e:
+        return bad_request(str(e))
+    except IdempotencyKeyReused as e:
+        return unprocessable_entity(message=str(e))
+    if replay is not None:
+        return replay
+
     patient = Patient.query.get_or_404(patient_id)
     
     try:
@@ -27,33 +62,51 @@ def _create_assessment(patient_id, AssessmentModel, SchemaModel):
         return unprocessable_entity(messages=e.errors())
 
     # --- UPDATED: Always create a new assessment ---
-    assessment = AssessmentModel(patient_id=patient_id, **data.model_dump())
-    
-    # Audit: set assessor to current admin
-    updater_id = get_current_admin_id()
-    if hasattr(assessment, 'assessed_by_admin_id'):
-        assessment.assessed_by_admin_id = updater_id
+    assessment = build_assessment(patient_id, AssessmentModel, data, updater_id)
         
     db.session.add(assessment)
     message = f"{AssessmentModel.__name__} created successfully"
 
     try:
+        db.session.flush()
+        body = {
+            "message": message,
+            "assessment": assessment.to_dict(),
+        }
+        if idempotent:
+            idempotent.remember(201, body)
+        # --- ADDED: Debounced background re-scoring (AUTO_SCORE_ENABLED) ---
+        schedule_auto_scoring(patient_id, parse_jwt_identity())
         db.session.commit()
-        current_app.logger.info(f"{message} for patient {patient_id} by admin {get_current_admin_id()}")
+        current_app.logger.info(f"{message} for patient {patient_id} by admin {updater_id}")
         
-        # Prediction is now handled by a separate call
+        # Prediction is handled by a separate call, or by auto-scoring when enabled
         
         # Return the newly created assessment
-        return created({
-            "message": message,
-            "assessment": assessment.to_dict(),
-        })
+        return created(body)
         
+    except IntegrityError:
+        db.session.rollback()
+        # A concurrent retry with the same key may have won the race
+        replay = idempotent.stored_response() if idempotent else None
+        if replay is not None:
+            return replay
+        current_app.logger.error(f"IntegrityError saving {AssessmentModel.__name__} for patient {patient_id}")
+        return server_error()
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error saving {AssessmentModel.__name__} for patient {patient_id}: {e}")
         return server_error()
 
+
+def build_assessment(patient_id, AssessmentModel, data, admin_id):
+    """New (unsaved) assessment from validated data."""
+    assessment = AssessmentModel(patient_id=patient_id, **data.model_dump())
+    # Audit: set assessor to current admin
+    if hasattr(assessment, 'assessed_by_admin_id'):
+        assessment.assessed_by_admin_id = admin_id
+    return assessment
+
 # --- Public API Endpoints ---
 
 @api_bp.route('/patients/<int:patient_id>/assessments/diabetes', methods=['POST'])
@@ -108,4 +161,58 @@ def get_all_assessments(patient_id):
         "mental_health": [a.to_dict() for a in patient.mental_health_assessments],
     }
     
-    return ok({"patient_id": patient_id, "assessments": assessments_data})
\ No newline at end of file
+    return ok({"patient_id": patient_id, "assessments": assessments_data})
+
+
+# --- ADDED: Paginated per-type history ---
+@api_bp.route('/patients/<int:patient_id>/assessments/<any(diabetes, liver, heart, mental_health):assessment_type>/history', methods=['GET'])
+@jwt_required()
+def get_assessment_history(patient_id, assessment_type):
+    """
+    [Admin/Patient] Gets one page of a patient's history for one assessment type, newest first.
+    Query params: limit, cursor (the previous page's next_cursor), since, until.
+    Patient can only access their own.
+    """
+    jwt_identity = parse_jwt_identity()
+    if jwt_identity.get('role') == 'patient' and jwt_identity.get('id') != patient_id:
+        return forbidden("Patients can only access their own data")
+
+    AssessmentModel, relationship = ASSESSMENT_HISTORY[assessment_type]
+    patient = Patient.query.get_or_404(patient_id)
+
+    try:
+        limit = parse_limit_arg(request.args)
+        since = parse_datetime_arg(request.args, 'since')
+        until = parse_datetime_arg(request.args, 'until')
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        if cursor is not None and (len(cursor) != 1 or not isinstance(cursor[0], int)):
+            raise ValueError("Invalid cursor")
+    except ValueError as e:
+        return bad_request(str(e))
+
+    # The dynamic relationship is already scoped to the patient and ordered by
+    # assessed_at desc; id breaks ties between assessments saved in the same second.
+    query = getattr(patient, relationship).order_by(AssessmentModel.id.desc())
+    if since:
+        query = query.filter(AssessmentModel.assessed_at >= since)
+    if until:
+        query = query.filter(AssessmentModel.assessed_at <= until)
+    if cursor:
+        # Compare against the stored timestamp of the cursor row so the
+        # keyset matches SQLite's own datetime text exactly
+        cursor_id = cursor[0]
+        cursor_ts = db.session.query(AssessmentModel.assessed_at).filter(
+            AssessmentModel.id == cursor_id
+        ).scalar_subquery()
+        query = query.filter(tuple_(AssessmentModel.assessed_at, AssessmentModel.id) < tuple_(cursor_ts, cursor_id))
+
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1].id) if rows else None
+
+    return ok({
+        "patient_id": patient_id,
+        "assessment_type": assessment_type,
+        **page_response([a.to_dict() for a in rows], has_more, next_cursor),
+    })
@@ -14,7 +14,9 @@ from flask_jwt_extended import (
     get_jti
 )
 from .decorators import parse_jwt_identity
-from datetime import datetime # Added
+from datetime import datetime, timezone # Added
+from app.token_revocation import revoke_token
+from app.projections import wants_projection, parse_projection_args, load_patient_projection, project_patient
 from .responses import (
     ok,
     created,
@@ -30,6 +32,22 @@ from .responses import (
 # Rate limiting to login endpoints
 LOGIN_LIMIT = "10 per minute"
 
+def _upgrade_password_hash(account, password):
+    """Transparently rehashes with the current BCRYPT_LOG_ROUNDS after a successful login."""
+    try:
+        if account.rehash_password_if_needed(password):
+            db.session.commit()
+            current_app.logger.info(f"Upgraded password hash for {account.__class__.__name__} {account.id}")
+    except Exception as e:
+        # Never block a valid login on the upgrade; it is retried next time
+        db.session.rollback()
+        current_app.logger.warning(f"Password rehash failed for {account.__class__.__name__} {account.id}: {e}")
+
+def _token_expiry(jwt_payload):
+    """Token 'exp' claim as a naive UTC datetime (blocklist timestamps are UTC)."""
+    exp = jwt_payload.get("exp")
+    return datetime.fromtimestamp(exp, timezone.utc).replace(tzinfo=None) if exp else None
+
 @api_bp.route('/auth/admin/register', methods=['POST'])
 @limiter.limit("5 per hour") # Stricter limit for registration
 def register_admin():
@@ -93,6 +111,7 @@ def login_admin():
         user = User.query.filter_by(email=username_or_email).first()
 
     if user and user.check_password(password):
+        _upgrade_password_hash(user, password)
         # Create token with role identity
         identity = {"id": user.id, "role": user.role, "name": user.name}
         access_token = create_access_token(identity=identity)
@@ -124,6 +143,7 @@ def login_patient():
     patient = Patient.query.filter_by(abha_id=data.abha_id).first()
 
     if patient and patient.check_password(data.password):
+        _upgrade_password_hash(patient, data.password)
         # Create token with role identity
         identity = {"id": patient.id, "role": "patient", "name": patient.name}
         access_token = create_access_token(identity=identity)
@@ -150,11 +170,10 @@ def refresh():
     """
     try:
         identity = parse_jwt_identity()
-        current_jti = get_jwt().get('jti')
+        jwt_payload = get_jwt()
         
         # Blocklist the used refresh token
-        db.session.add(TokenBlocklist(jti=current_jti, token_type='refresh', user_id=identity.get('id')))
-        db.session.commit()
+        revoke_token(jwt_payload.get('jti'), 'refresh', identity.get('id'), _token_expiry(jwt_payload))
 
         # Create new tokens
         access_token = create_access_token(identity=identity)
@@ -176,11 +195,9 @@ def logout():
     jwt_payload = get_jwt()
     jti = jwt_payload.get("jti")
     token_type = jwt_payload.get("type", "access")
-    expires = datetime.fromtimestamp(jwt_payload.get("exp"))
     identity = parse_jwt_identity() or {}
     try:
-        db.session.add(TokenBlocklist(jti=jti, token_type=token_type, user_id=identity.get('id'), expires_at=expires))
-        db.session.commit()
+        revoke_token(jti, token_type, identity.get('id'), _token_expiry(jwt_payload))
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Failed to revoke token: {e}")
@@ -208,6 +225,17 @@ def get_me():
                 return not_found("User not found")
             return ok(user.to_dict())
         elif user_role == 'patient':
+            # --- ADDED: Sparse fieldsets (?fields=...&include=...) ---
+            if wants_projection(request.args):
+                try:
+                    fields, includes = parse_projection_args(request.args)
+                except ValueError as e:
+                    return bad_request(str(e))
+                patient = load_patient_projection(user_id, fields, includes)
+                if not patient:
+                    return not_found("Patient not found")
+                return ok(project_patient(patient, fields, includes))
+
             patient = Patient.query.get(user_id)
             if not patient:
                 return not_found("Patient not found")
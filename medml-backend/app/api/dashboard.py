@@ -1,14 +1,18 @@
 # HealthCare App/medml-backend/app/api/dashboard.py
-from flask import jsonify, current_app
+from flask import jsonify, current_app, request
 from . import api_bp
 from app.models import Patient, RiskPrediction
 from app.extensions import db
 from app.extensions import limiter
 from app.api.decorators import admin_required
+from app.password_hashing import password_hasher
+from app.rollups import GROUP_DIMENSIONS, query_rollups
+from app.trends import DISEASES
+from app.pagination import parse_datetime_arg
 from flask_jwt_extended import jwt_required
 from sqlalchemy import func, cast, Date
 from datetime import date
-from .responses import ok, server_error
+from .responses import ok, server_error, bad_request
 
 @api_bp.route('/dashboard/stats', methods=['GET']) # Renamed route
 @jwt_required()
@@ -80,4 +84,55 @@ def get_dashboard_stats(): # Renamed function
 
     except Exception as e:
         current_app.logger.error(f"Error fetching dashboard stats: {e}")
-        return server_error()
\ No newline at end of file
+        return server_error()
+
+
+@api_bp.route('/dashboard/password-hashing', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_password_hashing_metrics():
+    """
+    [Admin Only] Queue depth and latency metrics of the password hashing pool.
+    """
+    return ok(password_hasher.metrics())
+
+
+# --- ADDED: State/facility risk analytics from rollups ---
+@api_bp.route('/dashboard/rollups', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_risk_rollups():
+    """
+    [Admin Only] Prediction counts by risk level, aggregated from the rollup tables.
+    Query params: group_by (comma-separated: week, state, facility, disease,
+    risk_level; default disease,risk_level), disease, risk_level, state,
+    facility, from, to.
+    """
+    group_by = [g.strip() for g in request.args.get('group_by', 'disease,risk_level').split(',') if g.strip()]
+    unknown = set(group_by) - set(GROUP_DIMENSIONS)
+    if unknown:
+        return bad_request(f"Unknown group_by dimensions: {', '.join(sorted(unknown))}")
+
+    disease = request.args.get('disease')
+    if disease and disease not in DISEASES:
+        return bad_request(f"Unknown disease: {disease}")
+    risk_level = request.args.get('risk_level')
+    if risk_level and risk_level not in ('Low', 'Medium', 'High'):
+        return bad_request(f"Unknown risk level: {risk_level}")
+
+    try:
+        week_from = parse_datetime_arg(request.args, 'from')
+        week_to = parse_datetime_arg(request.args, 'to')
+    except ValueError as e:
+        return bad_request(str(e))
+
+    rows = query_rollups(
+        group_by=group_by,
+        disease=disease,
+        risk_level=risk_level,
+        state_name=request.args.get('state'),
+        facility_name=request.args.get('facility'),
+        week_from=week_from,
+        week_to=week_to,
+    )
+    return ok({"group_by": group_by, "rows": rows})
@@ -0,0 +1,99 @@
+# HealthCare App/medml-backend/app/api/exports.py
+from flask import request, current_app, Response, stream_with_context
+from . import api_bp
+from app.exports import (
+    EXPORT_TABLES,
+    EXPORT_FORMATS,
+    ExportUnavailable,
+    require_pyarrow,
+    current_watermark,
+    count_rows,
+    stream_columnar_export,
+    DIRECTORY_FORMATS,
+    directory_select,
+    stream_directory,
+)
+from app.api.decorators import admin_required
+from flask_jwt_extended import jwt_required
+from datetime import datetime
+from .responses import bad_request, server_error, not_acceptable
+
+@api_bp.route('/exports/<table>', methods=['GET'])
+@jwt_required()
+@admin_required
+def export_table(table):
+    """
+    [Admin Only] Streams an assessment table or risk_predictions, joined to
+    patient demographics, as Parquet (default) or an Arrow IPC stream.
+    Query params: format (parquet|arrow), since_id (watermark of the previous export).
+    The X-Export-Watermark header is the since_id to use next time.
+    """
+    model = EXPORT_TABLES.get(table)
+    if model is None:
+        return bad_request(f"Unknown table. Choose from: {', '.join(EXPORT_TABLES)}")
+
+    fmt = request.args.get('format', 'parquet')
+    if fmt not in EXPORT_FORMATS:
+        return bad_request(f"'format' must be one of: {', '.join(EXPORT_FORMATS)}")
+
+    since_id = request.args.get('since_id')
+    if since_id is not None:
+        if not since_id.isdigit():
+            return bad_request("'since_id' must be a non-negative integer")
+        since_id = int(since_id)
+
+    try:
+        require_pyarrow()
+    except ExportUnavailable as e:
+        current_app.logger.error(str(e))
+        return server_error(str(e))
+
+    watermark = current_watermark(model)
+    rows = count_rows(model, since_id, watermark)
+    mimetype, extension = EXPORT_FORMATS[fmt]
+
+    response = Response(
+        stream_with_context(stream_columnar_export(
+            model, fmt, since_id=since_id, watermark=watermark,
+            batch_rows=current_app.config.get('EXPORT_BATCH_ROWS', 50000),
+        )),
+        mimetype=mimetype,
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{table}_{since_id or 0}_{watermark}.{extension}"'
+    response.headers['X-Export-Watermark'] = str(watermark)
+    response.headers['X-Export-Rows'] = str(rows)
+    return response
+
+
+@api_bp.route('/patients/export', methods=['GET'])
+@jwt_required()
+@admin_required
+def export_patient_directory():
+    """
+    [Admin Only] Streams the patient directory with each patient's latest risk
+    levels, as NDJSON (Accept: application/x-ndjson) or CSV (Accept: text/csv).
+    Query params: format (ndjson|csv, overrides Accept), state, facility.
+    """
+    fmt = request.args.get('format')
+    if fmt:
+        if fmt not in DIRECTORY_FORMATS.values():
+            return bad_request(f"'format' must be one of: {', '.join(DIRECTORY_FORMATS.values())}")
+    else:
+        mimetype = request.accept_mimetypes.best_match(list(DIRECTORY_FORMATS))
+        if not mimetype:
+            return not_acceptable(f"Supported types: {', '.join(DIRECTORY_FORMATS)}")
+        fmt = DIRECTORY_FORMATS[mimetype]
+    mimetype = next(m for m, f in DIRECTORY_FORMATS.items() if f == fmt)
+
+    query = directory_select(
+        state_name=request.args.get('state'),
+        facility_name=request.args.get('facility'),
+    )
+    # Directory rows are small; keep chunks to a few MB
+    batch_rows = min(current_app.config.get('EXPORT_BATCH_ROWS', 50000), 5000)
+
+    response = Response(stream_with_context(stream_directory(query, fmt, batch_rows)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename="patient_directory_{datetime.now().strftime("%Y%m%d_%H%M")}.{fmt}"'
+    )
+    return response
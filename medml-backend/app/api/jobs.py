@@ -0,0 +1,87 @@
+# HealthCare App/medml-backend/app/api/jobs.py
+import math
+from flask import request
+from . import api_bp
+from app.models import BackgroundJob
+from app.jobs import LANES, get_job, wait_for_job, cancel_job, queue_stats
+from app.api.decorators import admin_required, parse_jwt_identity
+from flask_jwt_extended import jwt_required
+from .responses import ok, bad_request, not_found, conflict
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+
+
+def _can_access_job(job, jwt_identity):
+    if jwt_identity.get('role') == 'patient':
+        return job.patient_id is not None and job.patient_id == jwt_identity.get('id')
+    return True
+
+
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job_status(job_id):
+    """
+    [Admin/Patient] Returns the status (and, once succeeded, the result) of a
+    background job. Pass ?wait=<seconds> (max 30) to block until it finishes.
+    Patients can only see jobs for their own record.
+    """
+    jwt_identity = parse_jwt_identity()
+
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        return bad_request("wait must be a number of seconds")
+    if not math.isfinite(wait):
+        return bad_request("wait must be a finite number of seconds")
+    wait = min(max(wait, 0), 30)
+
+    job = wait_for_job(job_id, wait) if wait else get_job(job_id)
+    if not job or not _can_access_job(job, jwt_identity):
+        return not_found("Job not found")
+    return ok(job.to_dict())
+
+
+@api_bp.route('/jobs', methods=['GET'])
+@jwt_required()
+@admin_required
+def list_jobs():
+    """
+    [Admin Only] Lists recent background jobs, newest first, with queue
+    counts per lane and status.
+    Query params: status, task, lane, patient_id, limit (default 50, max 200).
+    """
+    query = BackgroundJob.query
+    status = request.args.get('status')
+    if status:
+        if status not in JOB_STATUSES:
+            return bad_request(f"status must be one of: {', '.join(JOB_STATUSES)}")
+        query = query.filter(BackgroundJob.status == status)
+    lane = request.args.get('lane')
+    if lane:
+        if lane not in LANES:
+            return bad_request(f"lane must be one of: {', '.join(LANES)}")
+        query = query.filter(BackgroundJob.lane == lane)
+    if request.args.get('task'):
+        query = query.filter(BackgroundJob.task == request.args['task'])
+    patient_id = request.args.get('patient_id', type=int)
+    if patient_id is not None:
+        query = query.filter(BackgroundJob.patient_id == patient_id)
+
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    jobs = query.order_by(BackgroundJob.created_at.desc()).limit(limit).all()
+    return ok({"data": [job.to_dict() for job in jobs], "stats": queue_stats()})
+
+
+@api_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+@jwt_required()
+@admin_required
+def cancel_background_job(job_id):
+    """
+    [Admin Only] Cancels a job that has not started yet.
+    """
+    job = get_job(job_id)
+    if not job:
+        return not_found("Job not found")
+    if not cancel_job(job):
+        return conflict(f"Job can no longer be cancelled (status: {job.status})")
+    return ok({"message": "Job cancelled", "job": job.to_dict()})
@@ -4,6 +4,16 @@ from . import api_bp
 from app.models import Patient, User, RiskPrediction
 from app.extensions import limiter, db
 from app.schemas import PatientCreateSchema, PatientUpdateSchema
+from app.projections import wants_projection, parse_projection_args, load_patient_projection, project_patient
+from app.pagination import encode_cursor, decode_cursor, parse_datetime_arg, parse_limit_arg, page_response
+from app.timeline import EVENT_TYPES, timeline_page
+from app.trends import BUCKETS, risk_trend
+from app.rollups import move_patient_rollups
+from app.directory import RISK_LEVELS, DEFAULT_DIRECTORY_SORT, parse_directory_sort, directory_query, directory_page, directory_count
+from app.reporting import DISEASE_KEYS
+from app.api.recommendations import recommendations_for
+from app.conditional import patient_version, not_modified, add_validators
+from app.idempotency import IdempotentRequest, IdempotencyKeyReused
 from app.api.decorators import admin_required, get_current_admin_id, parse_jwt_identity
 from pydantic import ValidationError
 from flask_jwt_extended import jwt_required, get_jwt_identity
@@ -27,7 +37,23 @@ from .responses import (
 def create_patient():
     """
     [Admin Only] Creates a new patient record.
+    Send an Idempotency-Key header to make retries safe.
     """
+    admin_id = get_current_admin_id()
+    if not admin_id:
+        return unauthorized("Admin ID not found")
+
+    # --- ADDED: Replay a retried request instead of creating it again ---
+    try:
+        idempotent = IdempotentRequest.from_request(f"admin:{admin_id}")
+        replay = idempotent.stored_response() if idempotent else None
+    except ValueError as e:
+        return bad_request(str(e))
+    except IdempotencyKeyReused as e:
+        return unprocessable_entity(message=str(e))
+    if replay is not None:
+        return replay
+
     try:
         current_app.logger.info(f"Received patient data: {request.json}")
         data = PatientCreateSchema(**request.json)
@@ -36,39 +62,28 @@ def create_patient():
         current_app.logger.error(f"Validation error: {e.errors()}")
         return unprocessable_entity(messages=e.errors())
     
-    admin_id = get_current_admin_id()
-    if not admin_id:
-        return unauthorized("Admin ID not found")
-    
     if Patient.query.filter_by(abha_id=data.abha_id).first():
         return conflict("Patient with this ABHA ID already exists")
 
-    new_patient = Patient(
-        name=data.name, # Updated from full_name
-        age=data.age,
-        gender=data.gender,
-        height=data.height, # Updated from height_cm
-        weight=data.weight, # Updated from weight_kg
-        abha_id=data.abha_id,
-        state_name=data.state_name,
-        created_by_admin_id=admin_id # Updated from created_by_user_id
-    )
-    new_patient.set_password(data.password) 
+    new_patient = build_patient(data, admin_id)
 
     try:
         db.session.add(new_patient)
+        db.session.flush()
+        body = patient_created_body(new_patient)
+        if idempotent:
+            idempotent.remember(201, body)
         db.session.commit()
         current_app.logger.info(f"Admin {admin_id} created patient {new_patient.id} with ABHA ID {new_patient.abha_id}")
         
-        return created({
-            "message": "Patient created successfully",
-            "patient": new_patient.to_dict(),
-            "patient_id": new_patient.id,
-            "name": new_patient.name,
-        })
+        return created(body)
     
     except IntegrityError as e:
         db.session.rollback()
+        # A concurrent retry with the same key may have won the race
+        replay = idempotent.stored_response() if idempotent else None
+        if replay is not None:
+            return replay
         current_app.logger.error(f"IntegrityError creating patient: {e}")
         return conflict("Could not create patient. ABHA ID may be taken.")
     except Exception as e:
@@ -76,6 +91,31 @@ def create_patient():
         current_app.logger.error(f"Error creating patient: {e}")
         return server_error("An unexpected error occurred.")
 
+
+def build_patient(data: PatientCreateSchema, admin_id) -> Patient:
+    """New (unsaved) Patient from validated data."""
+    new_patient = Patient(
+        name=data.name, # Updated from full_name
+        age=data.age,
+        gender=data.gender,
+        height=data.height, # Updated from height_cm
+        weight=data.weight, # Updated from weight_kg
+        abha_id=data.abha_id,
+        state_name=data.state_name,
+        created_by_admin_id=admin_id # Updated from created_by_user_id
+    )
+    new_patient.set_password(data.password) 
+    return new_patient
+
+
+def patient_created_body(patient: Patient) -> dict:
+    return {
+        "message": "Patient created successfully",
+        "patient": patient.to_dict(),
+        "patient_id": patient.id,
+        "name": patient.name,
+    }
+
 @api_bp.route('/patients', methods=['GET'])
 @jwt_required()
 @admin_required
@@ -155,6 +195,57 @@ def get_patients():
         return server_error(str(e))
 
 
+# --- ADDED: Paged directory table ---
+@api_bp.route('/patients/directory', methods=['GET'])
+@jwt_required()
+@admin_required
+@limiter.limit("100 per minute")
+def get_patient_directory_page():
+    """
+    [Admin Only] Gets one page of the patient directory, one row per patient
+    with the latest risk levels, sorted and filtered by the database.
+    Query params: limit, cursor (the previous page's next_cursor),
+    sort (created_at|name|age|patient_id, '-' prefix for descending; default -created_at),
+    disease, risk_level (High|Medium|Low, on the latest prediction), q (name or ABHA ID),
+    state, facility.
+    """
+    try:
+        limit = _bounded_int_arg('limit', current_app.config.get('DIRECTORY_PAGE_SIZE', 50),
+                                 current_app.config.get('DIRECTORY_PAGE_MAX', 200))
+        sort_arg = request.args.get('sort') or DEFAULT_DIRECTORY_SORT
+        sort, descending = parse_directory_sort(sort_arg)
+        disease = request.args.get('disease') or None
+        if disease and disease not in DISEASE_KEYS:
+            raise ValueError(f"'disease' must be one of: {', '.join(DISEASE_KEYS)}")
+        risk_level = request.args.get('risk_level') or None
+        if risk_level and risk_level not in RISK_LEVELS:
+            raise ValueError(f"'risk_level' must be one of: {', '.join(RISK_LEVELS)}")
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        # A cursor is only valid for the sort it was issued for
+        if cursor is not None and (
+            len(cursor) != 3 or cursor[0] != sort_arg
+            or not isinstance(cursor[2], int)
+        ):
+            raise ValueError("Invalid cursor")
+    except ValueError as e:
+        return bad_request(str(e))
+
+    query = directory_query(
+        disease=disease,
+        risk_level=risk_level,
+        search=(request.args.get('q') or '').strip() or None,
+        state_name=request.args.get('state'),
+        facility_name=request.args.get('facility'),
+    )
+    rows, has_more, last_key = directory_page(query, limit, sort, descending, cursor[1:] if cursor else None)
+    next_cursor = encode_cursor(sort_arg, *last_key) if last_key else None
+
+    return ok({
+        **page_response(rows, has_more, next_cursor),
+        "total": directory_count(query),
+    })
+
+
 @api_bp.route('/patients/<int:patient_id>', methods=['GET'])
 @jwt_required()
 def get_patient(patient_id):
@@ -170,15 +261,145 @@ def get_patient(patient_id):
     if user_role == 'patient' and user_id != patient_id:
         return forbidden("Patients can only access their own data")
 
+    # --- ADDED: Conditional GET, answered before loading the record ---
+    version = patient_version(patient_id)
+    if version is None:
+        return not_found("Patient not found")
+    cached = not_modified(version)
+    if cached is not None:
+        return cached
+
+    # --- ADDED: Sparse fieldsets (?fields=...&include=...) ---
+    if wants_projection(request.args):
+        try:
+            fields, includes = parse_projection_args(request.args)
+        except ValueError as e:
+            return bad_request(str(e))
+        patient = load_patient_projection(patient_id, fields, includes)
+        if not patient:
+            return not_found("Patient not found")
+        return add_validators(ok(project_patient(patient, fields, includes)), version)
+
     patient = Patient.query.get_or_404(patient_id)
     
     # Return full details including all history and notes for Admin view
-    return ok(patient.to_dict(
+    return add_validators(ok(patient.to_dict(
         include_admin=True,
         include_history=True, 
         include_latest_prediction=True,
         include_notes=True
-    ))
+    )), version)
+
+
+# --- ADDED: Composite dashboard payload ---
+DASHBOARD_FIELDS = {"patient_id", "name", "age", "gender", "abha_id", "height", "weight", "bmi", "state_name"}
+DASHBOARD_HISTORY = ("diabetes_assessments", "liver_assessments", "heart_assessments", "mental_health_assessments")
+
+
+def _bounded_int_arg(name, default, maximum):
+    raw = request.args.get(name)
+    if raw is None or raw == '':
+        return default
+    if not raw.isdigit() or int(raw) < 1:
+        raise ValueError(f"'{name}' must be a positive integer")
+    return min(int(raw), maximum)
+
+
+@api_bp.route('/patients/<int:patient_id>/dashboard', methods=['GET'])
+@jwt_required()
+def get_patient_dashboard(patient_id):
+    """
+    [Admin/Patient] Everything the patient dashboard shows, in one response:
+    profile and healthcare worker, recent assessments of each type, the
+    latest and recent risk predictions, the risk trend and recommendations.
+    Query params: history (assessments per type, default 20), predictions
+    (recent predictions, default 5), bucket (trend bucket, default month).
+    Patient can only access their own.
+    """
+    jwt_identity = parse_jwt_identity()
+    if jwt_identity.get('role') == 'patient' and jwt_identity.get('id') != patient_id:
+        return forbidden("Patients can only access their own data")
+
+    try:
+        history = _bounded_int_arg('history', current_app.config.get('HISTORY_PAGE_SIZE', 20),
+                                   current_app.config.get('HISTORY_PAGE_MAX', 100))
+        recent = _bounded_int_arg('predictions', 5, 50)
+    except ValueError as e:
+        return bad_request(str(e))
+    bucket = request.args.get('bucket', 'month')
+    if bucket not in BUCKETS:
+        return bad_request(f"bucket must be one of: {', '.join(BUCKETS)}")
+
+    # Every part derives from the record covered by the patient version
+    version = patient_version(patient_id)
+    if version is None:
+        return not_found("Patient not found")
+    cached = not_modified(version)
+    if cached is not None:
+        return cached
+
+    includes = {name: history for name in DASHBOARD_HISTORY}
+    includes["created_by_admin"] = None
+    patient = load_patient_projection(patient_id, DASHBOARD_FIELDS, includes)
+    if not patient:
+        return not_found("Patient not found")
+
+    # Newest first; the first one is the latest prediction
+    predictions = patient.risk_predictions.limit(recent).all()
+    latest = predictions[0] if predictions else None
+    return add_validators(ok({
+        "patient": project_patient(patient, DASHBOARD_FIELDS, includes),
+        "latest_prediction": latest.to_dict() if latest else None,
+        "recent_predictions": [p.to_dict() for p in predictions],
+        "risk_trend": risk_trend(patient_id, bucket),
+        "recommendations": recommendations_for(latest),
+    }), version)
+
+
+# --- ADDED: Unified chronological timeline ---
+@api_bp.route('/patients/<int:patient_id>/timeline', methods=['GET'])
+@jwt_required()
+def get_patient_timeline(patient_id):
+    """
+    [Admin/Patient] Gets one page of the patient's merged timeline (assessments,
+    predictions, consultations and notes), newest first.
+    Query params: limit, cursor (the previous page's next_cursor), since, until,
+    types (comma-separated event types).
+    Patient can only access their own.
+    """
+    jwt_identity = parse_jwt_identity()
+    if jwt_identity.get('role') == 'patient' and jwt_identity.get('id') != patient_id:
+        return forbidden("Patients can only access their own data")
+
+    if not db.session.query(Patient.id).filter(Patient.id == patient_id).first():
+        return not_found("Patient not found")
+
+    try:
+        limit = parse_limit_arg(request.args)
+        since = parse_datetime_arg(request.args, 'since')
+        until = parse_datetime_arg(request.args, 'until')
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        if cursor is not None and (
+            len(cursor) != 3 or not isinstance(cursor[0], str)
+            or cursor[1] not in EVENT_TYPES or not isinstance(cursor[2], int)
+        ):
+            raise ValueError("Invalid cursor")
+        event_types = EVENT_TYPES
+        if request.args.get('types'):
+            event_types = [t.strip() for t in request.args['types'].split(',') if t.strip()]
+            unknown = set(event_types) - set(EVENT_TYPES)
+            if unknown:
+                raise ValueError(f"Unknown event types: {', '.join(sorted(unknown))}")
+    except ValueError as e:
+        return bad_request(str(e))
+
+    events, has_more, last_key = timeline_page(patient_id, limit, cursor, since, until, event_types)
+    next_cursor = encode_cursor(*last_key) if last_key else None
+
+    return ok({
+        "patient_id": patient_id,
+        **page_response(events, has_more, next_cursor),
+    })
 
 
 @api_bp.route('/patients/<int:patient_id>', methods=['PUT'])
@@ -201,6 +422,7 @@ def update_patient(patient_id):
             return conflict("Patient with this ABHA ID already exists")
     
     try:
+        old_state_name = patient.state_name
         # Update mutable fields
         patient.name = data.name
         patient.age = data.age
@@ -209,6 +431,8 @@ def update_patient(patient_id):
         patient.height = data.height
         patient.weight = data.weight
         patient.abha_id = data.abha_id # Allow ABHA ID update
+        # Rollups are keyed by the patient's current state
+        move_patient_rollups(patient, old_state_name)
 
         db.session.commit()
         current_app.logger.info(f"Patient {patient_id} updated by admin {get_current_admin_id()}")
@@ -1,12 +1,18 @@
 # HealthCare App/medml-backend/app/api/predict.py
-from flask import jsonify, current_app
+from flask import jsonify, current_app, request
 from . import api_bp
 from app.models import Patient, RiskPrediction
 from app.extensions import db
 from app.services import run_prediction
+from app.trends import DISEASES, BUCKETS, risk_trend
+from app.rollups import record_prediction
+from app.outbox import record_risk_escalation
+from app.jobs import enqueue
+from app.conditional import prediction_version, not_modified, add_validators
+from app.pagination import parse_datetime_arg
 from app.api.decorators import admin_required, get_current_admin_id
 from flask_jwt_extended import jwt_required
-from .responses import ok, forbidden, not_found, bad_request
+from .responses import ok, accepted, forbidden, not_found, bad_request
 
 def _run_and_save_prediction(patient_id):
     """
@@ -25,7 +31,7 @@ def _run_and_save_prediction(patient_id):
         mental_health_data = patient.get_latest_mental_health_features()
     except ValueError as e:
         current_app.logger.error(f"Missing assessment for patient {patient_id}: {e}")
-        raise Exception(f"Cannot run prediction: {e}")
+        raise ValueError(f"Cannot run prediction: {e}")
 
     current_app.logger.info(f"Running all predictions for patient {patient_id}...")
 
@@ -73,6 +79,11 @@ def _run_and_save_prediction(patient_id):
     )
 
     try:
+        # --- ADDED: Keep population rollups in step, same transaction ---
+        record_prediction(prediction, patient)
+        # --- ADDED: Outbox event when a disease newly reaches High ---
+        db.session.flush()
+        record_risk_escalation(prediction)
         db.session.commit()
         current_app.logger.info(f"Successfully saved new prediction {prediction.id} for patient {patient_id}")
         return prediction
@@ -90,7 +101,24 @@ def trigger_all_predictions(patient_id):
     [Admin Only] Triggers a full risk assessment for all 4 diseases.
     This is called by the "Finish Survey" button in the frontend.
     It creates a new RiskPrediction record.
+    With ?async=true the prediction is queued for a background worker and
+    a job is returned instead (202).
     """
+    # --- ADDED: Async mode defers scoring to the job queue ---
+    if request.args.get('async') in ('1', 'true'):
+        if not db.session.get(Patient, patient_id):
+            return not_found("Patient not found")
+        from .decorators import parse_jwt_identity
+        job = enqueue('predictions.run', {"patient_id": patient_id},
+                      unique_key=f"predictions.run:{patient_id}",
+                      patient_id=patient_id, identity=parse_jwt_identity())
+        db.session.commit()
+        return accepted({
+            "message": "Risk prediction queued",
+            "job": job.to_dict(),
+            "status_url": f"/api/v1/jobs/{job.id}",
+        })
+
     try:
         prediction = _run_and_save_prediction(patient_id)
         return ok({
@@ -119,6 +147,12 @@ def get_latest_prediction(patient_id):
         return forbidden("Patients can only access their own data")
 
     patient = Patient.query.get_or_404(patient_id)
+
+    # --- ADDED: Conditional GET on the latest prediction id ---
+    version = prediction_version(patient_id, 'prediction')
+    cached = not_modified(version)
+    if cached is not None:
+        return cached
     
     # Get the first item from the ordered 1:N relationship
     latest_prediction = patient.risk_predictions.first()
@@ -126,4 +160,48 @@ def get_latest_prediction(patient_id):
     if not latest_prediction:
         return not_found("No predictions found for this patient")
     
-    return ok(latest_prediction.to_dict())
\ No newline at end of file
+    return add_validators(ok(latest_prediction.to_dict()), version)
+
+# --- ADDED: Risk trend analytics ---
+@api_bp.route('/patients/<int:patient_id>/predictions/trend', methods=['GET'])
+@jwt_required()
+def get_risk_trend(patient_id):
+    """
+    [Admin/Patient] Gets downsampled risk score series per disease.
+    Query params: bucket (week|month, default month), diseases (comma-separated),
+    since, until, window (moving-average width in buckets, default 3).
+    """
+    from .decorators import parse_jwt_identity
+    jwt_identity = parse_jwt_identity()
+    if jwt_identity.get('role') == 'patient' and jwt_identity.get('id') != patient_id:
+        return forbidden("Patients can only access their own data")
+
+    if not db.session.query(Patient.id).filter(Patient.id == patient_id).first():
+        return not_found("Patient not found")
+
+    bucket = request.args.get('bucket', 'month')
+    if bucket not in BUCKETS:
+        return bad_request(f"'bucket' must be one of: {', '.join(BUCKETS)}")
+
+    diseases = DISEASES
+    if request.args.get('diseases'):
+        diseases = [d.strip() for d in request.args['diseases'].split(',') if d.strip()]
+        unknown = set(diseases) - set(DISEASES)
+        if unknown:
+            return bad_request(f"Unknown diseases: {', '.join(sorted(unknown))}")
+
+    window = request.args.get('window', '3')
+    if not window.isdigit() or int(window) < 1:
+        return bad_request("'window' must be a positive integer")
+
+    try:
+        since = parse_datetime_arg(request.args, 'since')
+        until = parse_datetime_arg(request.args, 'until')
+    except ValueError as e:
+        return bad_request(str(e))
+
+    return ok({
+        "patient_id": patient_id,
+        "bucket": bucket,
+        "series": risk_trend(patient_id, bucket, diseases, since, until, int(window)),
+    })
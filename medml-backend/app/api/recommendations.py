@@ -5,7 +5,18 @@ from app.models import db, Patient
 from app.api.decorators import admin_required
 from flask_jwt_extended import jwt_required
 from app.services import get_gemini_recommendations
-from .responses import ok, forbidden, server_error
+from app.jobs import enqueue
+from app.conditional import prediction_version, not_modified, add_validators
+from app.reporting import EMPTY_RECOMMENDATIONS, risk_map_for
+from .responses import ok, accepted, forbidden, server_error
+
+
+def recommendations_for(prediction):
+    """Gemini recommendations grouped by category for a prediction's risk levels (empty if None)."""
+    if prediction is None:
+        return dict(EMPTY_RECOMMENDATIONS)
+    return get_gemini_recommendations(risk_map_for(prediction.to_dict()))
+
 
 @api_bp.route('/patients/<int:patient_id>/recommendations', methods=['GET'])
 @jwt_required()
@@ -13,6 +24,8 @@ def get_recommendations(patient_id):
     """
     [Admin/Patient] Fetches lifestyle recommendations based on *latest* risk.
     Patient can only access their own.
+    With ?async=true the Gemini call is queued for a background worker and
+    a job is returned instead (202); the recommendations are its result.
     """
     try:
         # 1. Check permissions
@@ -26,25 +39,36 @@ def get_recommendations(patient_id):
         
         patient = Patient.query.get_or_404(patient_id)
 
+        # --- ADDED: Conditional GET; recommendations only change with the latest prediction ---
+        version = prediction_version(patient_id, 'recommendations')
+        cached = not_modified(version)
+        if cached is not None:
+            return cached
+
         # --- UPDATED: Get latest prediction from 1:N ---
         risk_prediction = patient.risk_predictions.first()
         
         if not risk_prediction:
             # No predictions yet, return empty
-            return ok({"diet": [], "exercise": [], "sleep": [], "lifestyle": []})
-
-        risk_map = {
-            'diabetes': risk_prediction.diabetes_risk_level,
-            'liver': risk_prediction.liver_risk_level,
-            'heart': risk_prediction.heart_risk_level,
-            'mental_health': risk_prediction.mental_health_risk_level
-        }
-        
+            return add_validators(ok(dict(EMPTY_RECOMMENDATIONS)), version)
+
+        # --- ADDED: Async mode defers the Gemini call to the job queue ---
+        if request.args.get('async') in ('1', 'true'):
+            job = enqueue('recommendations.generate', {"patient_id": patient_id},
+                          unique_key=f"recommendations.generate:{patient_id}:{risk_prediction.id}",
+                          patient_id=patient_id, identity=jwt_identity)
+            db.session.commit()
+            return accepted({
+                "message": "Recommendations queued",
+                "job": job.to_dict(),
+                "status_url": f"/api/v1/jobs/{job.id}",
+            })
+
         # Call Gemini Service
-        recommendations_data = get_gemini_recommendations(risk_map)
+        recommendations_data = recommendations_for(risk_prediction)
         
         # Return the grouped-by-category dictionary
-        return ok(recommendations_data)
+        return add_validators(ok(recommendations_data), version)
 
     except Exception as e:
         current_app.logger.error(f"Error fetching recommendations: {e}")
@@ -1,157 +1,31 @@
 # HealthCare App/medml-backend/app/api/reports.py
-from flask import request, jsonify, current_app, send_file
+from flask import request, jsonify, current_app, send_file, Response, stream_with_context
 from . import api_bp
-from app.models import Patient
-from app.extensions import db
+from app.models import Patient, ShareLink, utcnow
+from app.extensions import db, limiter
 from app.services import get_gemini_recommendations
+from app.reporting import (
+    render_patient_report,
+    build_share_snapshot,
+    cohort_query,
+    iter_cohort_contexts,
+    iter_rendered_reports,
+    stream_cohort_zip,
+    start_cohort_job,
+    get_cohort_job,
+)
+from app.schemas import CohortReportSchema, ShareLinkSchema
+from app.report_jobs import submit_report_job, get_report_job, wait_for_report_job
 from app.api.decorators import admin_required
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from fpdf import FPDF
+from pydantic import ValidationError
+from sqlalchemy.orm import defer
 from io import BytesIO
-from datetime import datetime
-from .responses import forbidden, bad_request, server_error
-
-class PDF(FPDF):
-    def __init__(self):
-        super().__init__()
-        self.set_auto_page_break(auto=True, margin=20)
-        self.set_margins(15, 15, 15)  # Left, Top, Right margins
-    
-    def header(self):
-        # Header with logo and title
-        self.set_font('Arial', 'B', 16)
-        self.set_text_color(37, 99, 235)  # Blue color
-        self.cell(0, 12, 'HealthCare System', 0, 1, 'C')
-        
-        self.set_font('Arial', 'B', 14)
-        self.set_text_color(0, 0, 0)  # Black
-        self.cell(0, 8, 'Patient Health Report', 0, 1, 'C')
-        
-        # Add a line separator
-        self.set_draw_color(37, 99, 235)
-        self.line(10, self.get_y(), self.w - 10, self.get_y())
-        self.ln(5)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.set_text_color(100, 100, 100)
-        self.cell(0, 10, f'Page {self.page_no()} | Generated on {datetime.now().strftime("%Y-%m-%d %H:%M")}', 0, 0, 'C')
-    
-    def chapter_title(self, title):
-        self.set_font('Arial', 'B', 12)
-        self.set_text_color(37, 99, 235)  # Blue color
-        self.cell(0, 10, title, 0, 1, 'L')
-        self.ln(2)
-    
-    def chapter_body(self, data):
-        self.set_font('Arial', '', 10)
-        for key, val in data.items():
-            # Ensure text fits within page width
-            text = f"{key}: {val}"
-            self.multi_cell(0, 5, text, 0, 'L', False)
-        self.ln()
-        
-    def risk_table(self, risk_data):
-        """Create a risk assessment table that ensures it stays on a single page."""
-        # Calculate required space for the table
-        table_height = 10 + (5 * 10) + 5  # Header + 5 rows + spacing
-        
-        # Check if we need a new page to fit the table
-        if self.get_y() + table_height > self.h - 20:  # Leave margin for footer
-            self.add_page()
-        
-        # Table title
-        self.set_font('Arial', 'B', 12)
-        self.cell(0, 8, 'Disease Risk Assessment Scores', 0, 1, 'C')
-        self.ln(3)
-        
-        # Table header
-        self.set_font('Arial', 'B', 10)
-        col_width = self.w / 4.5
-        self.cell(col_width, 10, 'Disease', 1, 0, 'C')
-        self.cell(col_width, 10, 'Risk Level', 1, 0, 'C')
-        self.cell(col_width, 10, 'Score (0-1)', 1, 0, 'C')
-        self.ln()
-        
-        # Table data
-        self.set_font('Arial', '', 10)
-        if risk_data:
-            data = [
-                ('Diabetes', risk_data.diabetes_risk_level, risk_data.diabetes_risk_score),
-                ('Liver Disease', risk_data.liver_risk_level, risk_data.liver_risk_score),
-                ('Heart Disease', risk_data.heart_risk_level, risk_data.heart_risk_score),
-                ('Mental Health', risk_data.mental_health_risk_level, risk_data.mental_health_risk_score),
-            ]
-            for row in data:
-                # Format risk level with color coding
-                risk_level = str(row[1] or 'N/A')
-                if risk_level == 'High':
-                    self.set_text_color(220, 20, 60)  # Red
-                elif risk_level == 'Medium':
-                    self.set_text_color(255, 140, 0)  # Orange
-                elif risk_level == 'Low':
-                    self.set_text_color(34, 139, 34)  # Green
-                else:
-                    self.set_text_color(0, 0, 0)  # Black
-                
-                self.cell(col_width, 10, str(row[0] or 'N/A'), 1, 0, 'C')
-                self.cell(col_width, 10, risk_level, 1, 0, 'C')
-                self.cell(col_width, 10, str(round(row[2], 3) if row[2] is not None else 'N/A'), 1, 0, 'C')
-                self.ln()
-                
-                # Reset text color
-                self.set_text_color(0, 0, 0)
-        else:
-            self.cell(col_width * 3, 10, 'No prediction data available.', 1, 0, 'C')
-            self.ln()
-        
-        self.ln(8)  # Extra spacing after table
-        
-    def add_recommendations(self, rec_data):
-        """Add lifestyle recommendations with improved formatting."""
-        self.set_font('Arial', 'B', 12)
-        self.set_text_color(37, 99, 235)  # Blue color
-        self.cell(0, 8, 'Lifestyle Recommendations', 0, 1, 'L')
-        self.ln(3)
-        
-        self.set_font('Arial', '', 10)
-        self.set_text_color(0, 0, 0)  # Reset to black
-        
-        if not rec_data or all(not v for v in rec_data.values()):
-            self.multi_cell(0, 5, "No specific recommendations available at this time.")
-            return
-
-        for category in ['Diet', 'Exercise', 'Sleep', 'Lifestyle']:
-            recs = rec_data.get(category.lower(), [])
-            if recs:
-                # Category header without emoji icons (to avoid Unicode issues)
-                self.set_font('Arial', 'B', 11)
-                self.set_text_color(37, 99, 235)  # Blue color
-                self.cell(0, 8, f"{category}", 0, 1, 'L')
-                
-                self.set_font('Arial', '', 10)
-                self.set_text_color(0, 0, 0)  # Reset to black
-                
-                for rec in recs:
-                    disease = rec.get('disease_type', 'General')
-                    text = rec.get('recommendation_text', 'No text.')
-                    risk_level = rec.get('risk_level', 'Medium')
-                    
-                    # Color code based on risk level
-                    if risk_level == 'High':
-                        self.set_text_color(220, 20, 60)  # Red
-                    elif risk_level == 'Medium':
-                        self.set_text_color(255, 140, 0)  # Orange
-                    else:
-                        self.set_text_color(0, 0, 0)  # Black
-                    
-                    # Ensure text fits within page width and handle long text
-                    recommendation_text = f"- ({disease}) {text}"
-                    self.multi_cell(0, 5, recommendation_text, 0, 'L', False)
-                    self.set_text_color(0, 0, 0)  # Reset to black
-                
-                self.ln(3)
+from datetime import datetime, timedelta
+import json
+import math
+import secrets
+from .responses import ok, created, accepted, forbidden, bad_request, not_found, conflict, gone, unprocessable_entity, server_error
 
 @api_bp.route('/patients/<int:patient_id>/report/pdf', methods=['POST'])
 @jwt_required()
@@ -179,74 +53,17 @@ def download_patient_report(patient_id):
         if not sections:
             return bad_request("Please select at least one section to include.")
 
-        # --- UPDATED: Get LATEST prediction ---
-        risk_prediction = patient.risk_predictions.first()
-        
-        # 3. Generate PDF report
-        pdf = PDF()
-        pdf.add_page()
-
-        # Section: Overview
-        if "Overview" in sections:
-            pdf.chapter_title("Patient Information")
-            overview_data = {
-                "Name": patient.name,
-                "Age": patient.age,
-                "Gender": patient.gender,
-                "Height": f"{patient.height} cm",
-                "Weight": f"{patient.weight} kg",
-                "BMI": patient.bmi,
-                "State": patient.state_name,
-                "Generated": datetime.now().strftime('%Y-%m-%d %H:%M')
-            }
-            pdf.chapter_body(overview_data)
-
-            # Risk table for overview
-            pdf.risk_table(risk_prediction)
-
-        # Optional disease-specific sections: render headers if selected
-        section_map = [
-            ("Diabetes", "Diabetes"),
-            ("Liver", "Liver Disease"),
-            ("Heart", "Heart Disease"),
-            ("Mental Health", "Mental Health")
-        ]
-
-        if any(sec in sections for sec, _ in section_map):
-            # Ensure risk table already shows overall numbers; can add small notes per disease
-            for sec_key, sec_title in section_map:
-                if sec_key in sections:
-                    pdf.chapter_title(f"{sec_title} Details")
-                    if risk_prediction:
-                        level = getattr(risk_prediction, f"{sec_key.lower().replace(' ', '_')}_risk_level", None)
-                        score = getattr(risk_prediction, f"{sec_key.lower().replace(' ', '_')}_risk_score", None)
-                        pdf.chapter_body({
-                            "Risk Level": level or 'N/A',
-                            "Risk Score": round(score, 3) if score is not None else 'N/A'
-                        })
-                    else:
-                        pdf.chapter_body({"Info": "No prediction data available."})
-
-        # Recommendations section
-        try:
-            if risk_prediction:
-                risk_map = {
-                    'diabetes': risk_prediction.diabetes_risk_level,
-                    'liver': risk_prediction.liver_risk_level,
-                    'heart': risk_prediction.heart_risk_level,
-                    'mental_health': risk_prediction.mental_health_risk_level
-                }
-                recs = get_gemini_recommendations(risk_map)
-            else:
-                recs = {"diet": [], "exercise": [], "sleep": [], "lifestyle": []}
-        except Exception as e:
-            current_app.logger.warning(f"Failed to get AI recommendations: {e}")
-            recs = {"diet": [], "exercise": [], "sleep": [], "lifestyle": []}
-
-        pdf.add_recommendations(recs)
-
-        # Output PDF to bytes
-        pdf_bytes = pdf.output(dest='S').encode('latin-1')
+        # --- ADDED: Async mode queues the report and returns a job id ---
+        if report_options.get('async') or request.args.get('async') in ('1', 'true'):
+            job = submit_report_job(patient_id, sections, jwt_identity)
+            return accepted({
+                "message": "Report job queued",
+                "job": job.to_dict(),
+                "status_url": f"/api/v1/reports/jobs/{job.id}",
+            })
+
+        # Generate PDF report inline from the LATEST prediction
+        filename, pdf_bytes = render_patient_report(patient, sections)
         buffer = BytesIO(pdf_bytes)
 
         current_app.logger.info(f"Generated PDF report for patient {patient_id}")
@@ -254,7 +71,7 @@ def download_patient_report(patient_id):
         return send_file(
             buffer,
             as_attachment=True,
-            download_name=f"Health_Report_{patient.abha_id}.pdf",
+            download_name=filename,
             mimetype='application/pdf'
         )
 
@@ -263,39 +80,254 @@ def download_patient_report(patient_id):
         return server_error("Could not generate report.")
 
 
-# --- Share Details Endpoint ---
+# --- Share Details Endpoints ---
 @api_bp.route('/patients/<int:patient_id>/share', methods=['POST'])
 @jwt_required()
 def share_patient_details(patient_id):
     """
-    [Admin/Patient] Generates a shareable link with selected sections.
-    MVP: returns a dummy URL containing a short token; frontend handles link display.
+    [Admin/Patient] Creates a persistent share link for selected sections.
+    The snapshot (JSON or PDF) is rendered now and stored, so opening the
+    link later never touches the patient tables.
     """
-    try:
-        from .decorators import parse_jwt_identity
-        jwt_identity = parse_jwt_identity()
-        user_role = jwt_identity.get('role')
-        user_id = jwt_identity.get('id')
+    from .decorators import parse_jwt_identity
+    jwt_identity = parse_jwt_identity()
+    user_role = jwt_identity.get('role')
+    user_id = jwt_identity.get('id')
 
-        if user_role == 'patient' and user_id != patient_id:
-            return forbidden("Patients can only share their own details")
+    if user_role == 'patient' and user_id != patient_id:
+        return forbidden("Patients can only share their own details")
 
-        # Validate patient exists
-        _ = Patient.query.get_or_404(patient_id)
+    patient = Patient.query.get_or_404(patient_id)
 
-        payload = request.json or {}
-        sections = payload.get('sections', [])
-        if not sections:
-            return bad_request("Please select at least one section to share.")
+    try:
+        data = ShareLinkSchema(**(request.json or {}))
+    except ValidationError as e:
+        return unprocessable_entity(messages=e.errors())
+
+    if not data.sections:
+        return bad_request("Please select at least one section to share.")
+
+    ttl_days = min(data.expires_in_days or current_app.config['SHARE_LINK_TTL_DAYS'],
+                   current_app.config['SHARE_LINK_MAX_TTL_DAYS'])
 
-        # Create a lightweight, non-persistent token
-        import secrets
-        token = secrets.token_urlsafe(8)
-        share_url = f"https://healthcare-app.local/share/{patient_id}/{','.join(sections)}?t={token}"
+    try:
+        if data.format == 'pdf':
+            download_name, content = render_patient_report(patient, data.sections)
+            content_type = 'application/pdf'
+        else:
+            snapshot = build_share_snapshot(patient, data.sections)
+            content = json.dumps(snapshot, separators=(',', ':')).encode('utf-8')
+            content_type = 'application/json'
+            download_name = None
 
-        return jsonify({"share_url": share_url}), 200
+        link = ShareLink(
+            token=secrets.token_urlsafe(24),
+            patient_id=patient_id,
+            sections=data.sections,
+            format=data.format,
+            content=content,
+            content_type=content_type,
+            download_name=download_name,
+            created_by_id=user_id,
+            created_by_role=user_role,
+            expires_at=utcnow() + timedelta(days=ttl_days),
+        )
+        db.session.add(link)
+        db.session.commit()
     except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"Error generating share link for patient {patient_id}: {e}")
         return server_error("Could not generate share link.")
 
-    
\ No newline at end of file
+    base_url = current_app.config.get('SHARE_BASE_URL') or request.host_url.rstrip('/')
+    share_url = f"{base_url}/api/v1/share/{link.token}"
+    current_app.logger.info(f"Share link created for patient {patient_id} by {user_role} {user_id}")
+
+    return created({"share_url": share_url, "share": dict(link.to_dict(), size_bytes=len(content))})
+
+
+@api_bp.route('/patients/<int:patient_id>/shares', methods=['GET'])
+@jwt_required()
+def list_patient_shares(patient_id):
+    """
+    [Admin/Patient] Lists share links for a patient (without their content).
+    """
+    from .decorators import parse_jwt_identity
+    jwt_identity = parse_jwt_identity()
+    if jwt_identity.get('role') == 'patient' and jwt_identity.get('id') != patient_id:
+        return forbidden("Patients can only view their own share links")
+
+    links = ShareLink.query.options(defer(ShareLink.content)) \
+        .filter_by(patient_id=patient_id).order_by(ShareLink.created_at.desc()).all()
+    return ok({"shares": [link.to_dict() for link in links]})
+
+
+@api_bp.route('/share/<token>', methods=['GET'])
+@limiter.limit("60 per minute")
+def get_shared_snapshot(token):
+    """
+    [Public] Serves a share link: one indexed lookup on the token and the
+    stored snapshot bytes. No authentication and no patient queries.
+    """
+    row = db.session.query(
+        ShareLink.content, ShareLink.content_type, ShareLink.download_name,
+        ShareLink.expires_at, ShareLink.revoked_at
+    ).filter(ShareLink.token == token).first()
+
+    if row is None or row.revoked_at is not None:
+        return not_found("Share link not found or revoked")
+    if row.expires_at <= utcnow():
+        return gone("Share link has expired")
+
+    response = Response(row.content, mimetype=row.content_type)
+    if row.download_name:
+        response.headers['Content-Disposition'] = f'inline; filename="{row.download_name}"'
+    response.headers['Cache-Control'] = 'private, max-age=300'
+    return response
+
+
+@api_bp.route('/share/<token>', methods=['DELETE'])
+@jwt_required()
+def revoke_share_link(token):
+    """
+    [Admin/Patient] Revokes a share link. Patients can only revoke their own.
+    """
+    from .decorators import parse_jwt_identity
+    jwt_identity = parse_jwt_identity()
+
+    link = ShareLink.query.options(defer(ShareLink.content)).filter_by(token=token).first()
+    if not link:
+        return not_found("Share link not found")
+    if jwt_identity.get('role') == 'patient' and jwt_identity.get('id') != link.patient_id:
+        return forbidden("Patients can only revoke their own share links")
+
+    if link.revoked_at is None:
+        link.revoked_at = utcnow()
+        db.session.commit()
+    return ok({"message": "Share link revoked", "share": link.to_dict()})
+
+
+# --- Cohort (batch) Report Endpoints ---
+
+@api_bp.route('/reports/cohort', methods=['POST'])
+@jwt_required()
+@admin_required
+def download_cohort_reports():
+    """
+    [Admin Only] Renders PDF reports for every patient matching a filter
+    (disease, risk level, state, facility, prediction date range) and streams
+    them back as a ZIP archive while they are rendered.
+    Progress can be polled at /reports/cohort/<job_id> using the
+    X-Cohort-Job-Id response header; it is stored in the database, so any
+    app process can answer.
+    """
+    try:
+        data = CohortReportSchema(**(request.json or {}))
+    except ValidationError as e:
+        return unprocessable_entity(messages=e.errors())
+
+    if not data.sections:
+        return bad_request("Please select at least one section to include.")
+
+    query = cohort_query(
+        disease=data.disease,
+        risk_level=data.risk_level,
+        state_name=data.state_name,
+        facility_name=data.facility_name,
+        date_from=data.date_from,
+        date_to=data.date_to,
+    )
+    total = query.count()
+    if total == 0:
+        return not_found("No patients match the given filter.")
+
+    job_id = start_cohort_job(total)
+    current_app.logger.info(f"Cohort report job {job_id} started for {total} patients")
+
+    contexts = iter_cohort_contexts(
+        query,
+        include_recommendations=data.include_recommendations,
+        recommend=get_gemini_recommendations,
+    )
+    rendered = iter_rendered_reports(contexts, data.sections, workers=current_app.config.get('REPORT_WORKERS'))
+
+    response = Response(
+        stream_with_context(stream_cohort_zip(rendered, job_id=job_id, total=total)),
+        mimetype='application/zip',
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="Cohort_Reports_{datetime.now().strftime("%Y%m%d_%H%M")}.zip"'
+    response.headers['X-Cohort-Job-Id'] = job_id
+    response.headers['X-Cohort-Total'] = str(total)
+    return response
+
+
+@api_bp.route('/reports/cohort/<job_id>', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_cohort_report_progress(job_id):
+    """
+    [Admin Only] Returns progress (total/completed/failed) of a cohort report job.
+    """
+    job = get_cohort_job(job_id)
+    if not job:
+        return not_found("Cohort report job not found")
+    return ok(job)
+
+
+# --- Asynchronous Report Job Endpoints ---
+
+def _can_access_job(job, jwt_identity):
+    if jwt_identity.get('role') == 'patient':
+        return job.patient_id == jwt_identity.get('id')
+    return True
+
+
+@api_bp.route('/reports/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_report_job_status(job_id):
+    """
+    [Admin/Patient] Returns the status of an async report job.
+    Pass ?wait=<seconds> (max 30) to block until the job has finished.
+    """
+    from .decorators import parse_jwt_identity
+    jwt_identity = parse_jwt_identity()
+
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        return bad_request("wait must be a number of seconds")
+    if not math.isfinite(wait):
+        return bad_request("wait must be a finite number of seconds")
+    wait = min(max(wait, 0), 30)
+
+    job = wait_for_report_job(job_id, wait) if wait else get_report_job(job_id)
+    if not job or not _can_access_job(job, jwt_identity):
+        return not_found("Report job not found or expired")
+
+    data = job.to_dict()
+    if job.status == 'completed':
+        data['download_url'] = f"/api/v1/reports/jobs/{job.id}/download"
+    return ok(data)
+
+
+@api_bp.route('/reports/jobs/<job_id>/download', methods=['GET'])
+@jwt_required()
+def download_report_job(job_id):
+    """
+    [Admin/Patient] Downloads the PDF of a completed report job.
+    """
+    from .decorators import parse_jwt_identity
+    jwt_identity = parse_jwt_identity()
+
+    job = get_report_job(job_id)
+    if not job or not _can_access_job(job, jwt_identity):
+        return not_found("Report job not found or expired")
+    if job.status != 'completed':
+        return conflict(f"Report is not ready (status: {job.status})")
+
+    return send_file(
+        job.artifact_path,
+        as_attachment=True,
+        download_name=job.download_name,
+        mimetype='application/pdf'
+    )
@@ -1,5 +1,16 @@
 from flask import jsonify
 
+from app.representations import msgpack_enabled, msgpack_response, wants_msgpack
+
+
+def _render(body, status):
+    """JSON, or MessagePack when the client asks for it (Accept header)."""
+    if not msgpack_enabled():
+        return jsonify(body), status
+    response = msgpack_response(body) if wants_msgpack() else jsonify(body)
+    response.vary.add("Accept")
+    return response, status
+
 
 def ok(payload=None, message=None):
     body = {}
@@ -9,7 +20,7 @@ def ok(payload=None, message=None):
         body.update(payload)
     elif payload is not None:
         body["data"] = payload
-    return jsonify(body), 200
+    return _render(body, 200)
 
 
 def created(payload=None, message=None):
@@ -20,7 +31,18 @@ def created(payload=None, message=None):
         body.update(payload)
     elif payload is not None:
         body["data"] = payload
-    return jsonify(body), 201
+    return _render(body, 201)
+
+
+def accepted(payload=None, message=None):
+    body = {}
+    if message is not None:
+        body["message"] = message
+    if isinstance(payload, dict):
+        body.update(payload)
+    elif payload is not None:
+        body["data"] = payload
+    return _render(body, 202)
 
 
 def bad_request(message="Bad Request", extra=None):
@@ -46,6 +68,14 @@ def conflict(message="Conflict"):
     return jsonify({"error": "Conflict", "message": message}), 409
 
 
+def not_acceptable(message="Not Acceptable"):
+    return jsonify({"error": "Not Acceptable", "message": message}), 406
+
+
+def gone(message="Gone"):
+    return jsonify({"error": "Gone", "message": message}), 410
+
+
 def unprocessable_entity(messages=None, message="Validation Failed"):
     body = {"error": "Validation Failed", "message": message}
     if messages is not None:
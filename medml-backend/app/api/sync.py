@@ -0,0 +1,74 @@
+# HealthCare App/medml-backend/app/api/sync.py
+from flask import request, current_app
+from . import api_bp
+from app.sync import changes_since
+from app.pagination import encode_cursor, decode_cursor
+from app.api.decorators import parse_jwt_identity
+from flask_jwt_extended import jwt_required
+from .responses import ok, bad_request, forbidden
+
+
+def _parse_sync_token(token):
+    """
+    Returns (since, until). A final token holds just the watermark; a
+    continuation token also holds the high-water mark the sync is pinned to.
+    """
+    if not token:
+        return 0, None
+    values = decode_cursor(token)
+    if not 1 <= len(values) <= 2 or not all(isinstance(v, int) and v >= 0 for v in values):
+        raise ValueError("Invalid sync token")
+    if len(values) == 2:
+        since, until = values
+        if since > until:
+            raise ValueError("Invalid sync token")
+        return since, until
+    return values[0], None
+
+
+def _parse_batch_size(args):
+    default = current_app.config.get('SYNC_BATCH_SIZE', 500)
+    maximum = current_app.config.get('SYNC_BATCH_MAX', 2000)
+    raw = args.get('limit')
+    if raw is None or raw == '':
+        return default
+    if not raw.isdigit() or int(raw) < 1:
+        raise ValueError("'limit' must be a positive integer")
+    return min(int(raw), maximum)
+
+
+@api_bp.route('/sync/changes', methods=['GET'])
+@jwt_required()
+def get_sync_changes():
+    """
+    [Admin/Patient] Returns the rows changed since the client's sync token:
+    current values of inserted/updated patients, assessments, predictions,
+    consultations and notes, and the ids of deleted ones.
+    Query params: since (token from the previous response; omit for a full
+    sync), limit (rows per batch).
+    While has_more is true, call again with next_token to get the rest of
+    this sync; the last batch's next_token is the watermark to store.
+    Admins sync every patient; a patient syncs only their own records.
+    """
+    jwt_identity = parse_jwt_identity()
+    role = jwt_identity.get('role')
+    if role not in ('admin', 'patient'):
+        return forbidden("Unknown role")
+    patient_id = jwt_identity.get('id') if role == 'patient' else None
+
+    try:
+        since, until = _parse_sync_token(request.args.get('since'))
+        limit = _parse_batch_size(request.args)
+    except ValueError as e:
+        return bad_request(str(e))
+
+    batch, has_more, position, until = changes_since(since, limit, until=until, patient_id=patient_id)
+    next_token = encode_cursor(position, until) if has_more else encode_cursor(until)
+
+    return ok({
+        **batch,
+        "count": sum(len(rows) for rows in batch["changes"].values())
+                 + sum(len(ids) for ids in batch["deleted"].values()),
+        "has_more": has_more,
+        "next_token": next_token,
+    })
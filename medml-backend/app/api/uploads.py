@@ -0,0 +1,176 @@
+# HealthCare App/medml-backend/app/api/uploads.py
+from flask import request, current_app
+from . import api_bp
+from app.models import Patient
+from app.extensions import db
+from app.schemas import PatientCreateSchema, UploadBatchSchema
+from app.idempotency import IdempotencyKeyReused, request_fingerprint, find_stored, store
+from app.api.decorators import admin_required, get_current_admin_id
+from app.api.patients import build_patient, patient_created_body
+from app.api.assessments import ASSESSMENT_TYPES, build_assessment
+from app.tasks import schedule_auto_scoring
+from pydantic import ValidationError
+from flask_jwt_extended import jwt_required
+from .responses import ok, bad_request, unauthorized, unprocessable_entity, server_error
+
+
+def _failed(status, message, messages=None):
+    outcome = {"status": status, "outcome": "failed", "error": message}
+    if messages is not None:
+        outcome["messages"] = messages
+    return outcome
+
+
+class _UploadBatch:
+    """Applies queued writes to the session; the caller commits once."""
+
+    def __init__(self, admin_id):
+        self.admin_id = admin_id
+        self.scope = f"admin:{admin_id}"
+        self.refs = {}           # client ref -> patient id
+        self.seen = {}           # idempotency key -> (fingerprint, outcome) within this batch
+        self.new_abha_ids = set()
+        self.new_patient_ids = set()
+
+    def _target(self, item):
+        """(path, patient_id or None) the item would have been POSTed to."""
+        prefix = request.path.rsplit('/uploads/', 1)[0]
+        if item.type == 'patient':
+            return f"{prefix}/patients", None
+        patient_id = item.patient_id
+        if item.patient_ref is not None:
+            patient_id = self.refs.get(item.patient_ref)
+        return f"{prefix}/patients/{patient_id}/assessments/{item.assessment_type}", patient_id
+
+    def apply(self, item) -> dict:
+        if item.type == 'assessment':
+            if item.assessment_type is None:
+                return _failed(400, "'assessment_type' is required for assessments")
+            if (item.patient_id is None) == (item.patient_ref is None):
+                return _failed(400, "Give exactly one of 'patient_id' or 'patient_ref'")
+            if item.patient_ref is not None and item.patient_ref not in self.refs:
+                return _failed(404, f"Unknown patient_ref '{item.patient_ref}'")
+
+        path, patient_id = self._target(item)
+        fingerprint = request_fingerprint('POST', path, item.data)
+
+        if item.key:
+            try:
+                replayed = self._replay(item.key, fingerprint)
+            except IdempotencyKeyReused as e:
+                return _failed(422, str(e))
+            if replayed is not None:
+                self._remember_ref(item, replayed)
+                return replayed
+
+        if item.type == 'patient':
+            outcome = self._create_patient(item)
+        else:
+            outcome = self._create_assessment(item, patient_id)
+
+        if item.key and outcome["outcome"] == "created":
+            store(self.scope, item.key, fingerprint, outcome["status"], outcome["body"])
+            self.seen[item.key] = (fingerprint, outcome)
+        self._remember_ref(item, outcome)
+        return outcome
+
+    def _replay(self, key, fingerprint):
+        if key in self.seen:
+            seen_fingerprint, outcome = self.seen[key]
+            if seen_fingerprint != fingerprint:
+                raise IdempotencyKeyReused(f"Idempotency key '{key}' was already used for a different request")
+            return {**outcome, "outcome": "replayed"}
+        stored = find_stored(self.scope, key, fingerprint)
+        if stored is None:
+            return None
+        status, body = stored
+        return {"status": status, "outcome": "replayed", "body": body}
+
+    def _remember_ref(self, item, outcome):
+        if item.type == 'patient' and item.ref and outcome["outcome"] != "failed":
+            self.refs[item.ref] = outcome["body"].get("patient_id")
+
+    def _create_patient(self, item) -> dict:
+        try:
+            data = PatientCreateSchema(**item.data)
+        except ValidationError as e:
+            return _failed(422, "Validation Failed", e.errors(include_url=False, include_context=False))
+        if data.abha_id in self.new_abha_ids or Patient.query.filter_by(abha_id=data.abha_id).first():
+            return _failed(409, "Patient with this ABHA ID already exists")
+
+        patient = build_patient(data, self.admin_id)
+        db.session.add(patient)
+        db.session.flush()
+        self.new_abha_ids.add(data.abha_id)
+        self.new_patient_ids.add(patient.id)
+        return {"status": 201, "outcome": "created", "body": patient_created_body(patient)}
+
+    def _create_assessment(self, item, patient_id) -> dict:
+        if patient_id not in self.new_patient_ids and not db.session.get(Patient, patient_id):
+            return _failed(404, "Patient not found")
+        AssessmentModel, SchemaModel = ASSESSMENT_TYPES[item.assessment_type]
+        try:
+            data = SchemaModel(**item.data)
+        except ValidationError as e:
+            return _failed(422, "Validation Failed", e.errors(include_url=False, include_context=False))
+
+        assessment = build_assessment(patient_id, AssessmentModel, data, self.admin_id)
+        db.session.add(assessment)
+        db.session.flush()
+        # One debounced scoring run per patient, however many of their assessments the batch holds
+        schedule_auto_scoring(patient_id, {"id": self.admin_id, "role": "admin"})
+        return {
+            "status": 201,
+            "outcome": "created",
+            "body": {
+                "message": f"{AssessmentModel.__name__} created successfully",
+                "assessment": assessment.to_dict(),
+            },
+        }
+
+
+@api_bp.route('/uploads/batch', methods=['POST'])
+@jwt_required()
+@admin_required
+def upload_batch():
+    """
+    [Admin Only] Applies a device's offline queue of patient and assessment
+    creations in one transaction and returns one outcome per item, in order.
+    Items: {"type": "patient"|"assessment", "key": idempotency key, "data": {...}}
+    plus "ref" (patients) or "assessment_type" and "patient_id"/"patient_ref"
+    (assessments; patient_ref names a patient created earlier in the queue).
+    Items already applied under the same key are replayed, not re-inserted,
+    so the whole batch can be retried after a dropped connection. Invalid
+    items are reported and skipped; the rest are committed together.
+    """
+    admin_id = get_current_admin_id()
+    if not admin_id:
+        return unauthorized("Admin ID not found")
+
+    try:
+        batch = UploadBatchSchema(**(request.get_json(silent=True) or {}))
+    except ValidationError as e:
+        return unprocessable_entity(messages=e.errors(include_url=False, include_context=False))
+
+    max_items = current_app.config.get('UPLOAD_BATCH_MAX', 500)
+    if not batch.items:
+        return bad_request("'items' must not be empty")
+    if len(batch.items) > max_items:
+        return bad_request(f"At most {max_items} items per batch")
+
+    upload = _UploadBatch(admin_id)
+    results = []
+    try:
+        for index, item in enumerate(batch.items):
+            outcome = upload.apply(item)
+            results.append({"index": index, "key": item.key, "ref": item.ref, **outcome})
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error applying upload batch for admin {admin_id}: {e}")
+        # Nothing was applied; the whole batch can be retried
+        return server_error("Upload batch failed; no items were applied")
+
+    summary = {name: sum(1 for r in results if r["outcome"] == name) for name in ("created", "replayed", "failed")}
+    current_app.logger.info(f"Admin {admin_id} uploaded a batch of {len(results)} items: {summary}")
+    return ok({"results": results, "summary": summary})
@@ -0,0 +1,115 @@
+# HealthCare App/medml-backend/app/compression.py
+"""
+Negotiated response compression (brotli / gzip).
+
+An after_request hook compresses successful responses when:
+
+- the mimetype is textual (JSON, NDJSON, CSV, text/*) or MessagePack -
+  Parquet, Arrow, PDF and ZIP bodies are already compact or compressed and
+  are left alone,
+- the body is at least COMPRESS_MIN_SIZE bytes (small bodies gain nothing),
+- the client's Accept-Encoding allows it. br is preferred when the brotli
+  package is installed and the client accepts it, otherwise gzip.
+
+Streamed responses (the directory export) are compressed chunk by chunk and
+flushed after every chunk, so they stay streamed. Compressing turns a strong
+ETag into a weak one, as the bytes now depend on the encoding.
+"""
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/x-msgpack",
+    "application/javascript",
+    "text/csv",
+    "text/plain",
+    "text/html",
+}
+
+
+def supported_encodings():
+    """Encodings this server can produce, in order of preference."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def _compressible(response) -> bool:
+    if response.status_code < 200 or response.status_code >= 300 or response.status_code in (204, 206):
+        return False
+    if response.direct_passthrough or "Content-Encoding" in response.headers:
+        return False
+    return response.mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def compress_bytes(data: bytes, encoding: str, gzip_level: int = 6, br_quality: int = 5) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=br_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def _compress_stream(chunks, encoding: str, gzip_level: int, br_quality: int):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=br_quality)
+        for chunk in chunks:
+            if chunk:
+                compressor.process(chunk)
+                yield compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # wbits=31: gzip container
+        for chunk in chunks:
+            if chunk:
+                yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+def _weaken_etag(response):
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def compress_response(response, min_size: int = 1024, gzip_level: int = 6, br_quality: int = 5):
+    """Compresses `response` in place if eligible; returns it."""
+    if not _compressible(response):
+        return response
+
+    streamed = response.is_streamed
+    if not streamed and response.calculate_content_length() < min_size:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match(supported_encodings())
+    if encoding is None:
+        return response
+
+    if streamed:
+        response.response = _compress_stream(response.response, encoding, gzip_level, br_quality)
+        response.headers.pop("Content-Length", None)
+    else:
+        response.set_data(compress_bytes(response.get_data(), encoding, gzip_level, br_quality))
+    response.headers["Content-Encoding"] = encoding
+    _weaken_etag(response)
+    return response
+
+
+def init_compression(app):
+    if not app.config.get("COMPRESS_ENABLED", True):
+        return
+
+    @app.after_request
+    def _compress(response):
+        return compress_response(
+            response,
+            min_size=app.config.get("COMPRESS_MIN_SIZE", 1024),
+            gzip_level=app.config.get("COMPRESS_GZIP_LEVEL", 6),
+            br_quality=app.config.get("COMPRESS_BR_QUALITY", 5),
+        )
@@ -0,0 +1,122 @@
+# HealthCare App/medml-backend/app/conditional.py
+"""
+Conditional GET (ETag / Last-Modified) for patient-scoped resources.
+
+A resource's validator is computed from a few indexed aggregates instead of
+the payload itself:
+
+- patient detail: Patient.updated_at plus the newest id of each assessment
+  table, of consultation notes and of risk predictions,
+- latest prediction and recommendations: the latest prediction id.
+
+Endpoints compute the version first and return 304 Not Modified before
+loading or serializing anything when the client's If-None-Match (or
+If-Modified-Since) still matches.
+"""
+import hashlib
+from datetime import timezone
+from typing import Optional
+
+from flask import request, make_response
+from sqlalchemy import func, select
+
+from app.extensions import db
+from app.representations import representation
+from app.models import (
+    Patient, DiabetesAssessment, LiverAssessment, HeartAssessment, MentalHealthAssessment,
+    RiskPrediction, ConsultationNote
+)
+
+_HISTORY_SOURCES = (
+    (DiabetesAssessment, DiabetesAssessment.assessed_at),
+    (LiverAssessment, LiverAssessment.assessed_at),
+    (HeartAssessment, HeartAssessment.assessed_at),
+    (MentalHealthAssessment, MentalHealthAssessment.assessed_at),
+    (ConsultationNote, ConsultationNote.created_at),
+    (RiskPrediction, RiskPrediction.predicted_at),
+)
+
+
+class ResourceVersion:
+    def __init__(self, parts, last_modified=None):
+        self.parts = [str(p) for p in parts]
+        self.last_modified = last_modified
+
+    @property
+    def etag(self) -> str:
+        # Representation also depends on the query (fields/include, paging...)
+        # and on the negotiated format (JSON / MessagePack)
+        raw = "|".join(self.parts + [request.query_string.decode('utf-8', 'replace'), representation()])
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:24]
+
+
+def _latest(column, patient_column, patient_id):
+    return select(func.max(column)).where(patient_column == patient_id).scalar_subquery()
+
+
+def patient_version(patient_id: int) -> Optional[ResourceVersion]:
+    """Version of the full patient record (profile, history, notes, predictions). None if no patient."""
+    columns = [Patient.updated_at, Patient.created_at]
+    for model, ts_column in _HISTORY_SOURCES:
+        columns.append(_latest(model.id, model.patient_id, patient_id))
+        columns.append(_latest(ts_column, model.patient_id, patient_id))
+
+    row = db.session.execute(select(*columns).where(Patient.id == patient_id)).first()
+    if row is None:
+        return None
+    row = tuple(row)
+    timestamps = [v for v in row[0:2] + row[3::2] if v is not None]
+    return ResourceVersion(
+        ["patient", patient_id, row[0] or row[1]] + list(row[2::2]),
+        last_modified=max(timestamps) if timestamps else None,
+    )
+
+
+def prediction_version(patient_id: int, kind: str) -> ResourceVersion:
+    """Version of a resource derived from the latest prediction only."""
+    row = db.session.execute(
+        select(RiskPrediction.id, RiskPrediction.predicted_at)
+        .where(RiskPrediction.patient_id == patient_id)
+        .order_by(RiskPrediction.predicted_at.desc(), RiskPrediction.id.desc())
+        .limit(1)
+    ).first()
+    if row is None:
+        return ResourceVersion([kind, patient_id, None])
+    return ResourceVersion([kind, patient_id, row.id], last_modified=row.predicted_at)
+
+
+def _as_utc(dt):
+    if dt is None:
+        return None
+    # Stored timestamps are naive UTC; HTTP dates have second precision
+    return dt.replace(tzinfo=timezone.utc, microsecond=0) if dt.tzinfo is None else dt.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def not_modified(version: ResourceVersion):
+    """Returns a 304 response if the request's validators match `version`, else None."""
+    if request.if_none_match:
+        # Weak comparison: compressed responses carry W/"..." validators
+        if request.if_none_match.contains_weak(version.etag):
+            return _with_validators(make_response('', 304), version)
+        return None
+    last_modified = _as_utc(version.last_modified)
+    if request.if_modified_since and last_modified and last_modified <= request.if_modified_since:
+        return _with_validators(make_response('', 304), version)
+    return None
+
+
+def _with_validators(response, version: ResourceVersion):
+    response.set_etag(version.etag)
+    if version.last_modified is not None:
+        response.last_modified = _as_utc(version.last_modified)
+    # Clients may keep the response but must revalidate before reuse
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def add_validators(rv, version: ResourceVersion):
+    """Adds ETag/Last-Modified to a view return value such as ok(...)."""
+    response = make_response(rv)
+    if response.status_code == 200:
+        _with_validators(response, version)
+    return response
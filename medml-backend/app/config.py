@@ -48,6 +48,18 @@ class Config:
         
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.environ.get('JWT_ACCESS_TOKEN_EXPIRES_MIN', 15)))
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.environ.get('JWT_REFRESH_TOKEN_EXPIRES_DAYS', 30)))
+
+    # --- ADDED: Password hashing pool ---
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12)) # Work factor; old hashes are upgraded on login
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+    PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 32))
+    PASSWORD_HASH_TIMEOUT = int(os.environ.get('PASSWORD_HASH_TIMEOUT_SEC', 30))
+
+    # --- ADDED: Revoked-token cache ---
+    # Append-only file shared by all workers on this host to broadcast revocations
+    REVOCATION_SIGNAL_FILE = os.environ.get('REVOCATION_SIGNAL_FILE', os.path.join(BASE_DIR, 'token_revocations.signal'))
+    REVOCATION_PURGE_INTERVAL = int(os.environ.get('REVOCATION_PURGE_INTERVAL_SEC', 3600)) # In-memory pruning; DB purge: token_maintenance.py
+    REVOCATION_WARM_RETRY_MAX = int(os.environ.get('REVOCATION_WARM_RETRY_MAX_SEC', 300)) # Backoff cap for failed cache warms
     
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
     if not GEMINI_API_KEY:
@@ -60,6 +72,78 @@ class Config:
         'high': 0.70  # Example: 0.70+
     }
 
+    # --- ADDED: History paging ---
+    HISTORY_PAGE_SIZE = int(os.environ.get('HISTORY_PAGE_SIZE', 20))
+    HISTORY_PAGE_MAX = int(os.environ.get('HISTORY_PAGE_MAX', 100))
+    DIRECTORY_PAGE_SIZE = int(os.environ.get('DIRECTORY_PAGE_SIZE', 50)) # Admin patient directory table
+    DIRECTORY_PAGE_MAX = int(os.environ.get('DIRECTORY_PAGE_MAX', 200))
+
+    # --- ADDED: JSON encoding and response compression ---
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'orjson') # 'orjson' or 'default' (stdlib)
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024)) # Bytes; smaller bodies are sent as-is
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BR_QUALITY = int(os.environ.get('COMPRESS_BR_QUALITY', 5))
+    MSGPACK_ENABLED = os.environ.get('MSGPACK_ENABLED', 'true').lower() == 'true' # Serve application/x-msgpack when asked
+
+    # --- ADDED: Delta sync ---
+    SYNC_BATCH_SIZE = int(os.environ.get('SYNC_BATCH_SIZE', 500)) # Changed rows per /sync/changes batch
+    SYNC_BATCH_MAX = int(os.environ.get('SYNC_BATCH_MAX', 2000))
+    SYNC_COMPACT_AFTER_DAYS = int(os.environ.get('SYNC_COMPACT_AFTER_DAYS', 30)) # Superseded change_log entries older than this are dropped
+
+    # --- ADDED: Offline uploads ---
+    UPLOAD_BATCH_MAX = int(os.environ.get('UPLOAD_BATCH_MAX', 500)) # Items per /uploads/batch request
+    IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 24 * 14)) # Devices may stay offline for days
+
+    # --- ADDED: Transactional outbox ---
+    OUTBOX_ENABLED = os.environ.get('OUTBOX_ENABLED', 'true').lower() == 'true'
+    OUTBOX_SINKS = os.environ.get('OUTBOX_SINKS', '') # Comma-separated: webhook, file, sqlite_queue
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 200))
+    OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL_SEC', 2))
+    OUTBOX_RETENTION_DAYS = int(os.environ.get('OUTBOX_RETENTION_DAYS', 7)) # Delivered events older than this are pruned
+    OUTBOX_WEBHOOK_URL = os.environ.get('OUTBOX_WEBHOOK_URL')
+    OUTBOX_WEBHOOK_SECRET = os.environ.get('OUTBOX_WEBHOOK_SECRET') # Signs bodies (X-MedML-Signature)
+    OUTBOX_WEBHOOK_TIMEOUT = int(os.environ.get('OUTBOX_WEBHOOK_TIMEOUT_SEC', 10))
+    OUTBOX_FILE_PATH = os.environ.get('OUTBOX_FILE_PATH', os.path.join(BASE_DIR, 'outbox', 'events.ndjson'))
+    OUTBOX_QUEUE_PATH = os.environ.get('OUTBOX_QUEUE_PATH', os.path.join(BASE_DIR, 'outbox', 'queue.db'))
+    # Optional per-sink event filters, e.g. OUTBOX_WEBHOOK_EVENTS=prediction.created,patient.risk_escalated
+    OUTBOX_WEBHOOK_EVENTS = os.environ.get('OUTBOX_WEBHOOK_EVENTS')
+    OUTBOX_FILE_EVENTS = os.environ.get('OUTBOX_FILE_EVENTS')
+    OUTBOX_SQLITE_QUEUE_EVENTS = os.environ.get('OUTBOX_SQLITE_QUEUE_EVENTS')
+
+    # --- ADDED: Background jobs (job_worker.py) ---
+    JOBS_WORKER_PROCESSES = int(os.environ.get('JOBS_WORKER_PROCESSES', 2))
+    JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', 1.0)) # Seconds a worker sleeps when idle
+    JOBS_LEASE_SECONDS = int(os.environ.get('JOBS_LEASE_SECONDS', 600)) # A running job is requeued after this
+    JOBS_BACKOFF_BASE = float(os.environ.get('JOBS_BACKOFF_BASE', 10.0)) # Seconds before the first retry, doubling
+    JOBS_BACKOFF_MAX = float(os.environ.get('JOBS_BACKOFF_MAX', 3600.0))
+    JOBS_RETENTION_DAYS = int(os.environ.get('JOBS_RETENTION_DAYS', 7)) # Finished jobs kept for status lookups
+
+    # --- ADDED: Auto-scoring after assessment submission (needs job_worker.py) ---
+    AUTO_SCORE_ENABLED = os.environ.get('AUTO_SCORE_ENABLED', 'false').lower() == 'true'
+    AUTO_SCORE_DELAY_SECONDS = float(os.environ.get('AUTO_SCORE_DELAY_SECONDS', 10)) # Quiet period before scoring
+    AUTO_SCORE_MAX_DELAY_SECONDS = float(os.environ.get('AUTO_SCORE_MAX_DELAY_SECONDS', 120)) # Cap while submissions keep coming
+
+    # --- ADDED: Worker processes for cohort (batch) PDF rendering ---
+    REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', os.cpu_count() or 2))
+    COHORT_PROGRESS_INTERVAL = float(os.environ.get('COHORT_PROGRESS_INTERVAL', 2.0)) # Seconds between progress writes
+
+    # --- ADDED: Asynchronous report jobs ---
+    REPORT_JOB_WORKERS = int(os.environ.get('REPORT_JOB_WORKERS', 2))
+    REPORT_JOB_BACKEND = os.environ.get('REPORT_JOB_BACKEND', 'thread') # 'thread' (in-process pool) or 'queue' (job workers)
+    REPORT_JOB_TTL = timedelta(minutes=int(os.environ.get('REPORT_JOB_TTL_MIN', 60)))
+    REPORT_JOB_TIMEOUT_SECONDS = int(os.environ.get('REPORT_JOB_TIMEOUT_SECONDS', 1800)) # Queued/running longer than this: failed
+    REPORT_JOB_SWEEP_INTERVAL = float(os.environ.get('REPORT_JOB_SWEEP_INTERVAL', 600)) # Seconds between in-app stale/expiry sweeps (0: off)
+    REPORT_ARTIFACT_DIR = os.environ.get('REPORT_ARTIFACT_DIR', os.path.join(BASE_DIR, 'report_artifacts'))
+
+    # --- ADDED: Share links ---
+    SHARE_LINK_TTL_DAYS = int(os.environ.get('SHARE_LINK_TTL_DAYS', 7))
+    SHARE_LINK_MAX_TTL_DAYS = int(os.environ.get('SHARE_LINK_MAX_TTL_DAYS', 30))
+    SHARE_BASE_URL = os.environ.get('SHARE_BASE_URL') # Defaults to the request host
+
+    # --- ADDED: Streaming data exports ---
+    EXPORT_BATCH_ROWS = int(os.environ.get('EXPORT_BATCH_ROWS', 50000)) # Rows per Parquet row group / Arrow batch
+
 class DevelopmentConfig(Config):
     DEBUG = True
     # Database URI is inherited from Config class
@@ -74,6 +158,10 @@ class TestingConfig(Config):
     SECRET_KEY = 'test-secret'
     JWT_SECRET_KEY = 'test-jwt-secret'
     GEMINI_API_KEY = 'test-gemini-key' # Use a dummy key for testing
+    REVOCATION_SIGNAL_FILE = None # Single process, no cross-worker signalling
+    BCRYPT_LOG_ROUNDS = 4 # Fast hashing for tests
+    PASSWORD_HASH_WORKERS = 0 # Hash inline
+    REPORT_JOB_SWEEP_INTERVAL = 0 # No background sweep timer
 
 class ProductionConfig(Config):
     DEBUG = False
@@ -0,0 +1,121 @@
+# HealthCare App/medml-backend/app/directory.py
+"""
+Paged patient directory for the admin table.
+
+Rows have the same shape as the directory export (app.exports): one per
+patient, with the latest prediction's risk levels. Pages are keyset
+paginated on (sort column, id), so each page is an index range scan of
+`limit` rows whatever its position. Each row's latest prediction is
+looked up with a correlated max(id) on the patient's predictions index
+instead of grouping the whole risk_predictions table.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, or_, select, tuple_, type_coerce, literal, String
+
+from app.extensions import db
+from app.models import Patient, RiskPrediction, User
+from app.exports import _directory_row
+from app.reporting import DISEASE_KEYS
+
+# sort key -> column; '-' prefix sorts descending. Timestamps are compared
+# as stored text, like the timeline cursors.
+DIRECTORY_SORTS = {
+    "created_at": type_coerce(Patient.created_at, String),
+    "name": Patient.name,
+    "age": Patient.age,
+    "patient_id": Patient.id,
+}
+DEFAULT_DIRECTORY_SORT = "-created_at"
+RISK_LEVELS = ("High", "Medium", "Low")
+
+
+def parse_directory_sort(raw: str) -> Tuple[str, bool]:
+    """Returns (sort key, descending). Raises ValueError for unknown keys."""
+    key, descending = raw.lstrip('-'), raw.startswith('-')
+    if key not in DIRECTORY_SORTS:
+        raise ValueError(f"'sort' must be one of: {', '.join(DIRECTORY_SORTS)} (prefix '-' for descending)")
+    return key, descending
+
+
+def _latest_prediction_id():
+    return (
+        select(func.max(RiskPrediction.id))
+        .where(RiskPrediction.patient_id == Patient.id)
+        .correlate(Patient)
+        .scalar_subquery()
+    )
+
+
+def directory_query(disease: Optional[str] = None, risk_level: Optional[str] = None,
+                    search: Optional[str] = None, state_name: Optional[str] = None,
+                    facility_name: Optional[str] = None):
+    """
+    Directory rows matching the filters, unordered. risk_level and disease
+    apply to each patient's latest prediction, as in cohort reports: with no
+    disease, risk_level matches any of the four; disease alone keeps patients
+    scored for it. search matches part of the name or the start of the ABHA ID.
+    """
+    query = (
+        select(
+            Patient.id.label("patient_id"),
+            Patient.name,
+            Patient.abha_id,
+            Patient.age,
+            Patient.gender,
+            Patient.height,
+            Patient.weight,
+            Patient.state_name,
+            User.facility_name,
+            Patient.created_at,
+            RiskPrediction.predicted_at.label("latest_predicted_at"),
+            RiskPrediction.diabetes_risk_level,
+            RiskPrediction.liver_risk_level,
+            RiskPrediction.heart_risk_level,
+            RiskPrediction.mental_health_risk_level,
+        )
+        .outerjoin(User, User.id == Patient.created_by_admin_id)
+        .outerjoin(RiskPrediction, RiskPrediction.id == _latest_prediction_id())
+    )
+    if risk_level:
+        if disease:
+            query = query.where(getattr(RiskPrediction, f"{disease}_risk_level") == risk_level)
+        else:
+            query = query.where(or_(*[
+                getattr(RiskPrediction, f"{key}_risk_level") == risk_level for key in DISEASE_KEYS
+            ]))
+    elif disease:
+        query = query.where(getattr(RiskPrediction, f"{disease}_risk_level").isnot(None))
+    if search:
+        query = query.where(or_(Patient.name.ilike(f"%{search}%"), Patient.abha_id.like(f"{search}%")))
+    if state_name:
+        query = query.where(Patient.state_name == state_name)
+    if facility_name:
+        query = query.where(User.facility_name == facility_name)
+    return query
+
+
+def directory_page(query, limit: int, sort: str = "created_at", descending: bool = True,
+                   cursor: Optional[Sequence] = None) -> Tuple[List[dict], bool, Optional[tuple]]:
+    """
+    Returns (rows, has_more, last_key) for one page of directory_query()
+    rows. cursor is the previous page's last_key: (sort value, patient id).
+    """
+    column = DIRECTORY_SORTS[sort]
+    if cursor:
+        after = tuple_(column, Patient.id)
+        bound = tuple_(literal(cursor[0], column.type), literal(cursor[1]))
+        query = query.where(after < bound if descending else after > bound)
+    order = (column.desc(), Patient.id.desc()) if descending else (column.asc(), Patient.id.asc())
+
+    fetched = db.session.execute(
+        query.add_columns(column.label("sort_value")).order_by(*order).limit(limit + 1)
+    ).all()
+    has_more = len(fetched) > limit
+    fetched = fetched[:limit]
+    last_key = (fetched[-1].sort_value, fetched[-1].patient_id) if has_more else None
+    return [_directory_row(row) for row in fetched], has_more, last_key
+
+
+def directory_count(query) -> int:
+    return db.session.execute(select(func.count()).select_from(query.subquery())).scalar_one()
@@ -0,0 +1,280 @@
+# HealthCare App/medml-backend/app/exports.py
+"""
+Streaming data exports.
+
+Columnar export (Parquet / Arrow IPC stream) of the assessment tables and
+risk_predictions, each joined to patient demographics, for model retraining:
+
+- rows are read through a streaming cursor (stream_results / yield_per) in
+  batches of EXPORT_BATCH_ROWS and each batch becomes one Parquet row group
+  or Arrow record batch, so memory stays bounded by one batch,
+- the bytes written for each batch are yielded straight away, so the same
+  generator feeds an HTTP response or a file,
+- exports are incremental by primary key: rows with since_id < id <= watermark,
+  where the watermark is the table's max id when the export starts. Passing
+  the watermark back as since_id next time picks up only new rows.
+
+pyarrow is only needed for these exports; the rest of the app runs without it.
+
+Patient directory export (NDJSON / CSV): one row per patient with the
+latest risk levels joined in, read from a streaming cursor and encoded
+batch by batch, so the response never holds the whole registry.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from sqlalchemy import func, select, Boolean, DateTime, Float, Integer, String, Text
+
+from app.extensions import db
+from app.models import (
+    DiabetesAssessment, LiverAssessment, HeartAssessment, MentalHealthAssessment,
+    RiskPrediction, Patient, User
+)
+from app.reporting import latest_prediction_subquery
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+EXPORT_TABLES = {
+    "diabetes_assessments": DiabetesAssessment,
+    "liver_assessments": LiverAssessment,
+    "heart_assessments": HeartAssessment,
+    "mental_health_assessments": MentalHealthAssessment,
+    "risk_predictions": RiskPrediction,
+}
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+class ExportUnavailable(Exception):
+    """Raised when pyarrow is not installed."""
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ExportUnavailable("Columnar exports require pyarrow (pip install pyarrow)")
+
+
+def _demographic_columns():
+    return [
+        Patient.age.label("patient_age"),
+        Patient.gender.label("patient_gender"),
+        Patient.height.label("patient_height"),
+        Patient.weight.label("patient_weight"),
+        Patient.state_name.label("patient_state_name"),
+        User.facility_name.label("facility_name"),
+    ]
+
+
+def _arrow_type(sql_type):
+    if isinstance(sql_type, Boolean):
+        return pa.bool_()
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    if isinstance(sql_type, Float):
+        return pa.float64()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(sql_type, (String, Text)):
+        return pa.string()
+    raise TypeError(f"No Arrow type for {sql_type!r}")
+
+
+def export_select(model, since_id: Optional[int] = None, watermark: Optional[int] = None):
+    """SELECT of the table's columns plus demographics, ordered by id."""
+    table = model.__table__
+    query = (
+        select(*table.columns, *_demographic_columns())
+        .join(Patient, Patient.id == table.c.patient_id)
+        .outerjoin(User, User.id == Patient.created_by_admin_id)
+    )
+    if since_id is not None:
+        query = query.where(table.c.id > since_id)
+    if watermark is not None:
+        query = query.where(table.c.id <= watermark)
+    return query.order_by(table.c.id)
+
+
+def export_schema(model, watermark: Optional[int] = None):
+    require_pyarrow()
+    fields = [pa.field(col.name, _arrow_type(col.type)) for col in model.__table__.columns]
+    fields += [pa.field(col.name, _arrow_type(col.type)) for col in _demographic_columns()]
+    metadata = {"table": model.__tablename__}
+    if watermark is not None:
+        metadata["watermark"] = str(watermark)
+    return pa.schema(fields, metadata=metadata)
+
+
+def current_watermark(model) -> int:
+    """Highest id currently in the table (0 if empty)."""
+    return db.session.query(func.coalesce(func.max(model.id), 0)).scalar()
+
+
+def count_rows(model, since_id: Optional[int], watermark: int) -> int:
+    query = db.session.query(func.count(model.id)).filter(model.id <= watermark)
+    if since_id is not None:
+        query = query.filter(model.id > since_id)
+    return query.scalar()
+
+
+class _ChunkSink:
+    """Write-only file object that buffers bytes until drained."""
+    def __init__(self):
+        self._chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_record_batches(model, schema, since_id: Optional[int], watermark: int, batch_rows: int):
+    """Yields pyarrow RecordBatches of at most batch_rows rows from a streaming cursor."""
+    query = export_select(model, since_id, watermark).execution_options(stream_results=True, yield_per=batch_rows)
+    result = db.session.execute(query)
+    try:
+        for rows in result.partitions(batch_rows):
+            columns = list(zip(*rows))
+            yield pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            )
+    finally:
+        result.close()
+
+
+def stream_columnar_export(model, fmt: str, since_id: Optional[int] = None, watermark: Optional[int] = None,
+                           batch_rows: int = 50000) -> Iterator[bytes]:
+    """
+    Yields the encoded export (Parquet file or Arrow IPC stream) chunk by chunk.
+    Each batch of rows becomes one row group / record batch.
+    """
+    require_pyarrow()
+    if watermark is None:
+        watermark = current_watermark(model)
+    schema = export_schema(model, watermark)
+    sink = _ChunkSink()
+
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="snappy")
+        write = writer.write_batch
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+
+    try:
+        for batch in iter_record_batches(model, schema, since_id, watermark, batch_rows):
+            write(batch)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        # Writes the Parquet footer / Arrow end-of-stream marker
+        writer.close()
+    yield sink.drain()
+
+
+# --- Patient directory (NDJSON / CSV) ---
+
+DIRECTORY_FORMATS = {
+    "application/x-ndjson": "ndjson",
+    "text/csv": "csv",
+}
+
+DIRECTORY_COLUMNS = [
+    "patient_id", "name", "abha_id", "age", "gender", "height", "weight", "bmi",
+    "state_name", "facility_name", "created_at", "latest_predicted_at",
+    "diabetes_risk_level", "liver_risk_level", "heart_risk_level", "mental_health_risk_level",
+]
+
+
+def directory_select(state_name: Optional[str] = None, facility_name: Optional[str] = None):
+    """One row per patient with the latest prediction's risk levels (NULL if none)."""
+    latest = latest_prediction_subquery()
+    query = (
+        select(
+            Patient.id.label("patient_id"),
+            Patient.name,
+            Patient.abha_id,
+            Patient.age,
+            Patient.gender,
+            Patient.height,
+            Patient.weight,
+            Patient.state_name,
+            User.facility_name,
+            Patient.created_at,
+            RiskPrediction.predicted_at.label("latest_predicted_at"),
+            RiskPrediction.diabetes_risk_level,
+            RiskPrediction.liver_risk_level,
+            RiskPrediction.heart_risk_level,
+            RiskPrediction.mental_health_risk_level,
+        )
+        .outerjoin(User, User.id == Patient.created_by_admin_id)
+        .outerjoin(latest, latest.c.patient_id == Patient.id)
+        .outerjoin(RiskPrediction, RiskPrediction.id == latest.c.prediction_id)
+    )
+    if state_name:
+        query = query.where(Patient.state_name == state_name)
+    if facility_name:
+        query = query.where(User.facility_name == facility_name)
+    return query.order_by(Patient.id)
+
+
+def _directory_row(row) -> dict:
+    data = dict(row._mapping)
+    height, weight = data["height"], data["weight"]
+    # Same formula as Patient.bmi
+    data["bmi"] = round(weight / ((height / 100.0) ** 2), 2) if height and weight and height > 0 else None
+    for key in ("created_at", "latest_predicted_at"):
+        if isinstance(data[key], datetime):
+            data[key] = data[key].isoformat()
+    return {column: data[column] for column in DIRECTORY_COLUMNS}
+
+
+def iter_directory_batches(query, batch_rows: int) -> Iterator[List[dict]]:
+    """Yields lists of at most batch_rows directory rows from a streaming cursor."""
+    result = db.session.execute(query.execution_options(stream_results=True, yield_per=batch_rows))
+    try:
+        for rows in result.partitions(batch_rows):
+            yield [_directory_row(row) for row in rows]
+    finally:
+        result.close()
+
+
+def stream_directory(query, fmt: str, batch_rows: int = 5000) -> Iterator[bytes]:
+    """Encodes the directory as NDJSON or CSV (with header), one chunk per batch."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=DIRECTORY_COLUMNS)
+        writer.writeheader()
+        yield buffer.getvalue().encode("utf-8")
+        for batch in iter_directory_batches(query, batch_rows):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(batch)
+            yield buffer.getvalue().encode("utf-8")
+    else:
+        for batch in iter_directory_batches(query, batch_rows):
+            yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in batch).encode("utf-8")
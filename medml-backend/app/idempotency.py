@@ -0,0 +1,107 @@
+# HealthCare App/medml-backend/app/idempotency.py
+"""
+Idempotency keys for retried writes.
+
+A client that may retry a write (e.g. a field device replaying its offline
+queue over a flaky link) sends an `Idempotency-Key` header, unique per
+logical request. The first time, the write and the key's stored response are
+committed in the same transaction; a retry with the same key and the same
+request gets the stored response back (with `Idempotent-Replayed: true`)
+without writing again. Reusing a key for a different request is an error.
+
+Keys are scoped per caller and kept for IDEMPOTENCY_KEY_TTL_HOURS
+(purge_idempotency_keys()).
+"""
+import hashlib
+import json
+from datetime import timedelta
+from typing import Optional, Tuple
+
+from flask import current_app, request
+
+from app.extensions import db
+from app.json_provider import encode_default
+from app.models import IdempotencyKey, utcnow
+from app.representations import msgpack_response, wants_msgpack
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 100
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a different request."""
+
+
+def request_fingerprint(method: str, path: str, payload) -> str:
+    canonical = json.dumps([method.upper(), path, payload], sort_keys=True, separators=(',', ':'),
+                           default=encode_default)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def find_stored(scope: str, key: str, fingerprint: str) -> Optional[Tuple[int, dict]]:
+    """(status, body) stored for the key, or None. Raises IdempotencyKeyReused on a fingerprint mismatch."""
+    record = IdempotencyKey.query.filter_by(scope=scope, key=key).first()
+    if record is None:
+        return None
+    if record.request_hash != fingerprint:
+        raise IdempotencyKeyReused(f"{IDEMPOTENCY_HEADER} '{key}' was already used for a different request")
+    return record.status_code, json.loads(record.response_body)
+
+
+def store(scope: str, key: str, fingerprint: str, status: int, body: dict):
+    """Adds the outcome to the session; it commits with the caller's write."""
+    db.session.add(IdempotencyKey(
+        scope=scope,
+        key=key,
+        request_hash=fingerprint,
+        status_code=status,
+        response_body=json.dumps(body, default=encode_default),
+    ))
+
+
+class IdempotentRequest:
+    """The current request's Idempotency-Key, fingerprinted with its method, path and JSON body."""
+
+    def __init__(self, scope: str, key: str, fingerprint: str):
+        self.scope = scope
+        self.key = key
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def from_request(cls, scope: str) -> Optional['IdempotentRequest']:
+        """None if the request has no key. Raises ValueError for a malformed key."""
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return None
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise ValueError(f"{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters")
+        payload = request.get_json(silent=True)
+        return cls(scope, key, request_fingerprint(request.method, request.path, payload))
+
+    def stored_response(self):
+        """Replay response for a key seen before, else None. Raises IdempotencyKeyReused."""
+        stored = find_stored(self.scope, self.key, self.fingerprint)
+        if stored is None:
+            return None
+        status, body = stored
+        response = msgpack_response(body) if wants_msgpack() else current_app.json.response(body)
+        response.status_code = status
+        response.headers[REPLAYED_HEADER] = 'true'
+        return response
+
+    def remember(self, status: int, body: dict):
+        store(self.scope, self.key, self.fingerprint, status, body)
+
+
+def purge_idempotency_keys(ttl_hours: int) -> int:
+    """Deletes keys older than ttl_hours. Commits; returns the number removed."""
+    cutoff = utcnow() - timedelta(hours=ttl_hours)
+    try:
+        removed = IdempotencyKey.query.filter(IdempotencyKey.created_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return removed
@@ -0,0 +1,367 @@
+# HealthCare App/medml-backend/app/jobs.py
+"""
+Background jobs.
+
+Slow work (risk predictions, Gemini recommendations, PDF rendering) can be
+queued in the background_jobs table of the app database and run by worker
+processes (job_worker.py) instead of inside the request. No external broker
+is needed:
+
+- tasks register with @task(name, lane=..., max_attempts=...) (see
+  app.tasks); enqueue() adds a job to the caller's session, so it is
+  committed or rolled back together with the write that asked for it,
+- lanes are priorities: a worker always takes the oldest due job of the
+  highest lane it serves, and workers can be dedicated to lanes
+  (job_worker.py --lanes high) so a backlog of reports never holds up
+  predictions,
+- with a unique_key, a job still waiting in the queue is reused rather than
+  duplicated; with debounce it is also postponed, so a burst of enqueues
+  runs once, after the burst,
+- a job is claimed with one conditional UPDATE, so several worker processes
+  can share the queue. The claim is a lease (JOBS_LEASE_SECONDS): jobs of a
+  worker that died are put back in the queue,
+- a failing job is retried with exponential backoff until max_attempts;
+  a task raises PermanentJobError to fail at once.
+
+Payloads and results are stored as JSON.
+"""
+import json
+import math
+import os
+import random
+import socket
+import time
+import uuid
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import aliased
+
+from app.extensions import db
+from app.json_provider import encode_default
+from app.models import BackgroundJob, utcnow
+
+# Lane -> priority (lower runs first)
+LANES = {'high': 0, 'default': 1, 'low': 2}
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+
+class PermanentJobError(Exception):
+    """Raised by a task to fail its job without retrying."""
+
+
+class TaskSpec:
+    def __init__(self, name: str, fn: Callable, lane: str, max_attempts: int):
+        self.name = name
+        self.fn = fn
+        self.lane = lane
+        self.max_attempts = max_attempts
+
+
+TASKS: Dict[str, TaskSpec] = {}
+
+
+def task(name: str, lane: str = 'default', max_attempts: int = 3):
+    """Registers the decorated function as task `name`; it is called with the job payload as keyword arguments."""
+    if lane not in LANES:
+        raise ValueError(f"Unknown lane '{lane}'")
+
+    def decorator(fn):
+        TASKS[name] = TaskSpec(name, fn, lane, max_attempts)
+        return fn
+    return decorator
+
+
+def _jsonable(value):
+    return json.loads(json.dumps(value, default=encode_default))
+
+
+# --- Queueing ---
+
+def enqueue(task_name: str, payload: Optional[dict] = None, lane: Optional[str] = None,
+            delay: float = 0, unique_key: Optional[str] = None, patient_id: Optional[int] = None,
+            identity: Optional[dict] = None, max_attempts: Optional[int] = None,
+            debounce: bool = False, max_delay: Optional[float] = None) -> BackgroundJob:
+    """
+    Adds a job to the session; it is queued when the caller commits. With
+    unique_key, a job still queued under the same key is returned instead of
+    adding another one. With debounce, that job is also pushed back to run
+    `delay` seconds from now, so a burst of calls runs it once after the
+    burst; max_delay caps how far past its first enqueue it can be pushed.
+    """
+    spec = TASKS.get(task_name)
+    if spec is None:
+        raise ValueError(f"Unknown task '{task_name}'")
+    lane = lane or spec.lane
+    if lane not in LANES:
+        raise ValueError(f"Unknown lane '{lane}'")
+
+    if unique_key:
+        existing = BackgroundJob.query.filter_by(unique_key=unique_key, status='queued').first()
+        if existing is not None and (not debounce or _postpone(existing, delay, max_delay)):
+            return existing
+
+    identity = identity or {}
+    job = BackgroundJob(
+        id=uuid.uuid4().hex,
+        task=task_name,
+        payload=_jsonable(payload or {}),
+        lane=lane,
+        priority=LANES[lane],
+        unique_key=unique_key,
+        patient_id=patient_id,
+        requested_by_id=identity.get('id'),
+        requested_by_role=identity.get('role'),
+        status='queued',
+        attempts=0,
+        max_attempts=max_attempts or spec.max_attempts,
+        run_at=utcnow() + timedelta(seconds=delay),
+    )
+    db.session.add(job)
+    return job
+
+
+def _postpone(job: BackgroundJob, delay: float, max_delay: Optional[float]) -> bool:
+    """
+    Pushes a queued job back to run `delay` seconds from now. False if a
+    worker claimed it meanwhile: it may not see the caller's write, so the
+    caller needs a new job.
+    """
+    run_at = utcnow() + timedelta(seconds=delay)
+    if max_delay is not None:
+        run_at = min(run_at, job.created_at + timedelta(seconds=max_delay))
+    result = db.session.execute(
+        update(BackgroundJob)
+        .where(BackgroundJob.id == job.id, BackgroundJob.status == 'queued')
+        .values(run_at=max(job.run_at, run_at))
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        db.session.expire(job, ['run_at'])
+    return bool(result.rowcount)
+
+
+def get_job(job_id: str) -> Optional[BackgroundJob]:
+    return db.session.get(BackgroundJob, job_id)
+
+
+def wait_for_job(job_id: str, timeout: float, poll_interval: float = 0.5) -> Optional[BackgroundJob]:
+    """Blocks until the job finishes or `timeout` seconds pass."""
+    if not math.isfinite(timeout):
+        raise ValueError("timeout must be a finite number of seconds")
+    deadline = time.monotonic() + timeout
+    while True:
+        job = get_job(job_id)
+        if job is None or job.status in FINISHED_STATUSES or time.monotonic() >= deadline:
+            return job
+        time.sleep(poll_interval)
+        # End the read transaction so the next poll sees the worker's commit
+        db.session.rollback()
+
+
+def cancel_job(job: BackgroundJob) -> bool:
+    """Cancels a job that has not started. Commits; returns False if it is already running or finished."""
+    result = db.session.execute(
+        update(BackgroundJob)
+        .where(BackgroundJob.id == job.id, BackgroundJob.status == 'queued')
+        .values(status='cancelled', finished_at=utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    db.session.refresh(job)
+    return bool(result.rowcount)
+
+
+def queue_stats() -> Dict[str, Dict[str, int]]:
+    """Job counts per lane and status, e.g. {"high": {"queued": 3, "running": 1}}."""
+    rows = (
+        db.session.query(BackgroundJob.lane, BackgroundJob.status, func.count(BackgroundJob.id))
+        .group_by(BackgroundJob.lane, BackgroundJob.status)
+        .all()
+    )
+    stats = {lane: {} for lane in LANES}
+    for lane, status, count in rows:
+        stats.setdefault(lane, {})[status] = count
+    return stats
+
+
+# --- Running ---
+
+def claim_next(worker_id: str, lanes: Iterable[str], lease_seconds: int) -> Optional[BackgroundJob]:
+    """
+    Marks the next due job of the given lanes as running under a fresh claim
+    token and returns it. Commits; None if nothing is due.
+    """
+    now = utcnow()
+    token = f"{worker_id}:{uuid.uuid4().hex[:8]}"
+    candidate = aliased(BackgroundJob)
+    next_id = (
+        select(candidate.id)
+        .where(candidate.status == 'queued', candidate.run_at <= now, candidate.lane.in_(list(lanes)))
+        .order_by(candidate.priority, candidate.run_at, candidate.created_at)
+        .limit(1)
+        .scalar_subquery()
+    )
+    # One statement: the pick and the claim cannot interleave with another worker's
+    result = db.session.execute(
+        update(BackgroundJob)
+        .where(BackgroundJob.id == next_id, BackgroundJob.status == 'queued')
+        .values(
+            status='running',
+            locked_by=token,
+            locked_until=now + timedelta(seconds=lease_seconds),
+            attempts=BackgroundJob.attempts + 1,
+            started_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if not result.rowcount:
+        return None
+    return BackgroundJob.query.filter_by(locked_by=token, status='running').first()
+
+
+def backoff_delay(attempts: int, base: float, maximum: float) -> float:
+    """Exponential backoff with jitter, so jobs failing together do not retry together."""
+    return min(base * 2 ** (attempts - 1), maximum) * random.uniform(0.5, 1.0)
+
+
+def _finish(job_id: str, token: str, **values) -> bool:
+    """Updates the job only if this worker still holds it (the lease may have been taken over)."""
+    result = db.session.execute(
+        update(BackgroundJob)
+        .where(BackgroundJob.id == job_id, BackgroundJob.locked_by == token, BackgroundJob.status == 'running')
+        .values(locked_by=None, locked_until=None, **values)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return bool(result.rowcount)
+
+
+def run_job(job: BackgroundJob, backoff_base: float = 10.0, backoff_max: float = 3600.0, logger=None) -> str:
+    """Runs a claimed job and records the outcome. Returns the job's new status."""
+    job_id, token, attempts, max_attempts = job.id, job.locked_by, job.attempts, job.max_attempts
+    spec = TASKS.get(job.task)
+    try:
+        if spec is None:
+            raise PermanentJobError(f"Unknown task '{job.task}'")
+        result = spec.fn(**job.payload)
+    except Exception as e:
+        db.session.rollback()
+        error = f"{type(e).__name__}: {e}"[:2000]
+        if isinstance(e, PermanentJobError) or attempts >= max_attempts:
+            status = 'failed'
+            values = dict(status=status, last_error=error, finished_at=utcnow())
+        else:
+            status = 'queued'
+            delay = backoff_delay(attempts, backoff_base, backoff_max)
+            values = dict(status=status, last_error=error, run_at=utcnow() + timedelta(seconds=delay))
+        if _finish(job_id, token, **values) and logger:
+            if status == 'failed':
+                logger.error(f"Job {job_id} ({job.task}) failed after {attempts} attempt(s): {error}")
+            else:
+                logger.warning(f"Job {job_id} ({job.task}) failed (attempt {attempts}/{max_attempts}), "
+                               f"retrying in {delay:.0f}s: {error}")
+        return status
+
+    _finish(job_id, token, status='succeeded', result=_jsonable(result), last_error=None, finished_at=utcnow())
+    if logger:
+        logger.info(f"Job {job_id} ({spec.name}) succeeded")
+    return 'succeeded'
+
+
+def requeue_expired_jobs() -> int:
+    """
+    Returns running jobs whose lease has expired (their worker died or hung)
+    to the queue, or fails them if they have no attempts left. Commits;
+    returns the number of jobs touched.
+    """
+    now = utcnow()
+    expired = (BackgroundJob.status == 'running', BackgroundJob.locked_until < now)
+    error = 'Worker lease expired'
+    try:
+        requeued = db.session.execute(
+            update(BackgroundJob)
+            .where(*expired, BackgroundJob.attempts < BackgroundJob.max_attempts)
+            .values(status='queued', locked_by=None, locked_until=None, last_error=error, run_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        failed = db.session.execute(
+            update(BackgroundJob)
+            .where(*expired)
+            .values(status='failed', locked_by=None, locked_until=None, last_error=error, finished_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return requeued + failed
+
+
+def purge_finished_jobs(retention_days: int) -> int:
+    """Deletes finished jobs older than retention_days. Commits; returns the number removed."""
+    cutoff = utcnow() - timedelta(days=retention_days)
+    try:
+        removed = (
+            BackgroundJob.query
+            .filter(BackgroundJob.status.in_(FINISHED_STATUSES), BackgroundJob.finished_at < cutoff)
+            .delete(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return removed
+
+
+class JobWorker:
+    """Claims and runs due jobs of its lanes, highest lane first."""
+
+    def __init__(self, lanes: Optional[List[str]] = None, lease_seconds: int = 600,
+                 backoff_base: float = 10.0, backoff_max: float = 3600.0,
+                 worker_id: Optional[str] = None, logger=None):
+        self.lanes = lanes or list(LANES)
+        unknown = set(self.lanes) - set(LANES)
+        if unknown:
+            raise ValueError(f"Unknown lane(s): {', '.join(sorted(unknown))}")
+        self.lease_seconds = lease_seconds
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.logger = logger
+
+    def work_once(self) -> bool:
+        """Runs one due job. Returns False if there was none."""
+        try:
+            job = claim_next(self.worker_id, self.lanes, self.lease_seconds)
+        except OperationalError as e:
+            # e.g. SQLite busy while another process writes; try again on the next poll
+            db.session.rollback()
+            if self.logger:
+                self.logger.warning(f"Job worker {self.worker_id} could not claim a job: {e}")
+            return False
+        if job is None:
+            return False
+        run_job(job, self.backoff_base, self.backoff_max, self.logger)
+        return True
+
+    def run(self, poll_interval: float = 1.0, stop=None, drain: bool = False) -> int:
+        """
+        Runs jobs until `stop()` returns True, sleeping only when idle. With
+        drain, returns as soon as no job is due. Returns the number of jobs run.
+        """
+        ran = 0
+        while not (stop and stop()):
+            if self.work_once():
+                ran += 1
+            else:
+                requeue_expired_jobs()
+                if drain:
+                    break
+                time.sleep(poll_interval)
+            # Fresh session per job, so the next claim sees other workers' commits
+            db.session.remove()
+        return ran
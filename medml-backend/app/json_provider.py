@@ -0,0 +1,95 @@
+# HealthCare App/medml-backend/app/json_provider.py
+"""
+Pluggable JSON provider.
+
+JSON_PROVIDER selects how jsonify / request.get_json encode and decode:
+
+- 'orjson' (default when orjson is installed): several times faster than the
+  stdlib encoder on large payloads (directory pages, full patient history),
+- 'default': Flask's stdlib-based provider.
+
+Both produce the same documents: keys sorted, datetimes as ISO 8601 (the
+format the models' to_dict methods already use) rather than Flask's
+RFC 822 HTTP dates, Decimal and UUID as strings. If orjson cannot encode a
+value (e.g. an integer wider than 64 bits) the stdlib encoder is used for
+that response.
+"""
+import decimal
+import json
+import uuid
+from datetime import date, datetime, time
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def encode_default(o):
+    """Values neither encoder handles natively."""
+    if isinstance(o, (datetime, date, time)):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    if hasattr(o, "model_dump"):  # pydantic models
+        return o.model_dump(mode="json")
+    if hasattr(o, "tolist"):  # numpy scalars / arrays
+        return o.tolist()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's provider with ISO 8601 datetimes."""
+    default = staticmethod(encode_default)
+
+
+class OrjsonProvider(StdlibJSONProvider):
+    """orjson-backed provider; falls back to the stdlib encoder per call."""
+    option = None
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def _dumpb(self, obj) -> bytes:
+        try:
+            return orjson.dumps(obj, default=encode_default, option=self.option)
+        except orjson.JSONEncodeError:
+            return json.dumps(obj, default=encode_default, sort_keys=True, ensure_ascii=False).encode("utf-8")
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            # Callers asking for stdlib options (indent, separators...) get the stdlib encoder
+            return super().dumps(obj, **kwargs)
+        return self._dumpb(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumpb(obj), mimetype=self.mimetype)
+
+
+JSON_PROVIDERS = {
+    "default": StdlibJSONProvider,
+    "orjson": OrjsonProvider,
+}
+
+
+def init_json_provider(app):
+    """Installs the provider named by JSON_PROVIDER on the app."""
+    name = app.config.get("JSON_PROVIDER", "orjson")
+    if name not in JSON_PROVIDERS:
+        raise ValueError(f"Unknown JSON_PROVIDER {name!r}; choose from {', '.join(JSON_PROVIDERS)}")
+    if name == "orjson" and orjson is None:
+        app.logger.warning("orjson is not installed; using the stdlib JSON provider")
+        name = "default"
+    app.json = JSON_PROVIDERS[name](app)
+    return name
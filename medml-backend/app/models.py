@@ -1,12 +1,41 @@
 # HealthCare App/medml-backend/app/models.py
-from app.extensions import db, bcrypt
+from app.extensions import db
+from app.password_hashing import password_hasher
 from sqlalchemy.sql import func
 from sqlalchemy.ext.hybrid import hybrid_property
-from datetime import datetime
+from sqlalchemy.orm import declared_attr
+from datetime import datetime, timezone
 from sqlalchemy import CheckConstraint
 from flask import current_app
 
-class User(db.Model):
+def utcnow():
+    """Naive UTC timestamp, matching what SQLite's CURRENT_TIMESTAMP stores."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class PasswordMixin:
+    """
+    Password helpers for models with a `password_hash` column. Hashing runs
+    on the password hashing pool (see app/password_hashing.py).
+    """
+    def set_password(self, password):
+        self.password_hash = password_hasher.hash(password)
+
+    def check_password(self, password):
+        return password_hasher.verify(self.password_hash, password)
+
+    def rehash_password_if_needed(self, password):
+        """
+        Upgrades the stored hash to the configured work factor after a
+        successful login. Returns True if the hash changed (caller commits).
+        """
+        if not password_hasher.needs_rehash(self.password_hash):
+            return False
+        self.set_password(password)
+        password_hasher.record_rehash()
+        return True
+
+class User(PasswordMixin, db.Model):
     """
     Represents an Admin user (Healthcare Worker)
     """
@@ -35,11 +64,6 @@ class User(db.Model):
     consultation_notes = db.relationship('ConsultationNote', back_populates='admin')
 
 
-    def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
-
-    def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
 
     def to_dict(self):
         return {
@@ -53,7 +77,7 @@ class User(db.Model):
             "facility_name": self.facility_name
         }
 
-class Patient(db.Model):
+class Patient(PasswordMixin, db.Model):
     """
     Represents a Patient
     """
@@ -73,7 +97,7 @@ class Patient(db.Model):
     created_by_admin_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
     created_by_admin = db.relationship('User', back_populates='patients')
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
-    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=utcnow) # UPDATED: sub-second precision, used for ETags
     
     # --- UPDATED: 1:N Relationships as per SRD ---
     diabetes_assessments = db.relationship('DiabetesAssessment', back_populates='patient', lazy='dynamic', cascade="all, delete-orphan", order_by="DiabetesAssessment.assessed_at.desc()")
@@ -88,12 +112,12 @@ class Patient(db.Model):
     # --- ADDED: 1:N relationship for Notes ---
     consultation_notes = db.relationship('ConsultationNote', back_populates='patient', lazy='dynamic', cascade="all, delete-orphan", order_by="ConsultationNote.created_at.desc()")
 
-
-    def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
-
-    def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+    # --- ADDED: Keyset indexes for the paged directory (app.directory sort keys) ---
+    __table_args__ = (
+        db.Index('ix_patients_created', 'created_at', 'id'),
+        db.Index('ix_patients_name', 'name', 'id'),
+        db.Index('ix_patients_age', 'age', 'id'),
+    )
 
     @hybrid_property
     def bmi(self):
@@ -193,6 +217,11 @@ class BaseAssessment(db.Model):
     # Renamed from updated_by_user_id
     assessed_by_admin_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
 
+    # --- ADDED: Backs newest-first history paging per patient ---
+    @declared_attr
+    def __table_args__(cls):
+        return (db.Index(f"ix_{cls.__tablename__}_patient_assessed", 'patient_id', 'assessed_at', 'id'),)
+
 class DiabetesAssessment(BaseAssessment):
     __tablename__ = 'diabetes_assessments'
     patient = db.relationship('Patient', back_populates='diabetes_assessments')
@@ -363,6 +392,9 @@ class RiskPrediction(db.Model):
     
     model_version = db.Column(db.String(50), nullable=True, default='1.0')
     predicted_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+
+    # --- ADDED: Backs newest-first history and timeline queries per patient ---
+    __table_args__ = (db.Index('ix_risk_predictions_patient_predicted', 'patient_id', 'predicted_at', 'id'),)
     
     def _get_level(self, score):
         """Categorizes score based on config thresholds."""
@@ -447,6 +479,9 @@ class Consultation(db.Model):
     patient = db.relationship('Patient', back_populates='consultations')
     booked_by_admin = db.relationship('User', back_populates='booked_consultations')
 
+    # --- ADDED: Backs the patient timeline ---
+    __table_args__ = (db.Index('ix_consultations_patient_created', 'patient_id', 'created_at', 'id'),)
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -474,6 +509,9 @@ class ConsultationNote(db.Model):
 
     patient = db.relationship('Patient', back_populates='consultation_notes')
     admin = db.relationship('User', back_populates='consultation_notes')
+
+    # --- ADDED: Backs the patient timeline ---
+    __table_args__ = (db.Index('ix_consultation_notes_patient_created', 'patient_id', 'created_at', 'id'),)
     
     def to_dict(self):
         return {
@@ -492,4 +530,222 @@ class TokenBlocklist(db.Model):
     token_type = db.Column(db.String(10), nullable=False) # 'access' or 'refresh'
     user_id = db.Column(db.Integer, nullable=True)
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
-    expires_at = db.Column(db.DateTime(timezone=True), nullable=True)
\ No newline at end of file
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=True)
+# --- Asynchronous PDF report jobs ---
+class ReportJob(db.Model):
+    """
+    A queued/finished PDF report. The rendered file lives on disk under
+    REPORT_ARTIFACT_DIR and is removed once the job expires.
+    """
+    __tablename__ = 'report_jobs'
+    id = db.Column(db.String(32), primary_key=True) # uuid4 hex, not guessable
+    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id', ondelete='CASCADE'), nullable=False, index=True)
+    requested_by_id = db.Column(db.Integer, nullable=True)
+    requested_by_role = db.Column(db.String(20), nullable=True)
+    sections = db.Column(db.JSON, nullable=False)
+
+    status = db.Column(db.String(20), nullable=False, default='queued') # queued/running/completed/failed
+    error = db.Column(db.Text, nullable=True)
+    artifact_path = db.Column(db.String(512), nullable=True)
+    download_name = db.Column(db.String(150), nullable=True)
+
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    started_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=True, index=True)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "patient_id": self.patient_id,
+            "sections": self.sections,
+            "status": self.status,
+            "error": self.error,
+            "download_name": self.download_name,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+        }
+
+# --- Share links with pre-rendered snapshots ---
+class ShareLink(db.Model):
+    """
+    A public share token for selected sections of a patient's record.
+    The snapshot is rendered once at share time and served as static bytes.
+    """
+    __tablename__ = 'share_links'
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(64), unique=True, index=True, nullable=False)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id', ondelete='CASCADE'), nullable=False, index=True)
+    sections = db.Column(db.JSON, nullable=False)
+    format = db.Column(db.String(10), nullable=False, default='json') # 'json' or 'pdf'
+
+    content = db.Column(db.LargeBinary, nullable=False)
+    content_type = db.Column(db.String(50), nullable=False)
+    download_name = db.Column(db.String(150), nullable=True)
+
+    created_by_id = db.Column(db.Integer, nullable=True)
+    created_by_role = db.Column(db.String(20), nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    revoked_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    def to_dict(self):
+        return {
+            "token": self.token,
+            "patient_id": self.patient_id,
+            "sections": self.sections,
+            "format": self.format,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+            "revoked_at": self.revoked_at.isoformat() if self.revoked_at else None,
+        }
+
+# --- ADDED: Population risk rollups ---
+class RiskRollup(db.Model):
+    """
+    Pre-aggregated prediction counts per (week, state, facility, disease, level).
+    Maintained incrementally when predictions are saved (app.rollups) and
+    rebuildable from risk_predictions with rebuild_rollups.py.
+    """
+    __tablename__ = 'risk_rollups'
+    id = db.Column(db.Integer, primary_key=True)
+    week_start = db.Column(db.String(10), nullable=False) # 'YYYY-MM-DD' (Monday)
+    state_name = db.Column(db.String(100), nullable=False, default='Unknown')
+    facility_name = db.Column(db.String(150), nullable=False, default='Unknown')
+    disease = db.Column(db.String(20), nullable=False)
+    risk_level = db.Column(db.String(20), nullable=False)
+    prediction_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        db.UniqueConstraint('week_start', 'state_name', 'facility_name', 'disease', 'risk_level', name='uq_risk_rollups_key'),
+        db.Index('ix_risk_rollups_disease_week', 'disease', 'week_start'),
+    )
+
+    def to_dict(self):
+        return {
+            "week_start": self.week_start,
+            "state_name": self.state_name,
+            "facility_name": self.facility_name,
+            "disease": self.disease,
+            "risk_level": self.risk_level,
+            "prediction_count": self.prediction_count,
+            "avg_score": round(self.score_sum / self.prediction_count, 4) if self.prediction_count else None,
+        }
+
+# --- ADDED: Change log for delta sync ---
+class ChangeLogEntry(db.Model):
+    """
+    One row per insert/update/delete of a synced table, written in the same
+    transaction by app.sync. The id is the sync sequence number.
+    """
+    __tablename__ = 'change_log'
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), nullable=False) # Table name, e.g. 'liver_assessments'
+    row_id = db.Column(db.Integer, nullable=False)
+    patient_id = db.Column(db.Integer, nullable=True)
+    operation = db.Column(db.String(10), nullable=False) # 'insert', 'update' or 'delete'
+    changed_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+    __table_args__ = (
+        db.Index('ix_change_log_entity_row', 'entity', 'row_id', 'id'),
+        db.Index('ix_change_log_patient', 'patient_id', 'id'),
+    )
+
+# --- ADDED: Idempotency keys for retried writes ---
+class IdempotencyKey(db.Model):
+    """
+    Stored outcome of a write made with an Idempotency-Key, so a retry of the
+    same request replays the response instead of writing again.
+    """
+    __tablename__ = 'idempotency_keys'
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(50), nullable=False) # e.g. 'admin:3'; keys are unique per caller
+    key = db.Column(db.String(100), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False) # Fingerprint of method, path and body
+    status_code = db.Column(db.Integer, nullable=False)
+    response_body = db.Column(db.Text, nullable=False) # JSON
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('scope', 'key', name='uq_idempotency_keys_scope_key'),
+        db.Index('ix_idempotency_keys_created_at', 'created_at'),
+    )
+
+# --- ADDED: Transactional outbox ---
+class OutboxEvent(db.Model):
+    """
+    Domain event written in the same commit as the change it describes
+    (app.outbox), and delivered to downstream sinks by the dispatcher.
+    """
+    __tablename__ = 'outbox_events'
+    id = db.Column(db.Integer, primary_key=True) # Delivery order
+    event_type = db.Column(db.String(60), nullable=False, index=True) # e.g. 'prediction.created'
+    entity = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=True)
+    patient_id = db.Column(db.Integer, nullable=True, index=True)
+    payload = db.Column(db.Text, nullable=False) # JSON
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+class OutboxCursor(db.Model):
+    """Per-sink delivery position and retry state."""
+    __tablename__ = 'outbox_cursors'
+    sink = db.Column(db.String(50), primary_key=True)
+    last_event_id = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0) # Consecutive failures
+    next_attempt_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True, default=utcnow, onupdate=utcnow)
+
+# --- ADDED: Background jobs ---
+class BackgroundJob(db.Model):
+    """
+    A unit of deferred work (prediction, recommendations, PDF rendering)
+    queued in the app database and run by job_worker.py (app.jobs).
+    """
+    __tablename__ = 'background_jobs'
+    id = db.Column(db.String(32), primary_key=True) # uuid4 hex, not guessable
+    task = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    lane = db.Column(db.String(20), nullable=False, default='default') # high/default/low
+    priority = db.Column(db.Integer, nullable=False, default=1) # Lane rank, lower runs first
+    unique_key = db.Column(db.String(200), nullable=True, index=True) # At most one queued job per key
+    patient_id = db.Column(db.Integer, nullable=True, index=True) # No FK: the job outlives a deleted patient
+    requested_by_id = db.Column(db.Integer, nullable=True)
+    requested_by_role = db.Column(db.String(20), nullable=True)
+
+    status = db.Column(db.String(20), nullable=False, default='queued') # queued/running/succeeded/failed/cancelled
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_at = db.Column(db.DateTime, nullable=False, default=utcnow) # Not picked up before this
+    locked_by = db.Column(db.String(100), nullable=True) # Claim token of the worker running it
+    locked_until = db.Column(db.DateTime, nullable=True) # Lease; requeued if the worker dies
+    result = db.Column(db.JSON, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_background_jobs_claim', 'status', 'priority', 'run_at'),
+    )
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "task": self.task,
+            "lane": self.lane,
+            "patient_id": self.patient_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "result": self.result,
+            "error": self.last_error,
+            "run_at": self.run_at.isoformat() if self.run_at else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -0,0 +1,410 @@
+# HealthCare App/medml-backend/app/outbox.py
+"""
+Transactional outbox.
+
+Downstream systems (SMS reminders, the district dashboard, consultation
+booking) are told about changes through outbox_events instead of polling the
+clinical tables:
+
+- a session after_flush hook writes '<entity>.created|updated|deleted' events
+  for patients, assessments, predictions and consultations, in the same
+  transaction as the change, so an event exists if and only if the change
+  was committed,
+- record_risk_escalation() adds a 'patient.risk_escalated' event when a new
+  prediction puts a disease at High that was not High before,
+- OutboxDispatcher (run by outbox_dispatcher.py) reads events in id order and
+  delivers them in batches to the configured sinks: a webhook, an NDJSON
+  file or a local SQLite queue. Each sink keeps its own cursor in
+  outbox_cursors, advanced only after a batch is delivered, so delivery is
+  at-least-once; consumers dedupe on the event id. Failed batches are
+  retried with exponential backoff.
+
+Only the dispatcher reads the outbox (by primary key), and it is the only
+poller left.
+"""
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import time
+import urllib.request
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from flask import current_app
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.json_provider import encode_default
+from app.models import (
+    Patient, DiabetesAssessment, LiverAssessment, HeartAssessment, MentalHealthAssessment,
+    RiskPrediction, Consultation, OutboxEvent, OutboxCursor, utcnow
+)
+from app.sync import EXCLUDED_COLUMNS
+from app.trends import DISEASES
+
+# table -> (entity name in event types, assessment type)
+OUTBOX_ENTITIES = {
+    Patient.__tablename__: ("patient", None),
+    DiabetesAssessment.__tablename__: ("assessment", "diabetes"),
+    LiverAssessment.__tablename__: ("assessment", "liver"),
+    HeartAssessment.__tablename__: ("assessment", "heart"),
+    MentalHealthAssessment.__tablename__: ("assessment", "mental_health"),
+    RiskPrediction.__tablename__: ("prediction", None),
+    Consultation.__tablename__: ("consultation", None),
+}
+
+RISK_ESCALATED = "patient.risk_escalated"
+
+
+# --- Writing events ---
+
+def _dumps(payload) -> str:
+    return json.dumps(payload, default=encode_default, separators=(',', ':'))
+
+
+def _row_payload(obj) -> dict:
+    """Loaded column values of `obj` (server-generated values not yet loaded are left out)."""
+    state = sa_inspect(obj)
+    return {
+        attr.key: state.dict[attr.key]
+        for attr in state.mapper.column_attrs
+        if attr.key in state.dict and attr.key not in EXCLUDED_COLUMNS
+    }
+
+
+def _record_events(session, flush_context):
+    events = []
+    created_at = utcnow()
+    for operation, objects in (("created", session.new), ("updated", session.dirty), ("deleted", session.deleted)):
+        for obj in objects:
+            entity = OUTBOX_ENTITIES.get(getattr(obj, "__tablename__", None))
+            if entity is None or obj.id is None:
+                continue
+            if operation == "updated" and not session.is_modified(obj, include_collections=False):
+                continue
+            name, assessment_type = entity
+            payload = _row_payload(obj)
+            if assessment_type:
+                payload["assessment_type"] = assessment_type
+            events.append({
+                "event_type": f"{name}.{operation}",
+                "entity": name,
+                "entity_id": obj.id,
+                "patient_id": obj.id if isinstance(obj, Patient) else getattr(obj, "patient_id", None),
+                "payload": _dumps(payload),
+                "created_at": created_at,
+            })
+    if events:
+        # Core insert on the flush's connection: part of the same transaction
+        session.connection().execute(OutboxEvent.__table__.insert(), events)
+
+
+def init_outbox(app):
+    """Registers the outbox hook on all ORM sessions (idempotent) unless OUTBOX_ENABLED is off."""
+    if not app.config.get('OUTBOX_ENABLED', True):
+        return
+    if not event.contains(Session, "after_flush", _record_events):
+        event.listen(Session, "after_flush", _record_events)
+
+
+def record_risk_escalation(prediction: RiskPrediction):
+    """
+    Adds a patient.risk_escalated event if `prediction` (already flushed) is
+    High for a disease the patient's previous prediction was not High for.
+    Runs in the caller's transaction; the caller commits.
+    """
+    previous = (
+        RiskPrediction.query
+        .filter(RiskPrediction.patient_id == prediction.patient_id, RiskPrediction.id < prediction.id)
+        .order_by(RiskPrediction.predicted_at.desc(), RiskPrediction.id.desc())
+        .first()
+    )
+    escalated = {}
+    for disease in DISEASES:
+        level = getattr(prediction, f"{disease}_risk_level")
+        before = getattr(previous, f"{disease}_risk_level") if previous else None
+        if level == 'High' and before != 'High':
+            escalated[disease] = {
+                "previous_level": before,
+                "level": level,
+                "score": getattr(prediction, f"{disease}_risk_score"),
+            }
+    if not escalated:
+        return None
+    outbox_event = OutboxEvent(
+        event_type=RISK_ESCALATED,
+        entity="patient",
+        entity_id=prediction.patient_id,
+        patient_id=prediction.patient_id,
+        payload=_dumps({
+            "patient_id": prediction.patient_id,
+            "prediction_id": prediction.id,
+            "previous_prediction_id": previous.id if previous else None,
+            "diseases": escalated,
+        }),
+    )
+    db.session.add(outbox_event)
+    return outbox_event
+
+
+def event_to_dict(outbox_event: OutboxEvent) -> dict:
+    return {
+        "id": outbox_event.id,
+        "event_type": outbox_event.event_type,
+        "entity": outbox_event.entity,
+        "entity_id": outbox_event.entity_id,
+        "patient_id": outbox_event.patient_id,
+        "occurred_at": outbox_event.created_at.isoformat() if outbox_event.created_at else None,
+        "payload": json.loads(outbox_event.payload),
+    }
+
+
+# --- Sinks ---
+
+class SinkError(Exception):
+    """A batch could not be delivered; it will be retried."""
+
+
+class OutboxSink:
+    """Delivers batches of events. deliver() must raise on failure."""
+    kind = None
+
+    def __init__(self, name: str, event_types: Optional[Iterable[str]] = None):
+        self.name = name
+        self.event_types = set(event_types) if event_types else None
+
+    def accepts(self, event_type: str) -> bool:
+        return self.event_types is None or event_type in self.event_types
+
+    def deliver(self, events: List[dict]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class WebhookSink(OutboxSink):
+    """POSTs {"events": [...]} as JSON; any non-2xx response is a failure."""
+    kind = "webhook"
+
+    def __init__(self, name, url, secret=None, timeout=10, event_types=None):
+        super().__init__(name, event_types)
+        if not url:
+            raise ValueError("Webhook sink needs OUTBOX_WEBHOOK_URL")
+        self.url = url
+        self.secret = secret
+        self.timeout = timeout
+
+    def deliver(self, events):
+        body = _dumps({"events": events}).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.secret:
+            # Receivers verify the body with the shared secret
+            headers["X-MedML-Signature"] = "sha256=" + hmac.new(
+                self.secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        req = urllib.request.Request(self.url, data=body, headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                if not 200 <= response.status < 300:
+                    raise SinkError(f"Webhook returned HTTP {response.status}")
+        except OSError as e:  # URLError / HTTPError / timeouts
+            raise SinkError(f"Webhook delivery failed: {e}")
+
+
+class FileSink(OutboxSink):
+    """Appends one JSON line per event and fsyncs."""
+    kind = "file"
+
+    def __init__(self, name, path, event_types=None):
+        super().__init__(name, event_types)
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def deliver(self, events):
+        data = "".join(_dumps(e) + "\n" for e in events)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class SQLiteQueueSink(OutboxSink):
+    """
+    Inserts events into the `events` table of a separate SQLite file that
+    local consumers pop from. Redelivered events are ignored (event_id is unique).
+    """
+    kind = "sqlite_queue"
+
+    def __init__(self, name, path, event_types=None):
+        super().__init__(name, event_types)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            " id INTEGER PRIMARY KEY, event_id INTEGER NOT NULL UNIQUE, event_type TEXT NOT NULL,"
+            " patient_id INTEGER, payload TEXT NOT NULL, occurred_at TEXT, enqueued_at TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+    def deliver(self, events):
+        now = utcnow().isoformat()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO events (event_id, event_type, patient_id, payload, occurred_at, enqueued_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [(e["id"], e["event_type"], e["patient_id"], _dumps(e["payload"]), e["occurred_at"], now)
+                 for e in events],
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+SINK_TYPES = {cls.kind: cls for cls in (WebhookSink, FileSink, SQLiteQueueSink)}
+
+
+def _event_filter(config, kind) -> Optional[List[str]]:
+    raw = config.get(f"OUTBOX_{kind.upper()}_EVENTS")
+    return [t.strip() for t in raw.split(",") if t.strip()] if raw else None
+
+
+def configured_sink_names(config) -> List[str]:
+    return [n.strip() for n in (config.get("OUTBOX_SINKS") or "").split(",") if n.strip()]
+
+
+def build_sinks(config, names: Optional[Iterable[str]] = None) -> List[OutboxSink]:
+    """Sinks named in OUTBOX_SINKS (or `names`), configured from the app config."""
+    if names is None:
+        names = configured_sink_names(config)
+    sinks = []
+    for kind in names:
+        if kind not in SINK_TYPES:
+            raise ValueError(f"Unknown outbox sink '{kind}'. Choose from: {', '.join(SINK_TYPES)}")
+        events = _event_filter(config, kind)
+        if kind == "webhook":
+            sinks.append(WebhookSink(kind, config.get("OUTBOX_WEBHOOK_URL"), config.get("OUTBOX_WEBHOOK_SECRET"),
+                                     config.get("OUTBOX_WEBHOOK_TIMEOUT", 10), events))
+        elif kind == "file":
+            sinks.append(FileSink(kind, config.get("OUTBOX_FILE_PATH"), events))
+        else:
+            sinks.append(SQLiteQueueSink(kind, config.get("OUTBOX_QUEUE_PATH"), events))
+    return sinks
+
+
+# --- Dispatching ---
+
+class OutboxDispatcher:
+    """Delivers new outbox events to each sink in batches, retrying failures with backoff."""
+
+    def __init__(self, sinks: List[OutboxSink], batch_size: int = 200,
+                 backoff_base: float = 2.0, backoff_max: float = 300.0, logger=None):
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.logger = logger
+
+    def _cursor(self, sink) -> OutboxCursor:
+        cursor = db.session.get(OutboxCursor, sink.name)
+        if cursor is None:
+            cursor = OutboxCursor(sink=sink.name, last_event_id=0, attempts=0)
+            db.session.add(cursor)
+            db.session.commit()
+        return cursor
+
+    def dispatch_sink(self, sink) -> int:
+        """Delivers one batch to `sink`. Returns the number of events scanned (0 if idle or backing off)."""
+        cursor = self._cursor(sink)
+        if cursor.next_attempt_at and cursor.next_attempt_at > utcnow():
+            return 0
+
+        batch = (
+            OutboxEvent.query
+            .filter(OutboxEvent.id > cursor.last_event_id)
+            .order_by(OutboxEvent.id)
+            .limit(self.batch_size)
+            .all()
+        )
+        if not batch:
+            return 0
+        events = [event_to_dict(e) for e in batch if sink.accepts(e.event_type)]
+
+        try:
+            if events:
+                sink.deliver(events)
+        except Exception as e:
+            cursor.attempts += 1
+            delay = min(self.backoff_base ** cursor.attempts, self.backoff_max)
+            cursor.next_attempt_at = utcnow() + timedelta(seconds=delay)
+            cursor.last_error = str(e)[:1000]
+            db.session.commit()
+            if self.logger:
+                self.logger.warning(f"Outbox sink {sink.name} failed (attempt {cursor.attempts}), retrying in {delay:.0f}s: {e}")
+            return 0
+
+        cursor.last_event_id = batch[-1].id
+        cursor.attempts = 0
+        cursor.next_attempt_at = None
+        cursor.last_error = None
+        db.session.commit()
+        return len(batch)
+
+    def dispatch_once(self) -> Dict[str, int]:
+        """One batch per sink. Returns events scanned per sink."""
+        return {sink.name: self.dispatch_sink(sink) for sink in self.sinks}
+
+    def run(self, poll_interval: float = 2.0, stop=None):
+        """Dispatches until `stop()` returns True; sleeps only when every sink is idle."""
+        while not (stop and stop()):
+            scanned = self.dispatch_once()
+            # End the read transaction so the next poll sees new commits
+            db.session.remove()
+            if not any(scanned.values()):
+                time.sleep(poll_interval)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def drop_outbox_cursor(sink: str) -> bool:
+    """Forgets a removed sink's delivery position. Commits; returns False if it had none."""
+    cursor = db.session.get(OutboxCursor, sink)
+    if cursor is None:
+        return False
+    db.session.delete(cursor)
+    db.session.commit()
+    return True
+
+
+def prune_outbox(retention_days: int, sinks: Optional[Iterable[str]] = None) -> int:
+    """
+    Deletes events older than retention_days that every sink in `sinks`
+    (default: OUTBOX_SINKS) has delivered. Cursors left by sinks that are no
+    longer configured do not hold events back; a configured sink that has
+    never run holds everything. With no sinks configured, every cursor
+    counts. Commits; returns the number removed.
+    """
+    names = set(configured_sink_names(current_app.config) if sinks is None else sinks)
+    query = db.session.query(OutboxCursor.sink, OutboxCursor.last_event_id)
+    if names:
+        query = query.filter(OutboxCursor.sink.in_(names))
+    positions = dict(query.all())
+    if not positions or (names and len(positions) < len(names)):
+        return 0
+    delivered = min(positions.values())
+    cutoff = utcnow() - timedelta(days=retention_days)
+    try:
+        removed = (
+            OutboxEvent.query
+            .filter(OutboxEvent.id <= delivered, OutboxEvent.created_at < cutoff)
+            .delete(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return removed
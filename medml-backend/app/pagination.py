@@ -0,0 +1,67 @@
+# HealthCare App/medml-backend/app/pagination.py
+"""
+Keyset (cursor) pagination helpers for history-style endpoints.
+
+Pages are ordered newest first. The cursor is an opaque token that encodes
+the sort key of the last row on the previous page, so fetching the next page
+is an index range scan instead of an OFFSET that re-reads skipped rows.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional
+
+from flask import current_app
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(list(values), separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> List[Any]:
+    """Raises ValueError for malformed tokens."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def parse_datetime_arg(args, name: str) -> Optional[datetime]:
+    """Parses an ISO date/datetime query parameter. Raises ValueError if malformed."""
+    raw = args.get(name)
+    if not raw:
+        return None
+    try:
+        value = datetime.fromisoformat(raw)
+    except ValueError:
+        raise ValueError(f"'{name}' must be an ISO date or datetime")
+    # Stored timestamps are naive UTC
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None) - value.utcoffset()
+    return value
+
+
+def parse_limit_arg(args) -> int:
+    """Parses `limit`, clamped to HISTORY_PAGE_MAX. Raises ValueError if malformed."""
+    default = current_app.config.get('HISTORY_PAGE_SIZE', 20)
+    maximum = current_app.config.get('HISTORY_PAGE_MAX', 100)
+    raw = args.get('limit')
+    if raw is None or raw == '':
+        return default
+    if not raw.isdigit() or int(raw) < 1:
+        raise ValueError("'limit' must be a positive integer")
+    return min(int(raw), maximum)
+
+
+def page_response(items: List[dict], has_more: bool, next_cursor: Optional[str]) -> dict:
+    return {
+        "items": items,
+        "count": len(items),
+        "has_more": has_more,
+        "next_cursor": next_cursor if has_more else None,
+    }
@@ -0,0 +1,155 @@
+# HealthCare App/medml-backend/app/password_hashing.py
+"""
+Password hashing service.
+
+bcrypt is deliberately slow, and running it inline in the request thread
+serializes login bursts. This service runs hashing and verification on a
+bounded process pool:
+
+- PASSWORD_HASH_WORKERS processes (0 = run inline, used in tests/scripts),
+- at most PASSWORD_HASH_MAX_QUEUE calls waiting beyond the busy workers;
+  further calls are rejected with PasswordHasherBusy (HTTP 503),
+- BCRYPT_LOG_ROUNDS sets the work factor; hashes made with a different
+  factor are flagged by needs_rehash() so they can be upgraded on login.
+"""
+import os
+import re
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict
+
+import bcrypt as _bcrypt
+
+_ROUNDS_RE = re.compile(r'^\$2[abxy]?\$(\d{2})\$')
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full."""
+
+
+# --- Worker functions (run in the pool processes) ---
+
+def _hash(password: str, rounds: int) -> str:
+    return _bcrypt.hashpw(password.encode('utf-8'), _bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _verify(password_hash: str, password: str) -> bool:
+    try:
+        return _bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    except ValueError:
+        # Malformed hash
+        return False
+
+
+class PasswordHasher:
+    def __init__(self):
+        self.workers = 0
+        self.max_queue = 0
+        self.log_rounds = 12
+        self.timeout = 30
+        self._executor = None
+        self._executor_pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._metrics = {
+            "submitted": 0,
+            "completed": 0,
+            "rejected": 0,
+            "errors": 0,
+            "in_flight": 0,
+            "peak_in_flight": 0,
+            "total_ms": 0.0,
+            "rehashed": 0,
+        }
+
+    def init_app(self, app):
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+        self.max_queue = app.config.get('PASSWORD_HASH_MAX_QUEUE', 32)
+        self.log_rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 30)
+        self._slots = threading.BoundedSemaphore(max(self.workers, 1) + self.max_queue)
+        self._executor = None
+
+    def _get_executor(self):
+        # Created lazily and per process, so forked server workers get their own pool
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if self._slots is not None and not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._metrics["rejected"] += 1
+            raise PasswordHasherBusy("Password hashing queue is full")
+
+        started = time.perf_counter()
+        with self._lock:
+            self._metrics["submitted"] += 1
+            self._metrics["in_flight"] += 1
+            self._metrics["peak_in_flight"] = max(self._metrics["peak_in_flight"], self._metrics["in_flight"])
+        # A submitted task keeps its slot until it finishes, even if we stop
+        # waiting for it, so the pool's backlog never exceeds the slot count
+        slot_held = self._slots is not None
+        try:
+            if self.workers > 0:
+                future = self._get_executor().submit(fn, *args)
+                if slot_held:
+                    future.add_done_callback(lambda _: self._slots.release())
+                    slot_held = False
+                try:
+                    result = future.result(timeout=self.timeout)
+                except FutureTimeoutError:
+                    # Frees the slot now if the task has not started yet
+                    future.cancel()
+                    raise
+            else:
+                result = fn(*args)
+            with self._lock:
+                self._metrics["completed"] += 1
+            return result
+        except Exception:
+            with self._lock:
+                self._metrics["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._metrics["in_flight"] -= 1
+                self._metrics["total_ms"] += (time.perf_counter() - started) * 1000
+            if slot_held:
+                self._slots.release()
+
+    # --- Public API ---
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password, self.log_rounds)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        if not password_hash or password is None:
+            return False
+        return self._run(_verify, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        match = _ROUNDS_RE.match(password_hash or '')
+        return match is None or int(match.group(1)) != self.log_rounds
+
+    def record_rehash(self):
+        with self._lock:
+            self._metrics["rehashed"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            data = dict(self._metrics)
+        finished = data["completed"] + data["errors"]
+        data["avg_ms"] = round(data.pop("total_ms") / finished, 2) if finished else 0.0
+        data.update({
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "log_rounds": self.log_rounds,
+        })
+        return data
+
+
+password_hasher = PasswordHasher()
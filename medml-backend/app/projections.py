@@ -0,0 +1,127 @@
+# HealthCare App/medml-backend/app/projections.py
+"""
+Sparse fieldsets for patient payloads.
+
+`Patient.to_dict(include_history=True, ...)` materializes every assessment,
+prediction and note. Endpoints that accept `fields=` and `include=` query
+parameters use this module instead to build only the requested projection:
+
+    ?fields=name,abha_id,bmi
+    &include=latest_prediction,risk_predictions:5,consultation_notes:3
+
+Only the requested columns are loaded, and each included relationship is
+fetched with its own (optionally limited) query.
+"""
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy.orm import load_only
+
+from app.models import Patient
+
+# Field name -> columns needed to compute it
+PATIENT_FIELDS = {
+    "patient_id": ("id",),
+    "name": ("name",),
+    "age": ("age",),
+    "gender": ("gender",),
+    "abha_id": ("abha_id",),
+    "height": ("height",),
+    "weight": ("weight",),
+    "bmi": ("height", "weight"),
+    "state_name": ("state_name",),
+    "created_by_admin_id": ("created_by_admin_id",),
+    "created_at": ("created_at",),
+    "updated_at": ("updated_at",),
+}
+
+# Relationships that are lists and accept a ":<limit>" suffix
+PATIENT_LIST_INCLUDES = (
+    "diabetes_assessments",
+    "liver_assessments",
+    "heart_assessments",
+    "mental_health_assessments",
+    "risk_predictions",
+    "consultation_notes",
+)
+
+PATIENT_INCLUDES = PATIENT_LIST_INCLUDES + ("created_by_admin", "latest_prediction")
+
+
+def parse_projection_args(args) -> Tuple[Optional[Set[str]], Dict[str, Optional[int]]]:
+    """
+    Parses `fields` and `include` from request args.
+    Returns (fields or None for all, {relationship: limit or None}).
+    Raises ValueError on unknown names or bad limits.
+    """
+    fields = None
+    raw_fields = args.get('fields')
+    if raw_fields:
+        fields = {f.strip() for f in raw_fields.split(',') if f.strip()}
+        unknown = fields - set(PATIENT_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    includes = {}
+    raw_include = args.get('include')
+    if raw_include:
+        for item in raw_include.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            name, _, limit = item.partition(':')
+            if name not in PATIENT_INCLUDES:
+                raise ValueError(f"Unknown include: {name}")
+            if limit:
+                if name not in PATIENT_LIST_INCLUDES or not limit.isdigit() or int(limit) < 1:
+                    raise ValueError(f"Invalid limit for include: {item}")
+                includes[name] = int(limit)
+            else:
+                includes[name] = None
+
+    return fields, includes
+
+
+def wants_projection(args) -> bool:
+    return bool(args.get('fields') or args.get('include'))
+
+
+def load_patient_projection(patient_id: int, fields: Optional[Set[str]],
+                            includes: Dict[str, Optional[int]]) -> Optional[Patient]:
+    """Loads a patient with only the columns needed for `fields` and `includes`."""
+    query = Patient.query
+    if fields is not None:
+        columns = {"id"}
+        for field in fields:
+            columns.update(PATIENT_FIELDS[field])
+        if "created_by_admin" in includes:
+            columns.add("created_by_admin_id")
+        query = query.options(load_only(*[getattr(Patient, c) for c in columns]))
+    return query.filter(Patient.id == patient_id).first()
+
+
+def project_patient(patient: Patient, fields: Optional[Set[str]], includes: Dict[str, Optional[int]]) -> dict:
+    """Builds the sparse patient payload."""
+    data = {}
+    for field in (fields if fields is not None else PATIENT_FIELDS):
+        if field == "patient_id":
+            data[field] = patient.id
+        elif field == "bmi":
+            data[field] = patient.bmi
+        else:
+            value = getattr(patient, field)
+            data[field] = value.isoformat() if hasattr(value, 'isoformat') else value
+
+    for name, limit in includes.items():
+        if name == "created_by_admin":
+            admin = patient.created_by_admin if patient.created_by_admin_id else None
+            data[name] = admin.to_dict() if admin else None
+        elif name == "latest_prediction":
+            latest = patient.risk_predictions.first()
+            data[name] = latest.to_dict() if latest else None
+        else:
+            query = getattr(patient, name)
+            if limit:
+                query = query.limit(limit)
+            data[name] = [row.to_dict() for row in query]
+
+    return data
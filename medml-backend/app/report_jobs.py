@@ -0,0 +1,246 @@
+# HealthCare App/medml-backend/app/report_jobs.py
+"""
+Asynchronous PDF report jobs.
+
+Jobs are persisted in the `report_jobs` table of the app database (SQLite by
+default), so no external broker is needed. A small in-process thread pool
+renders them, or, with REPORT_JOB_BACKEND=queue, the background job workers
+(app.jobs, low lane); artifacts are written to REPORT_ARTIFACT_DIR and
+expire after REPORT_JOB_TTL.
+
+A job still queued or running REPORT_JOB_TIMEOUT_SECONDS after it was
+created or started is marked failed (its thread died with the process, or
+its queue job was lost), so clients stop polling and it expires like any
+other job. Each app process sweeps for stale and expired jobs every
+REPORT_JOB_SWEEP_INTERVAL seconds on a background timer, whichever backend
+renders them; report_maintenance.py runs the same sweep on demand.
+"""
+import math
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from flask import current_app
+
+from sqlalchemy import or_, and_
+
+from app.extensions import db
+from app.jobs import enqueue
+from app.models import Patient, ReportJob, utcnow
+from app.reporting import render_patient_report
+
+_executor = None
+_executor_lock = threading.Lock()
+_sweep_timer = None
+
+FINISHED_STATUSES = ('completed', 'failed')
+
+
+def _get_executor(app) -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get('REPORT_JOB_WORKERS', 2),
+                thread_name_prefix='report-job',
+            )
+        return _executor
+
+
+def _artifact_dir(app) -> str:
+    path = app.config.get('REPORT_ARTIFACT_DIR')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def submit_report_job(patient_id: int, sections: List[str], identity: Dict[str, Any]) -> ReportJob:
+    """Persists a queued job and hands it to the worker pool or the job queue."""
+    job = ReportJob(
+        id=uuid.uuid4().hex,
+        patient_id=patient_id,
+        sections=sections,
+        requested_by_id=identity.get('id'),
+        requested_by_role=identity.get('role'),
+        status='queued',
+    )
+    db.session.add(job)
+    if current_app.config.get('REPORT_JOB_BACKEND') == 'queue':
+        enqueue('reports.render', {"report_job_id": job.id}, patient_id=patient_id, identity=identity)
+        db.session.commit()
+    else:
+        db.session.commit()
+        app = current_app._get_current_object()
+        _get_executor(app).submit(_run_report_job, app, job.id)
+    current_app.logger.info(f"Queued report job {job.id} for patient {patient_id}")
+    return job
+
+
+def _run_report_job(app, job_id: str):
+    """Thread pool entry point."""
+    with app.app_context():
+        render_report_job(job_id)
+
+
+def render_report_job(job_id: str) -> Optional[str]:
+    """Renders the PDF and records the outcome. Returns the job's final status (None if it is gone)."""
+    app = current_app._get_current_object()
+    job = db.session.get(ReportJob, job_id)
+    if job is None:
+        return None
+    if job.status != 'queued':
+        # Already run, or timed out while waiting
+        return job.status
+    job.status = 'running'
+    job.started_at = utcnow()
+    db.session.commit()
+
+    try:
+        patient = db.session.get(Patient, job.patient_id)
+        if patient is None:
+            raise ValueError("Patient not found")
+
+        filename, pdf_bytes = render_patient_report(patient, job.sections)
+        path = os.path.join(_artifact_dir(app), f"{job.id}.pdf")
+        with open(path, 'wb') as f:
+            f.write(pdf_bytes)
+
+        job.artifact_path = path
+        job.download_name = filename
+        job.status = 'completed'
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(ReportJob, job_id)
+        job.status = 'failed'
+        job.error = str(e)
+        app.logger.error(f"Report job {job_id} failed: {e}")
+
+    job.finished_at = utcnow()
+    job.expires_at = job.finished_at + app.config.get('REPORT_JOB_TTL')
+    db.session.commit()
+    app.logger.info(f"Report job {job_id} finished with status {job.status}")
+    return job.status
+
+
+def _stale_cutoff():
+    return utcnow() - timedelta(seconds=current_app.config.get('REPORT_JOB_TIMEOUT_SECONDS', 1800))
+
+
+def _fail_stale(job: ReportJob):
+    job.status = 'failed'
+    job.error = 'Report job was interrupted (timed out); please request the report again'
+    job.finished_at = utcnow()
+    job.expires_at = job.finished_at + current_app.config.get('REPORT_JOB_TTL')
+
+
+def _is_stale(job: ReportJob, cutoff) -> bool:
+    if job.status == 'queued':
+        return job.created_at is not None and job.created_at <= cutoff
+    if job.status == 'running':
+        return job.started_at is not None and job.started_at <= cutoff
+    return False
+
+
+def get_report_job(job_id: str) -> Optional[ReportJob]:
+    """Returns the job, or None if it does not exist or has expired. Times out a stale job."""
+    job = db.session.get(ReportJob, job_id)
+    if job is None:
+        return None
+    if _is_stale(job, _stale_cutoff()):
+        _fail_stale(job)
+        db.session.commit()
+        current_app.logger.warning(f"Report job {job.id} timed out")
+    if job.expires_at and job.expires_at <= utcnow():
+        _delete_job(job)
+        db.session.commit()
+        return None
+    return job
+
+
+def wait_for_report_job(job_id: str, timeout: float, poll_interval: float = 0.5) -> Optional[ReportJob]:
+    """Blocks until the job finishes or `timeout` seconds pass."""
+    if not math.isfinite(timeout):
+        raise ValueError("timeout must be a finite number of seconds")
+    deadline = time.monotonic() + timeout
+    while True:
+        job = get_report_job(job_id)
+        if job is None or job.status in FINISHED_STATUSES or time.monotonic() >= deadline:
+            return job
+        time.sleep(poll_interval)
+        # End the read transaction so the next poll sees the worker's commit
+        db.session.rollback()
+
+
+def _delete_job(job: ReportJob):
+    if job.artifact_path and os.path.exists(job.artifact_path):
+        try:
+            os.remove(job.artifact_path)
+        except OSError as e:
+            current_app.logger.warning(f"Could not remove report artifact {job.artifact_path}: {e}")
+    db.session.delete(job)
+
+
+def fail_stale_report_jobs() -> int:
+    """Marks every stale queued/running job failed. Commits; returns the number failed."""
+    cutoff = _stale_cutoff()
+    stale = ReportJob.query.filter(or_(
+        and_(ReportJob.status == 'queued', ReportJob.created_at <= cutoff),
+        and_(ReportJob.status == 'running', ReportJob.started_at <= cutoff),
+    )).all()
+    for job in stale:
+        _fail_stale(job)
+    if stale:
+        db.session.commit()
+        current_app.logger.warning(f"Marked {len(stale)} stale report jobs as failed")
+    return len(stale)
+
+
+def purge_expired_report_jobs() -> int:
+    """Deletes expired jobs and their artifacts. Returns the number removed."""
+    expired = ReportJob.query.filter(ReportJob.expires_at <= utcnow()).all()
+    for job in expired:
+        _delete_job(job)
+    if expired:
+        db.session.commit()
+        current_app.logger.info(f"Purged {len(expired)} expired report jobs")
+    return len(expired)
+
+
+# --- Periodic sweep ---
+
+def init_report_jobs(app):
+    """Starts this process's stale/expired job sweep unless REPORT_JOB_SWEEP_INTERVAL is 0."""
+    _schedule_sweep(app)
+
+
+def _schedule_sweep(app):
+    global _sweep_timer
+    interval = app.config.get('REPORT_JOB_SWEEP_INTERVAL', 600)
+    if not interval or interval <= 0:
+        return
+    with _executor_lock:
+        if _sweep_timer is not None:
+            return
+        _sweep_timer = threading.Timer(interval, _sweep, args=(app,))
+        _sweep_timer.daemon = True
+        _sweep_timer.name = 'report-job-sweep'
+        _sweep_timer.start()
+
+
+def _sweep(app):
+    """Timer entry point: fails stale jobs, purges expired ones, then re-arms."""
+    global _sweep_timer
+    with app.app_context():
+        try:
+            fail_stale_report_jobs()
+            purge_expired_report_jobs()
+        except Exception as e:
+            # Another process may have swept the same rows; the next run retries
+            db.session.rollback()
+            app.logger.warning(f"Report job sweep failed: {e}")
+    with _executor_lock:
+        _sweep_timer = None
+    _schedule_sweep(app)
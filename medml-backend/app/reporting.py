@@ -0,0 +1,575 @@
+# HealthCare App/medml-backend/app/reporting.py
+"""
+PDF report rendering shared by the single-patient report endpoint and the
+cohort (batch) report endpoint / CLI.
+
+Rendering works on plain dictionaries (a "report context") instead of ORM
+objects, so it can run inside worker processes that have no app context or
+database session.
+"""
+import os
+import socket
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fpdf import FPDF
+from flask import current_app
+from sqlalchemy import func, or_, update
+
+from app.extensions import db
+from app.models import Patient, RiskPrediction, User, BackgroundJob, utcnow
+from app.jobs import LANES
+from app.services import get_gemini_recommendations
+
+EMPTY_RECOMMENDATIONS = {"diet": [], "exercise": [], "sleep": [], "lifestyle": []}
+
+DISEASE_KEYS = ['diabetes', 'liver', 'heart', 'mental_health']
+
+
+class PDF(FPDF):
+    def __init__(self):
+        super().__init__()
+        self.set_auto_page_break(auto=True, margin=20)
+        self.set_margins(15, 15, 15)  # Left, Top, Right margins
+
+    def header(self):
+        # Header with logo and title
+        self.set_font('Arial', 'B', 16)
+        self.set_text_color(37, 99, 235)  # Blue color
+        self.cell(0, 12, 'HealthCare System', 0, 1, 'C')
+
+        self.set_font('Arial', 'B', 14)
+        self.set_text_color(0, 0, 0)  # Black
+        self.cell(0, 8, 'Patient Health Report', 0, 1, 'C')
+
+        # Add a line separator
+        self.set_draw_color(37, 99, 235)
+        self.line(10, self.get_y(), self.w - 10, self.get_y())
+        self.ln(5)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.set_text_color(100, 100, 100)
+        self.cell(0, 10, f'Page {self.page_no()} | Generated on {datetime.now().strftime("%Y-%m-%d %H:%M")}', 0, 0, 'C')
+
+    def chapter_title(self, title):
+        self.set_font('Arial', 'B', 12)
+        self.set_text_color(37, 99, 235)  # Blue color
+        self.cell(0, 10, title, 0, 1, 'L')
+        self.ln(2)
+
+    def chapter_body(self, data):
+        self.set_font('Arial', '', 10)
+        for key, val in data.items():
+            # Ensure text fits within page width
+            text = f"{key}: {val}"
+            self.multi_cell(0, 5, text, 0, 'L', False)
+        self.ln()
+
+    def risk_table(self, risk_data):
+        """Create a risk assessment table that ensures it stays on a single page."""
+        # Calculate required space for the table
+        table_height = 10 + (5 * 10) + 5  # Header + 5 rows + spacing
+
+        # Check if we need a new page to fit the table
+        if self.get_y() + table_height > self.h - 20:  # Leave margin for footer
+            self.add_page()
+
+        # Table title
+        self.set_font('Arial', 'B', 12)
+        self.cell(0, 8, 'Disease Risk Assessment Scores', 0, 1, 'C')
+        self.ln(3)
+
+        # Table header
+        self.set_font('Arial', 'B', 10)
+        col_width = self.w / 4.5
+        self.cell(col_width, 10, 'Disease', 1, 0, 'C')
+        self.cell(col_width, 10, 'Risk Level', 1, 0, 'C')
+        self.cell(col_width, 10, 'Score (0-1)', 1, 0, 'C')
+        self.ln()
+
+        # Table data
+        self.set_font('Arial', '', 10)
+        if risk_data:
+            data = [
+                ('Diabetes', risk_data.get('diabetes_risk_level'), risk_data.get('diabetes_risk_score')),
+                ('Liver Disease', risk_data.get('liver_risk_level'), risk_data.get('liver_risk_score')),
+                ('Heart Disease', risk_data.get('heart_risk_level'), risk_data.get('heart_risk_score')),
+                ('Mental Health', risk_data.get('mental_health_risk_level'), risk_data.get('mental_health_risk_score')),
+            ]
+            for row in data:
+                # Format risk level with color coding
+                risk_level = str(row[1] or 'N/A')
+                if risk_level == 'High':
+                    self.set_text_color(220, 20, 60)  # Red
+                elif risk_level == 'Medium':
+                    self.set_text_color(255, 140, 0)  # Orange
+                elif risk_level == 'Low':
+                    self.set_text_color(34, 139, 34)  # Green
+                else:
+                    self.set_text_color(0, 0, 0)  # Black
+
+                self.cell(col_width, 10, str(row[0] or 'N/A'), 1, 0, 'C')
+                self.cell(col_width, 10, risk_level, 1, 0, 'C')
+                self.cell(col_width, 10, str(round(row[2], 3) if row[2] is not None else 'N/A'), 1, 0, 'C')
+                self.ln()
+
+                # Reset text color
+                self.set_text_color(0, 0, 0)
+        else:
+            self.cell(col_width * 3, 10, 'No prediction data available.', 1, 0, 'C')
+            self.ln()
+
+        self.ln(8)  # Extra spacing after table
+
+    def add_recommendations(self, rec_data):
+        """Add lifestyle recommendations with improved formatting."""
+        self.set_font('Arial', 'B', 12)
+        self.set_text_color(37, 99, 235)  # Blue color
+        self.cell(0, 8, 'Lifestyle Recommendations', 0, 1, 'L')
+        self.ln(3)
+
+        self.set_font('Arial', '', 10)
+        self.set_text_color(0, 0, 0)  # Reset to black
+
+        if not rec_data or all(not v for v in rec_data.values()):
+            self.multi_cell(0, 5, "No specific recommendations available at this time.")
+            return
+
+        for category in ['Diet', 'Exercise', 'Sleep', 'Lifestyle']:
+            recs = rec_data.get(category.lower(), [])
+            if recs:
+                # Category header without emoji icons (to avoid Unicode issues)
+                self.set_font('Arial', 'B', 11)
+                self.set_text_color(37, 99, 235)  # Blue color
+                self.cell(0, 8, f"{category}", 0, 1, 'L')
+
+                self.set_font('Arial', '', 10)
+                self.set_text_color(0, 0, 0)  # Reset to black
+
+                for rec in recs:
+                    disease = rec.get('disease_type', 'General')
+                    text = rec.get('recommendation_text', 'No text.')
+                    risk_level = rec.get('risk_level', 'Medium')
+
+                    # Color code based on risk level
+                    if risk_level == 'High':
+                        self.set_text_color(220, 20, 60)  # Red
+                    elif risk_level == 'Medium':
+                        self.set_text_color(255, 140, 0)  # Orange
+                    else:
+                        self.set_text_color(0, 0, 0)  # Black
+
+                    # Ensure text fits within page width and handle long text
+                    recommendation_text = f"- ({disease}) {text}"
+                    self.multi_cell(0, 5, recommendation_text, 0, 'L', False)
+                    self.set_text_color(0, 0, 0)  # Reset to black
+
+                self.ln(3)
+
+
+# --- Report context (plain data, safe to send to worker processes) ---
+
+def risk_map_for(prediction: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Returns the {disease: level} map used for Gemini recommendations."""
+    if not prediction:
+        return None
+    return {key: prediction.get(f"{key}_risk_level") for key in DISEASE_KEYS}
+
+
+def build_report_context(patient: Patient, prediction: Optional[RiskPrediction],
+                         recommendations: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Snapshots everything the PDF needs from the ORM objects into a dict."""
+    return {
+        "patient": {
+            "patient_id": patient.id,
+            "name": patient.name,
+            "age": patient.age,
+            "gender": patient.gender,
+            "height": patient.height,
+            "weight": patient.weight,
+            "bmi": patient.bmi,
+            "state_name": patient.state_name,
+            "abha_id": patient.abha_id,
+        },
+        "prediction": prediction.to_dict() if prediction else None,
+        "recommendations": recommendations or EMPTY_RECOMMENDATIONS,
+        "generated_at": datetime.now().strftime('%Y-%m-%d %H:%M'),
+    }
+
+
+def render_report_pdf(context: Dict[str, Any], sections: List[str]) -> bytes:
+    """
+    Renders a patient report to PDF bytes. Pure function of its arguments so
+    it can be executed in a ProcessPoolExecutor.
+    """
+    patient = context["patient"]
+    risk_prediction = context.get("prediction")
+
+    pdf = PDF()
+    pdf.add_page()
+
+    # Section: Overview
+    if "Overview" in sections:
+        pdf.chapter_title("Patient Information")
+        overview_data = {
+            "Name": patient["name"],
+            "Age": patient["age"],
+            "Gender": patient["gender"],
+            "Height": f"{patient['height']} cm",
+            "Weight": f"{patient['weight']} kg",
+            "BMI": patient["bmi"],
+            "State": patient["state_name"],
+            "Generated": context["generated_at"]
+        }
+        pdf.chapter_body(overview_data)
+
+        # Risk table for overview
+        pdf.risk_table(risk_prediction)
+
+    # Optional disease-specific sections: render headers if selected
+    section_map = [
+        ("Diabetes", "Diabetes"),
+        ("Liver", "Liver Disease"),
+        ("Heart", "Heart Disease"),
+        ("Mental Health", "Mental Health")
+    ]
+
+    for sec_key, sec_title in section_map:
+        if sec_key in sections:
+            pdf.chapter_title(f"{sec_title} Details")
+            if risk_prediction:
+                prefix = sec_key.lower().replace(' ', '_')
+                level = risk_prediction.get(f"{prefix}_risk_level")
+                score = risk_prediction.get(f"{prefix}_risk_score")
+                pdf.chapter_body({
+                    "Risk Level": level or 'N/A',
+                    "Risk Score": round(score, 3) if score is not None else 'N/A'
+                })
+            else:
+                pdf.chapter_body({"Info": "No prediction data available."})
+
+    pdf.add_recommendations(context.get("recommendations"))
+
+    return pdf.output(dest='S').encode('latin-1')
+
+
+def report_filename(context: Dict[str, Any]) -> str:
+    return f"Health_Report_{context['patient']['abha_id']}.pdf"
+
+
+def render_patient_report(patient: Patient, sections: List[str]) -> Tuple[str, bytes]:
+    """
+    Renders the report for a single patient from their latest prediction,
+    including Gemini recommendations. Returns (filename, pdf_bytes).
+    """
+    context = build_report_context(patient, patient.risk_predictions.first())
+
+    try:
+        risk_map = risk_map_for(context["prediction"])
+        recs = get_gemini_recommendations(risk_map) if risk_map else EMPTY_RECOMMENDATIONS
+    except Exception as e:
+        current_app.logger.warning(f"Failed to get AI recommendations: {e}")
+        recs = EMPTY_RECOMMENDATIONS
+    context["recommendations"] = recs
+
+    return report_filename(context), render_report_pdf(context, sections)
+
+
+# --- Share snapshots ---
+
+SHARE_SECTION_ASSESSMENTS = {
+    "Diabetes": ("diabetes", "diabetes_assessments"),
+    "Liver": ("liver", "liver_assessments"),
+    "Heart": ("heart", "heart_assessments"),
+    "Mental Health": ("mental_health", "mental_health_assessments"),
+}
+
+
+def build_share_snapshot(patient: Patient, sections: List[str]) -> Dict[str, Any]:
+    """
+    Builds the compact JSON snapshot served by a share link: the selected
+    sections only, each with the latest assessment and risk for that disease.
+    """
+    prediction = patient.risk_predictions.first()
+    snapshot = {
+        "patient": {"name": patient.name, "age": patient.age, "gender": patient.gender},
+        "generated_at": utcnow().isoformat(),
+        "sections": {},
+    }
+
+    if "Overview" in sections:
+        snapshot["sections"]["Overview"] = {
+            "height": patient.height,
+            "weight": patient.weight,
+            "bmi": patient.bmi,
+            "state_name": patient.state_name,
+            "latest_prediction": prediction.to_dict() if prediction else None,
+        }
+
+    for section, (key, relationship) in SHARE_SECTION_ASSESSMENTS.items():
+        if section in sections:
+            latest = getattr(patient, relationship).first()
+            snapshot["sections"][section] = {
+                "risk_level": getattr(prediction, f"{key}_risk_level") if prediction else None,
+                "risk_score": getattr(prediction, f"{key}_risk_score") if prediction else None,
+                "latest_assessment": latest.to_dict() if latest else None,
+            }
+
+    return snapshot
+
+
+# --- Cohort (batch) reports ---
+
+def latest_prediction_subquery():
+    """Subquery of (patient_id, latest prediction id) for every patient."""
+    return db.session.query(
+        RiskPrediction.patient_id.label('patient_id'),
+        func.max(RiskPrediction.id).label('prediction_id')
+    ).group_by(RiskPrediction.patient_id).subquery()
+
+
+def cohort_query(disease=None, risk_level=None, state_name=None, facility_name=None,
+                 date_from=None, date_to=None):
+    """
+    Builds a (Patient, RiskPrediction) query for a cohort, filtered on each
+    patient's *latest* prediction. With no disease given, risk_level matches
+    any of the four diseases.
+    """
+    latest = latest_prediction_subquery()
+    query = db.session.query(Patient, RiskPrediction) \
+        .join(latest, latest.c.patient_id == Patient.id) \
+        .join(RiskPrediction, RiskPrediction.id == latest.c.prediction_id)
+
+    if risk_level:
+        if disease:
+            query = query.filter(getattr(RiskPrediction, f"{disease}_risk_level") == risk_level)
+        else:
+            query = query.filter(or_(*[
+                getattr(RiskPrediction, f"{key}_risk_level") == risk_level for key in DISEASE_KEYS
+            ]))
+    elif disease:
+        query = query.filter(getattr(RiskPrediction, f"{disease}_risk_level").isnot(None))
+
+    if state_name:
+        query = query.filter(Patient.state_name == state_name)
+    if facility_name:
+        query = query.join(User, User.id == Patient.created_by_admin_id) \
+            .filter(User.facility_name == facility_name)
+    if date_from:
+        query = query.filter(RiskPrediction.predicted_at >= date_from)
+    if date_to:
+        query = query.filter(RiskPrediction.predicted_at <= date_to)
+
+    return query.order_by(Patient.id)
+
+
+def iter_cohort_contexts(query, include_recommendations=True, recommend=None,
+                         batch_size=200) -> Iterator[Dict[str, Any]]:
+    """
+    Yields report contexts for a cohort query. Recommendations are memoised
+    per risk profile: there are only 3^4 level combinations, so a cohort of
+    thousands needs at most 81 Gemini calls.
+
+    Rows are fetched in keyset batches on Patient.id (cohort_query() orders
+    by it), so no cursor stays open while the caller renders a batch and
+    writes progress; on SQLite an open read would block those writes.
+    """
+    rec_cache = {}
+    last_id = None
+    while True:
+        batch = query if last_id is None else query.filter(Patient.id > last_id)
+        rows = batch.limit(batch_size).all()
+        if not rows:
+            return
+        last_id = rows[-1][0].id
+        for patient, prediction in rows:
+            context = build_report_context(patient, prediction)
+            risk_map = risk_map_for(context["prediction"])
+            if include_recommendations and risk_map and recommend is not None:
+                cache_key = tuple(sorted(risk_map.items()))
+                if cache_key not in rec_cache:
+                    try:
+                        rec_cache[cache_key] = recommend(risk_map)
+                    except Exception as e:
+                        current_app.logger.warning(f"Failed to get AI recommendations: {e}")
+                        rec_cache[cache_key] = EMPTY_RECOMMENDATIONS
+                context["recommendations"] = rec_cache[cache_key]
+            yield context
+        if len(rows) < batch_size:
+            return
+
+
+def _render_named(context: Dict[str, Any], sections: List[str]) -> Tuple[str, bytes]:
+    return report_filename(context), render_report_pdf(context, sections)
+
+
+def iter_rendered_reports(contexts: Iterable[Dict[str, Any]], sections: List[str],
+                          workers: Optional[int] = None,
+                          max_pending: Optional[int] = None) -> Iterator[Tuple[str, Optional[bytes], Optional[str]]]:
+    """
+    Renders contexts on a process pool and yields (filename, pdf_bytes, error)
+    in completion order. At most `max_pending` reports are in flight, so memory
+    stays bounded no matter how large the cohort is.
+    """
+    workers = workers or os.cpu_count() or 2
+    max_pending = max_pending or workers * 4
+    contexts = iter(contexts)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+
+        def _fill():
+            while len(pending) < max_pending:
+                context = next(contexts, None)
+                if context is None:
+                    return
+                future = executor.submit(_render_named, context, sections)
+                pending[future] = report_filename(context)
+
+        _fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    _, pdf_bytes = future.result()
+                    yield name, pdf_bytes, None
+                except Exception as e:
+                    yield name, None, str(e)
+            _fill()
+
+
+class _ZipStream:
+    """
+    Minimal non-seekable file object for zipfile. Written bytes are buffered
+    until drained, so each finished PDF can be sent out immediately.
+    """
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+# --- Cohort job progress ---
+# Progress rows live in background_jobs (task 'reports.cohort'), so any
+# worker process can answer a poll. The streaming request holds the row like
+# a worker holds a claimed job: its lease is renewed with each progress write
+# and, if the process dies mid-stream, requeue_expired_jobs() marks it failed
+# (max_attempts=1). Finished rows are removed by purge_finished_jobs().
+COHORT_TASK = 'reports.cohort'
+COHORT_STATUSES = {'running': 'running', 'succeeded': 'completed', 'failed': 'failed'}
+
+
+def start_cohort_job(total: int) -> str:
+    """Records a running cohort job. Commits; returns its id."""
+    now = utcnow()
+    job = BackgroundJob(
+        id=uuid.uuid4().hex,
+        task=COHORT_TASK,
+        payload={"total": total},
+        lane='low',
+        priority=LANES['low'],
+        status='running',
+        attempts=1,
+        max_attempts=1,
+        run_at=now,
+        locked_by=f"{socket.gethostname()}:{os.getpid()}:cohort",
+        locked_until=now + timedelta(seconds=current_app.config.get('JOBS_LEASE_SECONDS', 600)),
+        result={"total": total, "completed": 0, "failed": 0},
+        started_at=now,
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def update_cohort_job(job_id: str, progress: Dict[str, int], status: Optional[str] = None) -> None:
+    """
+    Writes the job's counts (and final status) in a short transaction of its
+    own, so the request session's loaded rows are not expired by a commit.
+    """
+    now = utcnow()
+    values = dict(result=dict(progress), locked_until=now + timedelta(seconds=current_app.config.get('JOBS_LEASE_SECONDS', 600)))
+    if status:
+        values.update(status=status, finished_at=now, locked_by=None, locked_until=None)
+    with db.engine.begin() as connection:
+        connection.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id, BackgroundJob.status == 'running')
+            .values(**values)
+        )
+
+
+def get_cohort_job(job_id: str) -> Optional[Dict[str, Any]]:
+    job = db.session.get(BackgroundJob, job_id)
+    if job is None or job.task != COHORT_TASK:
+        return None
+    progress = job.result or {}
+    return {
+        "job_id": job.id,
+        "status": COHORT_STATUSES.get(job.status, job.status),
+        "total": progress.get("total", job.payload.get("total")),
+        "completed": progress.get("completed", 0),
+        "failed": progress.get("failed", 0),
+        "error": job.last_error,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def stream_cohort_zip(rendered: Iterable[Tuple[str, Optional[bytes], Optional[str]]],
+                      job_id: Optional[str] = None, progress=None, total: int = 0) -> Iterator[bytes]:
+    """
+    Writes rendered reports into a ZIP archive and yields the archive bytes
+    as each entry completes. Failures are listed in errors.txt at the end.
+    With job_id, progress is recorded at most every COHORT_PROGRESS_INTERVAL
+    seconds, and the final status when the archive ends.
+    """
+    stream = _ZipStream()
+    errors = []
+    counts = {"total": total, "completed": 0, "failed": 0}
+    interval = current_app.config.get('COHORT_PROGRESS_INTERVAL', 2.0) if job_id else 0
+    last_write = time.monotonic()
+    try:
+        with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for name, pdf_bytes, error in rendered:
+                if error:
+                    errors.append(f"{name}: {error}")
+                    counts["failed"] += 1
+                else:
+                    archive.writestr(name, pdf_bytes)
+                    counts["completed"] += 1
+                if job_id and time.monotonic() - last_write >= interval:
+                    update_cohort_job(job_id, counts)
+                    last_write = time.monotonic()
+                if progress:
+                    progress(name, error)
+                chunk = stream.drain()
+                if chunk:
+                    yield chunk
+            if errors:
+                archive.writestr("errors.txt", "\n".join(errors))
+    except BaseException:
+        # Includes GeneratorExit when the client disconnects mid-download
+        if job_id:
+            update_cohort_job(job_id, counts, status='failed')
+        raise
+    if job_id:
+        update_cohort_job(job_id, counts, status='succeeded')
+    yield stream.drain()
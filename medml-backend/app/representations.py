@@ -0,0 +1,112 @@
+# HealthCare App/medml-backend/app/representations.py
+"""
+MessagePack representation for low-bandwidth clients.
+
+Clients that send `Accept: application/x-msgpack` get the same documents the
+JSON API returns, encoded as MessagePack:
+
+- history lists (any list of two or more dicts with identical keys, e.g.
+  assessment histories, timeline events, the patient directory) are sent
+  column-wise: field names once, then one value array per field. They are
+  packed as extension type COLUMNAR_EXT holding [field_names, columns], and
+  decode back to a list of dicts (see unpackb),
+- within a columnar list, a string column with few distinct values (risk
+  levels, gender, state, event type...) is dictionary-encoded as
+  DICTIONARY_EXT holding [distinct_values, indexes],
+- datetimes and other non-native values are encoded as in JSON (ISO 8601
+  strings etc.).
+
+JSON stays the default: MessagePack is only chosen when the client prefers it
+and the msgpack package is installed.
+"""
+from typing import Optional
+
+from flask import current_app, request
+
+from app.json_provider import encode_default
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+MSGPACK_MIMETYPE = "application/x-msgpack"
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, "application/msgpack", "application/vnd.msgpack")
+
+# Extension type codes: column-wise list of records, dictionary-encoded column
+COLUMNAR_EXT = 1
+DICTIONARY_EXT = 2
+
+
+def msgpack_enabled() -> bool:
+    return msgpack is not None and current_app.config.get("MSGPACK_ENABLED", True)
+
+
+def wants_msgpack() -> bool:
+    """True if the client prefers MessagePack over JSON."""
+    if not msgpack_enabled():
+        return False
+    best = request.accept_mimetypes.best_match(["application/json", *MSGPACK_MIMETYPES])
+    return best in MSGPACK_MIMETYPES
+
+
+def representation() -> str:
+    """'msgpack' or 'json': the representation negotiated for this request."""
+    return "msgpack" if wants_msgpack() else "json"
+
+
+def _dictionary(column: list):
+    """Dictionary-encodes a string column if at most half its values are distinct."""
+    if not isinstance(column, list) or not all(value is None or isinstance(value, str) for value in column):
+        return column
+    index = {}
+    codes = [index.setdefault(value, len(index)) for value in column]
+    if len(index) * 2 > len(column):
+        return column
+    return msgpack.ExtType(DICTIONARY_EXT, msgpack.packb([list(index), codes]))
+
+
+def _columnar(rows: list) -> Optional["msgpack.ExtType"]:
+    """Packs a list of same-shaped dicts column-wise, or returns None."""
+    if len(rows) < 2 or not all(isinstance(row, dict) for row in rows):
+        return None
+    fields = tuple(rows[0])
+    if not fields or any(tuple(row) != fields for row in rows):
+        return None
+    # A column of same-shaped dicts (e.g. nested created_by_admin) is itself columnar
+    columns = [_dictionary(_prepare([row[field] for row in rows])) for field in fields]
+    return msgpack.ExtType(COLUMNAR_EXT, msgpack.packb([list(fields), columns], default=encode_default))
+
+
+def _prepare(obj):
+    if isinstance(obj, dict):
+        return {key: _prepare(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        packed = _columnar(obj)
+        if packed is not None:
+            return packed
+        return [_prepare(value) for value in obj]
+    return obj
+
+
+def packb(obj) -> bytes:
+    return msgpack.packb(_prepare(obj), default=encode_default)
+
+
+def _ext_hook(code, data):
+    if code == COLUMNAR_EXT:
+        fields, columns = msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+        return [dict(zip(fields, values)) for values in zip(*columns)]
+    if code == DICTIONARY_EXT:
+        values, codes = msgpack.unpackb(data, raw=False)
+        return [values[i] for i in codes]
+    return msgpack.ExtType(code, data)
+
+
+def unpackb(data: bytes):
+    """Decodes a MessagePack body, expanding columnar lists back to dicts."""
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+
+
+def msgpack_response(body):
+    return current_app.response_class(packb(body), mimetype=MSGPACK_MIMETYPE)
@@ -0,0 +1,224 @@
+# HealthCare App/medml-backend/app/rollups.py
+"""
+Population risk rollups.
+
+risk_rollups holds prediction counts (and score sums) per
+(week, state, facility, disease, risk level), so state/facility analytics
+read a few thousand small rows instead of scanning risk_predictions.
+
+- record_prediction() adds a newly saved prediction to its buckets, in the
+  same transaction, with an INSERT ... ON CONFLICT DO UPDATE per disease,
+- rebuild_risk_rollups() recomputes the whole table from risk_predictions
+  with one INSERT ... SELECT per disease (run rebuild_rollups.py after bulk
+  loads or if the table is ever out of sync),
+- query_rollups() aggregates the rollups with optional filters.
+
+The state is the patient's *current* state_name and the facility is the
+facility_name of the admin who registered the patient; missing values are
+stored as 'Unknown'. Both paths follow this rule: when a patient's state
+changes, update_patient calls move_patient_rollups() so the incremental
+table matches what a rebuild would produce.
+"""
+from datetime import timedelta
+from typing import List, Optional, Sequence
+
+from sqlalchemy import delete, func, insert, literal, select, update
+
+from app.extensions import db
+from app.models import Patient, RiskPrediction, RiskRollup, User, utcnow
+from app.trends import DISEASES, bucket_start
+
+UNKNOWN = 'Unknown'
+
+GROUP_DIMENSIONS = {
+    "week": RiskRollup.week_start,
+    "state": RiskRollup.state_name,
+    "facility": RiskRollup.facility_name,
+    "disease": RiskRollup.disease,
+    "risk_level": RiskRollup.risk_level,
+}
+
+_KEY_COLUMNS = ['week_start', 'state_name', 'facility_name', 'disease', 'risk_level']
+
+
+def week_start(ts) -> str:
+    """Monday of the week containing `ts`, as 'YYYY-MM-DD' (same as the SQL bucket)."""
+    day = ts.date()
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def _upsert_insert():
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        raise RuntimeError(f"Risk rollups need an upsert-capable database, not {dialect}")
+    return dialect_insert(RiskRollup)
+
+
+def record_prediction(prediction: RiskPrediction, patient: Optional[Patient] = None):
+    """
+    Adds a new prediction to the rollups. Runs in the caller's transaction;
+    the caller commits.
+    """
+    patient = patient or prediction.patient
+    state = patient.state_name or UNKNOWN
+    facility = _facility_of(patient)
+    week = week_start(prediction.predicted_at or utcnow())
+
+    rows = []
+    for disease in DISEASES:
+        level = getattr(prediction, f"{disease}_risk_level")
+        if level is None:
+            continue
+        rows.append({
+            "week_start": week,
+            "state_name": state,
+            "facility_name": facility,
+            "disease": disease,
+            "risk_level": level,
+            "prediction_count": 1,
+            "score_sum": getattr(prediction, f"{disease}_risk_score") or 0.0,
+        })
+    if not rows:
+        return
+
+    stmt = _upsert_insert().values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=_KEY_COLUMNS,
+        set_={
+            "prediction_count": RiskRollup.prediction_count + stmt.excluded.prediction_count,
+            "score_sum": RiskRollup.score_sum + stmt.excluded.score_sum,
+        },
+    )
+    db.session.execute(stmt)
+
+
+def _facility_of(patient: Patient) -> str:
+    admin = patient.created_by_admin if patient.created_by_admin_id else None
+    return (admin.facility_name if admin else None) or UNKNOWN
+
+
+def move_patient_rollups(patient: Patient, old_state_name: Optional[str]):
+    """
+    Moves all of the patient's predictions from the buckets of its previous
+    state to those of its current one. Runs in the caller's transaction;
+    the caller commits.
+    """
+    old_state = old_state_name or UNKNOWN
+    new_state = patient.state_name or UNKNOWN
+    if old_state == new_state:
+        return
+    facility = _facility_of(patient)
+    week = bucket_start(RiskPrediction.predicted_at, 'week')
+
+    for disease in DISEASES:
+        level = getattr(RiskPrediction, f"{disease}_risk_level")
+        score = getattr(RiskPrediction, f"{disease}_risk_score")
+        buckets = db.session.execute(
+            select(week, level, func.count(), func.coalesce(func.sum(score), 0.0))
+            .where(RiskPrediction.patient_id == patient.id, level.isnot(None))
+            .group_by(week, level)
+        ).all()
+        if not buckets:
+            continue
+        for week_value, level_value, count, score_sum in buckets:
+            db.session.execute(
+                update(RiskRollup)
+                .where(RiskRollup.week_start == week_value, RiskRollup.state_name == old_state,
+                       RiskRollup.facility_name == facility, RiskRollup.disease == disease,
+                       RiskRollup.risk_level == level_value)
+                .values(prediction_count=RiskRollup.prediction_count - count,
+                        score_sum=RiskRollup.score_sum - score_sum)
+            )
+        stmt = _upsert_insert().values([{
+            "week_start": week_value,
+            "state_name": new_state,
+            "facility_name": facility,
+            "disease": disease,
+            "risk_level": level_value,
+            "prediction_count": count,
+            "score_sum": score_sum,
+        } for week_value, level_value, count, score_sum in buckets])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=_KEY_COLUMNS,
+            set_={
+                "prediction_count": RiskRollup.prediction_count + stmt.excluded.prediction_count,
+                "score_sum": RiskRollup.score_sum + stmt.excluded.score_sum,
+            },
+        )
+        db.session.execute(stmt)
+
+    # A rebuild has no empty buckets either
+    db.session.execute(
+        delete(RiskRollup).where(RiskRollup.state_name == old_state, RiskRollup.prediction_count <= 0)
+    )
+
+
+def rebuild_risk_rollups() -> int:
+    """Recomputes risk_rollups from risk_predictions. Commits; returns the row count."""
+    week = bucket_start(RiskPrediction.predicted_at, 'week')
+    state = func.coalesce(func.nullif(Patient.state_name, ''), UNKNOWN)
+    facility = func.coalesce(func.nullif(User.facility_name, ''), UNKNOWN)
+
+    try:
+        db.session.query(RiskRollup).delete(synchronize_session=False)
+        for disease in DISEASES:
+            level = getattr(RiskPrediction, f"{disease}_risk_level")
+            score = getattr(RiskPrediction, f"{disease}_risk_score")
+            source = (
+                select(week, state, facility, literal(disease), level,
+                       func.count(), func.coalesce(func.sum(score), 0.0))
+                .select_from(RiskPrediction)
+                .join(Patient, Patient.id == RiskPrediction.patient_id)
+                .outerjoin(User, User.id == Patient.created_by_admin_id)
+                .where(level.isnot(None))
+                .group_by(week, state, facility, level)
+            )
+            db.session.execute(
+                insert(RiskRollup).from_select(_KEY_COLUMNS + ['prediction_count', 'score_sum'], source)
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return db.session.query(func.count(RiskRollup.id)).scalar()
+
+
+def query_rollups(group_by: Sequence[str] = ("disease", "risk_level"), disease=None, risk_level=None,
+                  state_name=None, facility_name=None, week_from=None, week_to=None) -> List[dict]:
+    """
+    Sums the rollups over the requested dimensions (see GROUP_DIMENSIONS).
+    week_from/week_to are dates; weeks are matched by their Monday.
+    """
+    dims = [GROUP_DIMENSIONS[name].label(name) for name in group_by]
+    query = select(
+        *dims,
+        func.sum(RiskRollup.prediction_count).label('prediction_count'),
+        func.sum(RiskRollup.score_sum).label('score_sum'),
+    )
+    if disease:
+        query = query.where(RiskRollup.disease == disease)
+    if risk_level:
+        query = query.where(RiskRollup.risk_level == risk_level)
+    if state_name:
+        query = query.where(RiskRollup.state_name == state_name)
+    if facility_name:
+        query = query.where(RiskRollup.facility_name == facility_name)
+    if week_from:
+        query = query.where(RiskRollup.week_start >= week_start(week_from))
+    if week_to:
+        query = query.where(RiskRollup.week_start <= week_to.date().isoformat())
+    if dims:
+        query = query.group_by(*dims).order_by(*dims)
+
+    results = []
+    for row in db.session.execute(query):
+        data = {name: row._mapping[name] for name in group_by}
+        count = row.prediction_count or 0
+        data["prediction_count"] = count
+        data["avg_score"] = round(row.score_sum / count, 4) if count else None
+        results.append(data)
+    return results
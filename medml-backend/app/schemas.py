@@ -1,6 +1,7 @@
 # HealthCare App/medml-backend/app/schemas.py
 from pydantic import BaseModel, EmailStr, constr, conint, confloat, validator
-from typing import List, Optional
+from typing import List, Optional, Literal
+from datetime import datetime
 import re  # <-- Import the 're' module
 
 # Regex for password
@@ -146,4 +147,42 @@ class MentalHealthAssessmentSchema(BaseModel):
     depressiveness: bool
     suicidal: bool
     anxiousness: bool
-    sleepiness: bool
\ No newline at end of file
+    sleepiness: bool
+
+# --- Report Schemas ---
+
+DiseaseKey = Literal['diabetes', 'liver', 'heart', 'mental_health']
+RiskLevel = Literal['Low', 'Medium', 'High']
+
+class CohortReportSchema(BaseModel):
+    """ Validates a cohort (batch) report request """
+    disease: Optional[DiseaseKey] = None
+    risk_level: Optional[RiskLevel] = None
+    state_name: Optional[constr(max_length=100)] = None
+    facility_name: Optional[constr(max_length=150)] = None
+    date_from: Optional[datetime] = None # Filters on the latest prediction's predicted_at
+    date_to: Optional[datetime] = None
+    sections: List[str] = ["Overview"]
+    include_recommendations: bool = True
+
+class ShareLinkSchema(BaseModel):
+    """ Validates a share link request """
+    sections: List[str] = []
+    format: Literal['json', 'pdf'] = 'json'
+    expires_in_days: Optional[conint(ge=1)] = None
+
+# --- Offline Upload Schemas ---
+
+class UploadItemSchema(BaseModel):
+    """ One queued write in an offline upload batch """
+    type: Literal['patient', 'assessment']
+    key: Optional[constr(min_length=1, max_length=100)] = None # Idempotency key
+    ref: Optional[constr(min_length=1, max_length=100)] = None # Client reference for a new patient
+    assessment_type: Optional[DiseaseKey] = None
+    patient_id: Optional[int] = None
+    patient_ref: Optional[constr(min_length=1, max_length=100)] = None # ref of a patient created earlier in the queue
+    data: dict
+
+class UploadBatchSchema(BaseModel):
+    """ Validates an offline upload batch """
+    items: List[UploadItemSchema]
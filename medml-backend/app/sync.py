@@ -0,0 +1,200 @@
+# HealthCare App/medml-backend/app/sync.py
+"""
+Delta sync for offline-first clients.
+
+Every insert, update and delete of a synced table (patients, the four
+assessment tables, risk predictions, consultations and consultation notes)
+appends a change_log row in the same transaction, from a session after_flush
+hook. change_log.id is the sync sequence: a client's watermark is the last
+sequence it has applied.
+
+changes_since() returns, for the rows changed after a watermark, their
+current column values (or just their ids if deleted):
+
+- each row appears once per batch, however often it changed,
+- batches hold at most `limit` rows, ordered by sequence, and the sync is
+  pinned to the sequence high-water mark seen by the first batch, so a
+  multi-batch sync converges while new writes keep arriving,
+- the continuation token carries (position, high-water mark); when the last
+  batch is reached the token becomes the client's new watermark.
+
+compact_change_log() drops old entries superseded by a newer entry for the
+same row. Any old watermark stays valid: the newest entry of each row is kept.
+
+Writes that bypass the ORM unit of work (bulk query.update()/delete()) are
+not logged.
+"""
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, literal, select
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import (
+    Patient, DiabetesAssessment, LiverAssessment, HeartAssessment, MentalHealthAssessment,
+    RiskPrediction, Consultation, ConsultationNote, ChangeLogEntry, utcnow
+)
+
+SYNC_MODELS = {
+    model.__tablename__: model
+    for model in (
+        Patient, DiabetesAssessment, LiverAssessment, HeartAssessment, MentalHealthAssessment,
+        RiskPrediction, Consultation, ConsultationNote,
+    )
+}
+
+# Never leave the server
+EXCLUDED_COLUMNS = {"password_hash"}
+
+
+def _patient_id(obj) -> Optional[int]:
+    return obj.id if isinstance(obj, Patient) else getattr(obj, "patient_id", None)
+
+
+def _record_changes(session, flush_context):
+    entries = []
+    changed_at = utcnow()
+    for operation, objects in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            entity = getattr(obj, "__tablename__", None)
+            if entity not in SYNC_MODELS or obj.id is None:
+                continue
+            if operation == "update" and not session.is_modified(obj, include_collections=False):
+                continue
+            entries.append({
+                "entity": entity,
+                "row_id": obj.id,
+                "patient_id": _patient_id(obj),
+                "operation": operation,
+                "changed_at": changed_at,
+            })
+    if entries:
+        # Core insert on the flush's connection: part of the same transaction
+        session.connection().execute(ChangeLogEntry.__table__.insert(), entries)
+
+
+def init_change_tracking():
+    """Registers the change-log hook on all ORM sessions (idempotent)."""
+    if not event.contains(Session, "after_flush", _record_changes):
+        event.listen(Session, "after_flush", _record_changes)
+
+
+def current_sequence() -> int:
+    return db.session.query(func.coalesce(func.max(ChangeLogEntry.id), 0)).scalar()
+
+
+def _changed_rows(since: int, until: int, limit: int, patient_id: Optional[int]):
+    """(entity, row_id, last_seq, last_operation) for rows changed in (since, until], by last_seq."""
+    last_seq = func.max(ChangeLogEntry.id).label("last_seq")
+    grouped = (
+        select(ChangeLogEntry.entity, ChangeLogEntry.row_id, last_seq)
+        .where(ChangeLogEntry.id > since, ChangeLogEntry.id <= until)
+        .group_by(ChangeLogEntry.entity, ChangeLogEntry.row_id)
+    )
+    if patient_id is not None:
+        grouped = grouped.where(ChangeLogEntry.patient_id == patient_id)
+    grouped = grouped.subquery()
+
+    query = (
+        select(grouped.c.entity, grouped.c.row_id, grouped.c.last_seq, ChangeLogEntry.operation)
+        .join(ChangeLogEntry, ChangeLogEntry.id == grouped.c.last_seq)
+        .order_by(grouped.c.last_seq)
+        .limit(limit + 1)
+    )
+    return db.session.execute(query).all()
+
+
+def _load_rows(entity: str, ids: List[int]) -> List[dict]:
+    table = SYNC_MODELS[entity].__table__
+    columns = [column for column in table.columns if column.name not in EXCLUDED_COLUMNS]
+    result = db.session.execute(select(*columns).where(table.c.id.in_(ids)).order_by(table.c.id))
+    return [dict(row._mapping) for row in result]
+
+
+def changes_since(since: int, limit: int, until: Optional[int] = None,
+                  patient_id: Optional[int] = None) -> Tuple[dict, bool, int, int]:
+    """
+    One batch of changes after sequence `since`, up to the high-water mark
+    `until` (the current sequence if None). patient_id limits the batch to one
+    patient's records.
+
+    Returns (batch, has_more, position, until) where batch is
+    {"changes": {entity: [rows]}, "deleted": {entity: [ids]}} and position is
+    the sequence to resume from.
+    """
+    if until is None:
+        until = current_sequence()
+    rows = _changed_rows(since, until, limit, patient_id)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    upserts: Dict[str, List[int]] = {}
+    deleted: Dict[str, List[int]] = {}
+    for row in rows:
+        target = deleted if row.operation == "delete" else upserts
+        target.setdefault(row.entity, []).append(row.row_id)
+
+    changes = {}
+    for entity, ids in upserts.items():
+        loaded = _load_rows(entity, ids)
+        # Rows deleted without a logged delete (e.g. bulk deletes) are reported as deleted
+        missing = set(ids) - {r["id"] for r in loaded}
+        if missing:
+            deleted.setdefault(entity, []).extend(sorted(missing))
+        if loaded:
+            changes[entity] = loaded
+
+    position = rows[-1].last_seq if has_more else until
+    return {"changes": changes, "deleted": deleted}, has_more, position, until
+
+
+def compact_change_log(older_than_days: int) -> int:
+    """Deletes entries older than the cutoff that a newer entry for the same row supersedes. Commits."""
+    cutoff = utcnow() - timedelta(days=older_than_days)
+    latest = (
+        select(func.max(ChangeLogEntry.id))
+        .group_by(ChangeLogEntry.entity, ChangeLogEntry.row_id)
+    )
+    try:
+        removed = (
+            db.session.query(ChangeLogEntry)
+            .filter(ChangeLogEntry.changed_at < cutoff, ChangeLogEntry.id.notin_(latest))
+            .delete(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return removed
+
+
+def backfill_change_log() -> int:
+    """
+    Logs an 'insert' for every existing synced row that has no change_log
+    entry yet, so a first sync (since=0) returns the whole registry. Commits;
+    returns the number of entries added.
+    """
+    added = 0
+    now = utcnow()
+    try:
+        for entity, model in SYNC_MODELS.items():
+            logged = select(ChangeLogEntry.row_id).where(ChangeLogEntry.entity == entity)
+            patient_column = model.id if model is Patient else model.patient_id
+            source = (
+                select(model.id.label("row_id"), patient_column.label("patient_id"),
+                       literal(entity), literal("insert"), literal(now))
+                .where(model.id.notin_(logged))
+                .order_by(model.id)
+            )
+            result = db.session.execute(
+                ChangeLogEntry.__table__.insert().from_select(
+                    ["row_id", "patient_id", "entity", "operation", "changed_at"], source
+                )
+            )
+            added += result.rowcount or 0
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return added
@@ -0,0 +1,76 @@
+# HealthCare App/medml-backend/app/tasks.py
+"""
+Background job tasks (see app.jobs). Imported by create_app so the task
+registry is the same in the web app and in job_worker.py processes.
+"""
+from flask import current_app
+
+from app.extensions import db
+from app.jobs import task, enqueue, PermanentJobError
+from app.models import Patient
+from app.report_jobs import render_report_job
+from app.api.predict import _run_and_save_prediction
+from app.api.recommendations import recommendations_for
+
+
+@task('predictions.run', lane='high')
+def run_prediction_job(patient_id):
+    """Scores the patient's latest assessments and saves a new prediction."""
+    if db.session.get(Patient, patient_id) is None:
+        raise PermanentJobError("Patient not found")
+    try:
+        prediction = _run_and_save_prediction(patient_id)
+    except ValueError as e:
+        # Missing assessments: retrying will not help
+        raise PermanentJobError(str(e))
+    return {"prediction_id": prediction.id, "predictions": prediction.to_dict()}
+
+
+@task('predictions.auto_score', lane='high')
+def auto_score_job(patient_id):
+    """Scores the patient after new assessments; skipped until all four assessment types exist."""
+    if db.session.get(Patient, patient_id) is None:
+        raise PermanentJobError("Patient not found")
+    try:
+        prediction = _run_and_save_prediction(patient_id)
+    except ValueError as e:
+        return {"skipped": str(e)}
+    return {"prediction_id": prediction.id, "predictions": prediction.to_dict()}
+
+
+def schedule_auto_scoring(patient_id: int, identity=None):
+    """
+    Queues (or postpones) the patient's auto-scoring run in the caller's
+    transaction, if AUTO_SCORE_ENABLED. Assessments submitted within
+    AUTO_SCORE_DELAY_SECONDS of each other are scored once, at most
+    AUTO_SCORE_MAX_DELAY_SECONDS after the first.
+    """
+    if not current_app.config.get('AUTO_SCORE_ENABLED'):
+        return None
+    return enqueue(
+        'predictions.auto_score', {"patient_id": patient_id},
+        delay=current_app.config.get('AUTO_SCORE_DELAY_SECONDS', 10),
+        max_delay=current_app.config.get('AUTO_SCORE_MAX_DELAY_SECONDS', 120),
+        debounce=True,
+        unique_key=f"predictions.auto_score:{patient_id}",
+        patient_id=patient_id,
+        identity=identity,
+    )
+
+
+@task('recommendations.generate', lane='default')
+def generate_recommendations_job(patient_id):
+    """Asks Gemini for lifestyle recommendations for the patient's latest risk levels."""
+    patient = db.session.get(Patient, patient_id)
+    if patient is None:
+        raise PermanentJobError("Patient not found")
+    return recommendations_for(patient.risk_predictions.first())
+
+
+@task('reports.render', lane='low', max_attempts=1)
+def render_report_job_task(report_job_id):
+    """Renders an async report job's PDF; the report job records its own failure."""
+    status = render_report_job(report_job_id)
+    if status is None:
+        raise PermanentJobError("Report job not found")
+    return {"report_job_id": report_job_id, "status": status}
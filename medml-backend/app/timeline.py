@@ -0,0 +1,154 @@
+# HealthCare App/medml-backend/app/timeline.py
+"""
+Chronological patient timeline.
+
+Assessments, risk predictions, consultations and consultation notes live in
+seven tables. The timeline merges them with a single UNION ALL query:
+
+- every branch is filtered by patient and ordered by its own
+  (patient_id, <timestamp>, id) index, and limited to one page, so no branch
+  reads more than `limit + 1` rows however long the history is,
+- the outer query orders the merged rows by (occurred_at, event_type, id)
+  descending and keeps one page.
+
+Paging is by keyset: the cursor is the (occurred_at, event_type, id) of the
+last event returned. occurred_at is carried as the text SQLite stores, so the
+comparison matches the stored value exactly.
+"""
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import String, cast, func, literal, null, select, tuple_, type_coerce, union_all
+
+from app.extensions import db
+from app.models import (
+    DiabetesAssessment, LiverAssessment, HeartAssessment, MentalHealthAssessment,
+    RiskPrediction, Consultation, ConsultationNote
+)
+
+
+def _text(column):
+    return func.coalesce(cast(column, String), '-')
+
+
+def _risk_summary():
+    parts = []
+    for label, key in (("Diabetes", "diabetes"), ("Liver", "liver"), ("Heart", "heart"), ("Mental health", "mental_health")):
+        if parts:
+            parts.append(literal(", "))
+        parts.extend([literal(f"{label} "), _text(getattr(RiskPrediction, f"{key}_risk_level"))])
+    return _concat(*parts)
+
+
+def _concat(*parts):
+    expr = parts[0]
+    for part in parts[1:]:
+        expr = expr.op('||')(part)
+    return expr
+
+
+# event_type -> (model, timestamp column, actor column, summary expression)
+TIMELINE_SOURCES = {
+    "diabetes_assessment": (
+        DiabetesAssessment, DiabetesAssessment.assessed_at, DiabetesAssessment.assessed_by_admin_id,
+        lambda: _concat(literal("Glucose "), _text(DiabetesAssessment.glucose),
+                        literal(", BP "), _text(DiabetesAssessment.blood_pressure)),
+    ),
+    "liver_assessment": (
+        LiverAssessment, LiverAssessment.assessed_at, LiverAssessment.assessed_by_admin_id,
+        lambda: _concat(literal("Bilirubin "), _text(LiverAssessment.total_bilirubin),
+                        literal(", ALP "), _text(LiverAssessment.alkaline_phosphatase)),
+    ),
+    "heart_assessment": (
+        HeartAssessment, HeartAssessment.assessed_at, HeartAssessment.assessed_by_admin_id,
+        lambda: _concat(literal("BP "), _text(HeartAssessment.systolic_bp), literal("/"), _text(HeartAssessment.diastolic_bp),
+                        literal(", cholesterol "), _text(HeartAssessment.cholesterol_level)),
+    ),
+    "mental_health_assessment": (
+        MentalHealthAssessment, MentalHealthAssessment.assessed_at, MentalHealthAssessment.assessed_by_admin_id,
+        lambda: _concat(literal("PHQ "), _text(MentalHealthAssessment.phq_score),
+                        literal(", GAD "), _text(MentalHealthAssessment.gad_score)),
+    ),
+    "risk_prediction": (
+        RiskPrediction, RiskPrediction.predicted_at, None,
+        _risk_summary,
+    ),
+    "consultation": (
+        Consultation, Consultation.created_at, Consultation.admin_id,
+        lambda: _concat(_text(Consultation.consultation_type), literal(" for "), _text(Consultation.disease),
+                        literal(" on "), _text(Consultation.consultation_datetime),
+                        literal(" ("), _text(Consultation.status), literal(")")),
+    ),
+    "consultation_note": (
+        ConsultationNote, ConsultationNote.created_at, ConsultationNote.admin_id,
+        lambda: func.substr(ConsultationNote.notes, 1, 200),
+    ),
+}
+
+EVENT_TYPES = tuple(TIMELINE_SOURCES)
+
+
+def _branch(event_type: str, patient_id: int, limit: int, cursor: Optional[Sequence],
+            since: Optional[datetime], until: Optional[datetime]):
+    model, ts_column, actor_column, summary = TIMELINE_SOURCES[event_type]
+    ts_text = type_coerce(ts_column, String)
+
+    query = select(
+        ts_text.label('occurred_at'),
+        literal(event_type).label('event_type'),
+        model.id.label('event_id'),
+        (actor_column if actor_column is not None else null()).label('actor_id'),
+        summary().label('summary'),
+    ).where(model.patient_id == patient_id)
+
+    if since:
+        query = query.where(ts_column >= since)
+    if until:
+        query = query.where(ts_column <= until)
+    if cursor:
+        # Rows after (cursor_ts, cursor_type, cursor_id) in descending order.
+        # event_type is constant per branch, so this reduces to a range on
+        # the branch's own (timestamp, id) index.
+        cursor_ts, cursor_type, cursor_id = cursor
+        if event_type < cursor_type:
+            query = query.where(ts_text <= cursor_ts)
+        elif event_type == cursor_type:
+            query = query.where(tuple_(ts_text, model.id) < tuple_(literal(cursor_ts, String), cursor_id))
+        else:
+            query = query.where(ts_text < cursor_ts)
+
+    return query.order_by(ts_column.desc(), model.id.desc()).limit(limit).subquery()
+
+
+def timeline_page(patient_id: int, limit: int, cursor: Optional[Sequence] = None,
+                  since: Optional[datetime] = None, until: Optional[datetime] = None,
+                  event_types: Sequence[str] = EVENT_TYPES) -> Tuple[List[dict], bool, Optional[tuple]]:
+    """
+    Returns (events, has_more, last_key) for one page of the patient's
+    timeline, newest first. last_key is the raw sort key of the last event,
+    to be encoded as the next cursor.
+    """
+    branches = [
+        select(branch)
+        for branch in (_branch(t, patient_id, limit + 1, cursor, since, until) for t in event_types)
+    ]
+    merged = union_all(*branches).subquery()
+    query = select(merged).order_by(
+        merged.c.occurred_at.desc(), merged.c.event_type.desc(), merged.c.event_id.desc()
+    ).limit(limit + 1)
+
+    rows = db.session.execute(query).all()
+    has_more = len(rows) > limit
+    events = [
+        {
+            "occurred_at": row.occurred_at.replace(' ', 'T') if isinstance(row.occurred_at, str) else row.occurred_at,
+            "event_type": row.event_type,
+            "event_id": row.event_id,
+            "actor_id": row.actor_id,
+            "summary": row.summary,
+        }
+        for row in rows[:limit]
+    ]
+    last = rows[:limit][-1] if events else None
+    last_key = (last.occurred_at, last.event_type, last.event_id) if last else None
+    return events, has_more, last_key
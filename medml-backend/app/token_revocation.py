@@ -0,0 +1,241 @@
+# HealthCare App/medml-backend/app/token_revocation.py
+"""
+Process-local cache of revoked JWT ids in front of the token_blocklist table.
+
+The blocklist check runs on every authenticated request, so instead of a
+SELECT per request each process keeps {jti: expires_at} in memory:
+
+- warmed from the DB at startup (unexpired rows only) plus the signal file,
+- updated locally on logout/refresh,
+- kept in sync across worker processes through an append-only signal file
+  (REVOCATION_SIGNAL_FILE). Revoking appends "<jti> <exp>" to it; every check
+  does one os.stat() and reads any new lines, so a revocation in one worker
+  takes effect in all others on their next request.
+
+Checks never write: expired rows are purged from the DB (and the signal
+file compacted) by `token_maintenance.py --purge`, run from cron. Each
+process only drops expired entries from its own memory, at most once per
+REVOCATION_PURGE_INTERVAL. If the cache cannot be warmed (e.g. the table
+does not exist yet) checks query the DB directly, and the warm is retried
+with exponential backoff (up to REVOCATION_WARM_RETRY_MAX seconds apart)
+rather than on every request.
+"""
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from flask import current_app
+from sqlalchemy import or_
+
+from app.extensions import db
+from app.models import TokenBlocklist, utcnow
+
+
+def _to_epoch(dt: Optional[datetime]) -> Optional[float]:
+    # Blocklist timestamps are naive UTC
+    if dt is None:
+        return None
+    return (dt - datetime(1970, 1, 1)).total_seconds()
+
+
+class RevocationCache:
+    def __init__(self):
+        self._revoked = {}  # jti -> expiry (epoch seconds)
+        self._lock = threading.Lock()
+        self.ready = False
+        self.signal_file = None
+        self._signal_inode = None
+        self._signal_offset = 0
+        self._last_prune = time.monotonic()
+        self.purge_interval = 3600
+        self._warm_failures = 0
+        self._next_warm = 0.0
+        self.warm_retry_max = 300
+        self.fallback_ttl = 30 * 24 * 3600
+
+    # --- Setup ---
+
+    def init_app(self, app):
+        self.signal_file = app.config.get('REVOCATION_SIGNAL_FILE')
+        self.purge_interval = app.config.get('REVOCATION_PURGE_INTERVAL', 3600)
+        self.warm_retry_max = app.config.get('REVOCATION_WARM_RETRY_MAX', 300)
+        self.fallback_ttl = app.config['JWT_REFRESH_TOKEN_EXPIRES'].total_seconds()
+        with app.app_context():
+            self.warm()
+
+    def warm(self) -> bool:
+        """Loads every unexpired revocation from the DB, then replays the signal file."""
+        inode, _ = self._signal_position()
+        try:
+            now = utcnow()
+            rows = db.session.query(
+                TokenBlocklist.jti, TokenBlocklist.expires_at, TokenBlocklist.created_at
+            ).filter(or_(TokenBlocklist.expires_at.is_(None), TokenBlocklist.expires_at > now)).all()
+        except Exception as e:
+            db.session.rollback()
+            self._warm_failures += 1
+            delay = min(2 ** self._warm_failures, self.warm_retry_max)
+            self._next_warm = time.monotonic() + delay
+            current_app.logger.warning(
+                f"Revocation cache not warmed, falling back to DB checks (retry in {delay}s): {e}"
+            )
+            self.ready = False
+            return False
+
+        with self._lock:
+            self._revoked = {jti: self._expiry_for(expires_at, created_at) for jti, expires_at, created_at in rows}
+            # Re-read the (compacted) signal file from the start so nothing
+            # appended while the DB was being read is lost
+            self._signal_inode, self._signal_offset = inode, 0
+            self.ready = True
+            self._warm_failures = 0
+        self._sync_signal_file()
+        current_app.logger.info(f"Revocation cache warmed with {len(rows)} tokens")
+        return True
+
+    def _expiry_for(self, expires_at, created_at=None) -> float:
+        if expires_at is not None:
+            return _to_epoch(expires_at)
+        # Legacy rows without expires_at: keep for the longest token lifetime
+        base = _to_epoch(created_at) if created_at is not None else time.time()
+        return base + self.fallback_ttl
+
+    # --- Cross-process signal file ---
+
+    def _signal_position(self):
+        if not self.signal_file:
+            return None, 0
+        try:
+            st = os.stat(self.signal_file)
+            return st.st_ino, st.st_size
+        except FileNotFoundError:
+            return None, 0
+
+    def _sync_signal_file(self) -> bool:
+        """
+        Reads revocations appended by other processes since the last check.
+        Returns False if the file was compacted and the cache must be re-warmed.
+        """
+        if not self.signal_file:
+            return True
+        inode, size = self._signal_position()
+        if inode is None:
+            return True
+        with self._lock:
+            if inode != self._signal_inode or size < self._signal_offset:
+                # Compacted by another process; lines appended to the old file
+                # just before the swap may be missing, so reload from the DB.
+                return False
+            if size == self._signal_offset:
+                return True
+            with open(self.signal_file, 'r') as f:
+                f.seek(self._signal_offset)
+                data = f.read(size - self._signal_offset)
+            # Only consume complete lines; a partial write is picked up next time
+            consumed = data.rfind('\n') + 1
+            for line in data[:consumed].splitlines():
+                parts = line.split()
+                if len(parts) == 2:
+                    self._revoked[parts[0]] = float(parts[1])
+            self._signal_offset += consumed
+        return True
+
+    def _append_signal(self, jti: str, expires: float):
+        if not self.signal_file:
+            return
+        try:
+            # O_APPEND writes of a single short line are atomic across processes
+            with open(self.signal_file, 'a') as f:
+                f.write(f"{jti} {expires}\n")
+        except OSError as e:
+            current_app.logger.error(f"Could not write revocation signal: {e}")
+
+    # --- Public API ---
+
+    def is_revoked(self, jti: str) -> bool:
+        if not self.ready:
+            if time.monotonic() < self._next_warm or not self.warm():
+                return db.session.query(TokenBlocklist.id).filter(TokenBlocklist.jti == jti).first() is not None
+        if not self._sync_signal_file():
+            self.warm()
+        self._maybe_prune()
+        with self._lock:
+            expires = self._revoked.get(jti)
+        return expires is not None and expires > time.time()
+
+    def add(self, jti: str, expires_at: Optional[datetime]):
+        """Records a revocation that has been committed to token_blocklist."""
+        expires = self._expiry_for(expires_at)
+        with self._lock:
+            self._revoked[jti] = expires
+        self._append_signal(jti, expires)
+
+    def _maybe_prune(self):
+        """Drops expired entries from this process's memory (no DB or file writes)."""
+        if time.monotonic() - self._last_prune < self.purge_interval:
+            return
+        self._last_prune = time.monotonic()
+        cutoff = time.time()
+        with self._lock:
+            self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > cutoff}
+
+    def purge(self) -> int:
+        """
+        Deletes expired blocklist rows, drops them from the cache and compacts
+        the signal file. Maintenance only (token_maintenance.py): not called
+        on requests.
+        """
+        now = utcnow()
+        try:
+            removed = TokenBlocklist.query.filter(or_(
+                TokenBlocklist.expires_at < now,
+                TokenBlocklist.expires_at.is_(None) & (TokenBlocklist.created_at < now - timedelta(seconds=self.fallback_ttl))
+            )).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Token blocklist purge failed: {e}")
+            return 0
+
+        cutoff = time.time()
+        with self._lock:
+            self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > cutoff}
+        self._compact_signal_file(cutoff)
+        if removed:
+            current_app.logger.info(f"Purged {removed} expired tokens from blocklist")
+        return removed
+
+    def _compact_signal_file(self, cutoff: float):
+        """Rewrites the signal file without expired entries."""
+        if not self.signal_file or not os.path.exists(self.signal_file):
+            return
+        tmp_path = f"{self.signal_file}.{os.getpid()}.tmp"
+        try:
+            with open(self.signal_file, 'r') as f:
+                lines = f.read().splitlines()
+            live = [line for line in lines if len(line.split()) == 2 and float(line.split()[1]) > cutoff]
+            if len(live) == len(lines):
+                return
+            with open(tmp_path, 'w') as f:
+                f.writelines(f"{line}\n" for line in live)
+            # Atomic replace gives the file a new inode, which tells other
+            # processes to reload
+            os.replace(tmp_path, self.signal_file)
+            self.warm()
+        except (OSError, ValueError) as e:
+            current_app.logger.warning(f"Could not compact revocation signal file: {e}")
+
+
+revocation_cache = RevocationCache()
+
+
+def revoke_token(jti: str, token_type: str, user_id, expires_at: Optional[datetime]):
+    """
+    Adds a token to the blocklist table and the revocation cache.
+    Commits the session; callers handle rollback on failure.
+    """
+    db.session.add(TokenBlocklist(jti=jti, token_type=token_type, user_id=user_id, expires_at=expires_at))
+    db.session.commit()
+    revocation_cache.add(jti, expires_at)
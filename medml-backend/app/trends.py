@@ -0,0 +1,123 @@
+# HealthCare App/medml-backend/app/trends.py
+"""
+Per-patient risk trends.
+
+Rather than shipping every risk_predictions row to the client, predictions
+are bucketed by week or month in SQL, with min/max/last score and count per
+bucket and disease. The (small) bucketed series is then post-processed with
+NumPy: a trailing moving average for charting and a least-squares slope.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func, select, case
+
+from app.extensions import db
+from app.models import RiskPrediction
+
+DISEASES = ('diabetes', 'liver', 'heart', 'mental_health')
+
+BUCKETS = {
+    # bucket -> length in days, used to express the slope per bucket
+    'week': 7.0,
+    'month': 30.4375,
+}
+
+
+def bucket_start(column, bucket: str):
+    """SQL expression for the start date of the week (Monday) or month containing `column`."""
+    if db.engine.dialect.name == 'sqlite':
+        if bucket == 'week':
+            # Step back to the Monday on or before the date
+            return func.date(column, '-6 days', 'weekday 1')
+        return func.date(column, 'start of month')
+    return func.date(func.date_trunc(bucket, column))
+
+
+def _bucketed_rows(patient_id: int, bucket: str, since=None, until=None):
+    """
+    One row per bucket with count, and min/max/last score per disease.
+    "last" is the most recent non-null score in the bucket.
+    """
+    bucket_col = bucket_start(RiskPrediction.predicted_at, bucket).label('bucket_start')
+
+    inner_cols = [bucket_col]
+    for disease in DISEASES:
+        score = getattr(RiskPrediction, f"{disease}_risk_score")
+        inner_cols.append(score.label(disease))
+        inner_cols.append(
+            func.first_value(score).over(
+                partition_by=bucket_col,
+                order_by=[case((score.is_(None), 1), else_=0), RiskPrediction.predicted_at.desc(), RiskPrediction.id.desc()],
+            ).label(f"{disease}_last")
+        )
+
+    inner = select(*inner_cols).where(RiskPrediction.patient_id == patient_id)
+    if since:
+        inner = inner.where(RiskPrediction.predicted_at >= since)
+    if until:
+        inner = inner.where(RiskPrediction.predicted_at <= until)
+    inner = inner.subquery()
+
+    outer_cols = [inner.c.bucket_start, func.count().label('count')]
+    for disease in DISEASES:
+        outer_cols += [
+            func.min(inner.c[disease]).label(f"{disease}_min"),
+            func.max(inner.c[disease]).label(f"{disease}_max"),
+            func.max(inner.c[f"{disease}_last"]).label(f"{disease}_last"),
+            func.count(inner.c[disease]).label(f"{disease}_count"),
+        ]
+    query = select(*outer_cols).group_by(inner.c.bucket_start).order_by(inner.c.bucket_start)
+    return db.session.execute(query).all()
+
+
+def _moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing moving average; the first points average over what is available."""
+    csum = np.cumsum(np.insert(values, 0, 0.0))
+    idx = np.arange(1, len(values) + 1)
+    lo = np.maximum(idx - window, 0)
+    return (csum[idx] - csum[lo]) / (idx - lo)
+
+
+def _slope_per_bucket(days: np.ndarray, values: np.ndarray, bucket: str) -> Optional[float]:
+    if len(values) < 2:
+        return None
+    slope_per_day = np.polyfit(days, values, 1)[0]
+    return float(slope_per_day * BUCKETS[bucket])
+
+
+def risk_trend(patient_id: int, bucket: str = 'month', diseases=DISEASES, since=None, until=None,
+               window: int = 3) -> Dict[str, dict]:
+    """
+    Returns {disease: {"points": [...], "slope": float|None}} where slope is
+    the change in risk score per bucket, fitted over each bucket's last score.
+    """
+    rows = _bucketed_rows(patient_id, bucket, since, until)
+    series = {}
+    for disease in diseases:
+        points: List[dict] = []
+        for row in rows:
+            if not row._mapping[f"{disease}_count"]:
+                continue
+            points.append({
+                "bucket_start": str(row.bucket_start),
+                "count": row._mapping[f"{disease}_count"],
+                "min": row._mapping[f"{disease}_min"],
+                "max": row._mapping[f"{disease}_max"],
+                "last": row._mapping[f"{disease}_last"],
+            })
+
+        slope = None
+        if points:
+            last = np.array([p["last"] for p in points], dtype=float)
+            starts = np.array([np.datetime64(p["bucket_start"], 'D') for p in points])
+            days = (starts - starts[0]).astype(float)
+            for point, smoothed in zip(points, np.round(_moving_average(last, window), 4)):
+                point["smoothed"] = float(smoothed)
+            slope = _slope_per_bucket(days, last, bucket)
+
+        series[disease] = {
+            "points": points,
+            "slope": round(slope, 6) if slope is not None else None,
+        }
+    return series
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON serialization and response compression on the heaviest
+endpoints (patient directory, full patient record, timeline, directory export).
+
+For each endpoint it reports:
+- encode CPU time of the response body with the stdlib and orjson providers,
+- end-to-end request CPU time with each provider,
+- bytes on the wire: identity, gzip and (if installed) brotli,
+- for JSON endpoints, the MessagePack (columnar) size, raw and gzipped.
+
+By default it seeds a throwaway in-memory database; --use-db benchmarks the
+configured database instead (log in with an existing admin account):
+
+    python benchmark_serialization.py --patients 300 --history 10
+    python benchmark_serialization.py --use-db --username admin --password '...'
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from app import create_app
+from app.compression import brotli, compress_bytes
+from app.extensions import db, limiter
+from app.json_provider import JSON_PROVIDERS, orjson
+from app.representations import MSGPACK_MIMETYPE, msgpack
+from app.models import User
+
+SEED_ASSESSMENTS = {
+    'diabetes': dict(pregnancy=False, glucose=150, blood_pressure=80, skin_thickness=20, insulin=80,
+                     diabetes_history=True),
+    'liver': dict(total_bilirubin=1.0, direct_bilirubin=0.3, alkaline_phosphatase=200,
+                  sgpt_alamine_aminotransferase=40, sgot_aspartate_aminotransferase=40,
+                  total_protein=7.0, albumin=3.5),
+    'heart': dict(diabetes=True, hypertension=False, obesity=False, smoking=True, alcohol_consumption=False,
+                  physical_activity=True, cholesterol_level=220, systolic_bp=130, diastolic_bp=85,
+                  family_history=False, heart_attack_history=False),
+    'mental_health': dict(phq_score=12, gad_score=8, depressiveness=True, suicidal=False, anxiousness=True,
+                          sleepiness=False),
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark JSON providers and response compression.")
+    parser.add_argument('--use-db', action='store_true', help="Benchmark the configured database instead of seeding one")
+    parser.add_argument('--username', default='admin', help="Admin username (with --use-db)")
+    parser.add_argument('--password', default=None, help="Admin password (with --use-db)")
+    parser.add_argument('--patients', type=int, default=200, help="Patients to seed")
+    parser.add_argument('--history', type=int, default=5, help="Assessments of each type per seeded patient")
+    parser.add_argument('--repeat', type=int, default=20, help="Timed repetitions per measurement")
+    return parser.parse_args()
+
+def seed(client, headers, patients, history):
+    """Creates patients with `history` assessments of each type through the API."""
+    for i in range(patients):
+        r = client.post('/api/v1/patients', headers=headers, json=dict(
+            name=f'Benchmark Patient {i}', age=30 + i % 50, gender='Female' if i % 2 else 'Male',
+            height=150 + i % 40, weight=50 + i % 45, abha_id=f'{90000000000000 + i}',
+            state_name='Karnataka', password='Password123!'))
+        if r.status_code != 201:
+            raise RuntimeError(f"Seeding failed: HTTP {r.status_code} {r.get_data(as_text=True)[:200]}")
+        patient_id = r.get_json()['patient_id']
+        for _ in range(history):
+            for kind, payload in SEED_ASSESSMENTS.items():
+                client.post(f'/api/v1/patients/{patient_id}/assessments/{kind}', headers=headers, json=payload)
+
+def login(client, username, password):
+    r = client.post('/api/v1/auth/admin/login', json={'username': username, 'password': password})
+    if r.status_code != 200:
+        raise RuntimeError(f"Login failed: {r.get_json()}")
+    return {'Authorization': f"Bearer {r.get_json()['access_token']}"}
+
+def first_patient(client, headers):
+    r = client.get('/api/v1/patients', headers=headers)
+    items = r.get_json().get('data') or []
+    return items[0]['patient_id'] if items else None
+
+def cpu_ms(fn, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - started) * 1000.0 / repeat
+
+def wire_sizes(body):
+    sizes = {'identity': len(body), 'gzip': len(compress_bytes(body, 'gzip'))}
+    if brotli is not None:
+        sizes['br'] = len(compress_bytes(body, 'br'))
+    return sizes
+
+def benchmark_endpoint(app, client, headers, label, url, query, repeat):
+    providers = {name: cls(app) for name, cls in JSON_PROVIDERS.items() if name != 'orjson' or orjson is not None}
+    get = lambda: client.get(url, headers={**headers, 'Accept-Encoding': 'identity'}, query_string=query)
+
+    response = get()
+    if response.status_code != 200:
+        print(f"  {label}: HTTP {response.status_code}, skipped")
+        return
+    body = response.get_data()
+    payload = response.get_json() if response.is_json else None
+
+    print(f"\n{label}  ({url})")
+    if payload is not None:
+        for name, provider in providers.items():
+            encode = cpu_ms(lambda: provider.dumps(payload), repeat)
+            app.json = provider
+            request_ms = cpu_ms(get, repeat)
+            print(f"  {name:8s} encode {encode:8.2f} ms   request {request_ms:8.2f} ms")
+    else:
+        print(f"  request  {cpu_ms(get, repeat):8.2f} ms")
+
+    sizes = wire_sizes(body)
+    print("  wire     " + "   ".join(
+        f"{name} {size / 1024:.1f} KiB ({sizes['identity'] / size:.1f}x)" for name, size in sizes.items()))
+
+    if payload is not None and msgpack is not None:
+        packed = client.get(url, headers={**headers, 'Accept': MSGPACK_MIMETYPE, 'Accept-Encoding': 'identity'},
+                            query_string=query).get_data()
+        gzipped = len(compress_bytes(packed, 'gzip'))
+        print(f"  msgpack  {len(packed) / 1024:.1f} KiB ({len(body) / len(packed):.1f}x)   "
+              f"msgpack+gzip {gzipped / 1024:.1f} KiB ({len(body) / gzipped:.1f}x)")
+
+def run_benchmark(args):
+    app = create_app(os.getenv('FLASK_ENV', 'default') if args.use_db else 'testing')
+    limiter.enabled = False # Seeding and repeated requests would trip the rate limits
+    app.config['GEMINI_API_KEY'] = None
+
+    with app.app_context():
+        client = app.test_client()
+        if args.use_db:
+            if not args.password:
+                print("❌ --password is required with --use-db")
+                return False
+            headers = login(client, args.username, args.password)
+        else:
+            db.create_all()
+            admin = User(name='Benchmark Admin', email='bench@example.com', username='bench', facility_name='Benchmark PHC')
+            admin.set_password('Benchmark123!')
+            db.session.add(admin)
+            db.session.commit()
+            headers = login(client, 'bench', 'Benchmark123!')
+            started = time.time()
+            print(f"Seeding {args.patients} patients x {args.history} assessments per type...")
+            seed(client, headers, args.patients, args.history)
+            print(f"Seeded in {time.time() - started:.1f}s")
+
+        patient_id = first_patient(client, headers)
+        endpoints = [
+            ("Patient directory", '/api/v1/patients', {}),
+            ("Directory export (NDJSON)", '/api/v1/patients/export', {'format': 'ndjson'}),
+        ]
+        if patient_id is not None:
+            endpoints += [
+                ("Full patient record", f'/api/v1/patients/{patient_id}', {}),
+                ("Patient timeline", f'/api/v1/patients/{patient_id}/timeline', {'limit': 100}),
+            ]
+        print(f"JSON providers: {', '.join(p for p in JSON_PROVIDERS if p != 'orjson' or orjson)}; "
+              f"brotli {'available' if brotli else 'not installed'}")
+        for label, url, query in endpoints:
+            benchmark_endpoint(app, client, headers, label, url, query, args.repeat)
+    return True
+
+if __name__ == '__main__':
+    if not run_benchmark(parse_args()):
+        sys.exit(1)
@@ -23,6 +23,7 @@ from app.models import (
     Consultation, ConsultationNote, LifestyleRecommendation
 )
 from app.db_seeder import seed_static_recommendations
+from app.rollups import rebuild_risk_rollups
 
 # Initialize Faker for realistic data generation
 fake = Faker()
@@ -617,6 +618,7 @@ class ComprehensiveTestDataGenerator:
             
             # Generate risk predictions
             self.generate_risk_predictions(patients)
+            rebuild_risk_rollups()
             
             # Generate consultations and notes
             self.generate_consultations(patients, admin)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Script to export the assessment tables and risk_predictions (joined to patient
+demographics) as Parquet or Arrow files for model retraining.
+
+Exports are incremental: the last exported id per table is kept in a
+watermark file, so re-running only writes rows added since the previous run.
+
+    python export_training_data.py -o exports/
+    python export_training_data.py --tables risk_predictions --format arrow --full
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from app import create_app
+from app.exports import (
+    EXPORT_TABLES, EXPORT_FORMATS, ExportUnavailable,
+    require_pyarrow, current_watermark, count_rows, stream_columnar_export,
+)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export assessment and prediction tables as Parquet/Arrow.")
+    parser.add_argument('--tables', default=",".join(EXPORT_TABLES),
+                        help="Comma-separated tables to export (default: all)")
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='parquet')
+    parser.add_argument('-o', '--output-dir', default='exports', help="Directory for the exported files")
+    parser.add_argument('--watermark-file', default=None,
+                        help="JSON file with the last exported id per table (default: <output-dir>/watermarks.json)")
+    parser.add_argument('--full', action='store_true', help="Ignore watermarks and export every row")
+    parser.add_argument('--batch-rows', type=int, default=None,
+                        help="Rows per row group / record batch (default: EXPORT_BATCH_ROWS)")
+    return parser.parse_args()
+
+def export_training_data(args):
+    """Export each requested table since its watermark."""
+    tables = [t.strip() for t in args.tables.split(',') if t.strip()]
+    unknown = [t for t in tables if t not in EXPORT_TABLES]
+    if unknown:
+        print(f"❌ Unknown tables: {', '.join(unknown)}")
+        return False
+    try:
+        require_pyarrow()
+    except ExportUnavailable as e:
+        print(f"❌ {e}")
+        return False
+
+    app = create_app(os.getenv('FLASK_ENV', 'default'))
+    os.makedirs(args.output_dir, exist_ok=True)
+    watermark_file = args.watermark_file or os.path.join(args.output_dir, 'watermarks.json')
+    watermarks = {}
+    if os.path.exists(watermark_file) and not args.full:
+        with open(watermark_file) as f:
+            watermarks = json.load(f)
+
+    extension = EXPORT_FORMATS[args.format][1]
+    batch_rows = args.batch_rows or app.config.get('EXPORT_BATCH_ROWS', 50000)
+
+    with app.app_context():
+        for table in tables:
+            model = EXPORT_TABLES[table]
+            since_id = watermarks.get(table)
+            watermark = current_watermark(model)
+            rows = count_rows(model, since_id, watermark)
+            if rows == 0:
+                print(f"• {table}: no new rows")
+                continue
+
+            path = os.path.join(args.output_dir, f"{table}_{since_id or 0}_{watermark}.{extension}")
+            started = time.time()
+            tmp_path = f"{path}.part"
+            with open(tmp_path, 'wb') as f:
+                for chunk in stream_columnar_export(model, args.format, since_id, watermark, batch_rows):
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+            print(f"✅ {table}: {rows} rows -> {path} ({time.time() - started:.1f}s)")
+
+            # Only advance the watermark once the file is complete
+            watermarks[table] = watermark
+            with open(watermark_file, 'w') as f:
+                json.dump(watermarks, f, indent=2)
+    return True
+
+if __name__ == '__main__':
+    if not export_training_data(parse_args()):
+        sys.exit(1)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Script to generate PDF reports for a whole cohort of patients into a ZIP file.
+Useful for district health reviews, e.g. every high-risk patient of a facility:
+
+    python generate_cohort_reports.py --risk-level High --facility "PHC Rampur" -o rampur.zip
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+from app import create_app
+from app.reporting import cohort_query, iter_cohort_contexts, iter_rendered_reports, stream_cohort_zip
+from app.services import get_gemini_recommendations
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate PDF reports for a cohort of patients as a ZIP archive.")
+    parser.add_argument('--disease', choices=['diabetes', 'liver', 'heart', 'mental_health'])
+    parser.add_argument('--risk-level', choices=['Low', 'Medium', 'High'])
+    parser.add_argument('--state', dest='state_name')
+    parser.add_argument('--facility', dest='facility_name')
+    parser.add_argument('--from', dest='date_from', type=datetime.fromisoformat,
+                        help="Latest prediction on or after this date (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='date_to', type=datetime.fromisoformat,
+                        help="Latest prediction on or before this date (YYYY-MM-DD)")
+    parser.add_argument('--sections', default="Overview",
+                        help="Comma-separated report sections (default: Overview)")
+    parser.add_argument('--no-recommendations', action='store_true',
+                        help="Skip Gemini lifestyle recommendations")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Rendering processes (default: REPORT_WORKERS / CPU count)")
+    parser.add_argument('-o', '--output', default=None, help="Output ZIP path")
+    return parser.parse_args()
+
+def generate_cohort_reports(args):
+    """Render the cohort and write the ZIP archive to disk."""
+    app = create_app(os.getenv('FLASK_ENV', 'default'))
+    output = args.output or f"Cohort_Reports_{datetime.now().strftime('%Y%m%d_%H%M')}.zip"
+    sections = [s.strip() for s in args.sections.split(',') if s.strip()]
+
+    with app.app_context():
+        query = cohort_query(
+            disease=args.disease,
+            risk_level=args.risk_level,
+            state_name=args.state_name,
+            facility_name=args.facility_name,
+            date_from=args.date_from,
+            date_to=args.date_to,
+        )
+        total = query.count()
+        if total == 0:
+            print("No patients match the given filter.")
+            return False
+
+        print(f"Generating {total} reports into {output}...")
+        started = time.time()
+        done = {"completed": 0, "failed": 0}
+
+        def progress(name, error):
+            done["failed" if error else "completed"] += 1
+            processed = done["completed"] + done["failed"]
+            if error:
+                print(f"\n❌ {name}: {error}")
+            print(f"\r{processed}/{total} ({processed * 100 // total}%)", end="", flush=True)
+
+        contexts = iter_cohort_contexts(
+            query,
+            include_recommendations=not args.no_recommendations,
+            recommend=get_gemini_recommendations,
+        )
+        rendered = iter_rendered_reports(contexts, sections, workers=args.workers or app.config.get('REPORT_WORKERS'))
+
+        with open(output, 'wb') as f:
+            for chunk in stream_cohort_zip(rendered, progress=progress):
+                f.write(chunk)
+
+        print(f"\n✅ {done['completed']} reports written to {output} in {time.time() - started:.1f}s"
+              f" ({done['failed']} failed)")
+    return True
+
+if __name__ == '__main__':
+    if not generate_cohort_reports(parse_args()):
+        sys.exit(1)
@@ -19,6 +19,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
 from app import create_app
 from app.models import db, User, Patient, DiabetesAssessment, LiverAssessment, HeartAssessment, MentalHealthAssessment, RiskPrediction, Consultation, ConsultationNote
 from app.db_seeder import seed_static_recommendations
+from app.rollups import rebuild_risk_rollups
 
 # Initialize Faker for realistic data generation
 fake = Faker()
@@ -551,6 +552,7 @@ class TestDataGenerator:
             
             # Generate risk predictions
             self.generate_risk_predictions(patients)
+            rebuild_risk_rollups()
             
             # Generate consultations and notes
             self.generate_consultations(patients, users)
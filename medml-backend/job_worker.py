@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Script to run background job workers (predictions, Gemini recommendations,
+PDF reports) against the job queue in the app database.
+
+    python job_worker.py                      # JOBS_WORKER_PROCESSES workers, all lanes
+    python job_worker.py --processes 1 --lanes high
+    python job_worker.py --once               # run what is due, then exit
+    python job_worker.py --purge              # delete old finished jobs
+
+Each worker serves its lanes highest first. Start a separate worker with
+--lanes high to keep predictions moving behind a backlog of reports.
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+
+from app import create_app
+from app.extensions import db
+from app.jobs import LANES, JobWorker, purge_finished_jobs
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run background job workers.")
+    parser.add_argument('--processes', type=int, default=None,
+                        help="Worker processes (default: JOBS_WORKER_PROCESSES)")
+    parser.add_argument('--lanes', default=','.join(LANES),
+                        help=f"Comma-separated lanes to serve, highest first (default: {','.join(LANES)})")
+    parser.add_argument('--once', action='store_true', help="Run the jobs that are due, then exit")
+    parser.add_argument('--interval', type=float, default=None,
+                        help="Seconds to sleep when idle (default: JOBS_POLL_INTERVAL)")
+    parser.add_argument('--purge', action='store_true',
+                        help="Delete finished jobs older than JOBS_RETENTION_DAYS, then exit")
+    return parser.parse_args()
+
+def _work(index, lanes, once, interval, stop_event):
+    """Worker process: its own app, engine and session."""
+    if stop_event is not None:
+        # The parent handles Ctrl+C and tells the workers through stop_event
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    app = create_app(os.getenv('FLASK_ENV', 'default'))
+    with app.app_context():
+        worker = JobWorker(
+            lanes=lanes,
+            lease_seconds=app.config.get('JOBS_LEASE_SECONDS', 600),
+            backoff_base=app.config.get('JOBS_BACKOFF_BASE', 10.0),
+            backoff_max=app.config.get('JOBS_BACKOFF_MAX', 3600.0),
+            logger=app.logger,
+        )
+        app.logger.info(f"Job worker {index} ({worker.worker_id}) serving lanes {', '.join(lanes)}")
+        return worker.run(
+            poll_interval=interval or app.config.get('JOBS_POLL_INTERVAL', 1.0),
+            stop=stop_event.is_set if stop_event is not None else None,
+            drain=once,
+        )
+
+def run_workers(args):
+    """Start the worker processes and wait for them (or run the due jobs once)."""
+    app = create_app(os.getenv('FLASK_ENV', 'default'))
+
+    with app.app_context():
+        # Creates the jobs table on databases that predate it
+        db.create_all()
+
+        if args.purge:
+            removed = purge_finished_jobs(app.config.get('JOBS_RETENTION_DAYS', 7))
+            print(f"✅ Purged {removed} finished jobs")
+            return True
+
+        processes = args.processes or app.config.get('JOBS_WORKER_PROCESSES', 2)
+        # Workers open their own connections
+        db.engine.dispose()
+
+    lanes = [lane.strip() for lane in args.lanes.split(',') if lane.strip()]
+    unknown = [lane for lane in lanes if lane not in LANES]
+    if not lanes or unknown:
+        print(f"❌ Unknown lane(s): {', '.join(unknown) or '(none)'}; choose from {', '.join(LANES)}")
+        return False
+    if processes < 1:
+        print("❌ --processes must be at least 1")
+        return False
+
+    if args.once:
+        ran = _work(0, lanes, True, args.interval, None)
+        print(f"✅ Ran {ran} jobs")
+        return True
+
+    stop_event = multiprocessing.Event()
+    workers = [
+        multiprocessing.Process(target=_work, args=(i, lanes, False, args.interval, stop_event),
+                                name=f"job-worker-{i}")
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    print(f"Running {processes} job workers on lanes {', '.join(lanes)} (Ctrl+C to stop)")
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        print("Stopping job workers after their current jobs...")
+        stop_event.set()
+        for worker in workers:
+            worker.join()
+    return all(worker.exitcode == 0 for worker in workers)
+
+if __name__ == '__main__':
+    if not run_workers(parse_args()):
+        sys.exit(1)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Script to deliver transactional outbox events (outbox_events) to the
+configured sinks: a webhook, an NDJSON file and/or a local SQLite queue.
+
+    OUTBOX_SINKS=webhook OUTBOX_WEBHOOK_URL=http://sms-gateway/hooks/medml python outbox_dispatcher.py
+    python outbox_dispatcher.py --sinks file,sqlite_queue --once
+    python outbox_dispatcher.py --prune
+    python outbox_dispatcher.py --drop-cursor webhook   # after removing a sink from OUTBOX_SINKS
+
+Delivery is at-least-once: each sink's position only advances after a batch
+is delivered. Run a single dispatcher per database.
+"""
+
+import argparse
+import os
+import signal
+import sys
+
+from app import create_app
+from app.extensions import db
+from app.outbox import OutboxDispatcher, build_sinks, prune_outbox, drop_outbox_cursor
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Deliver outbox events to downstream sinks.")
+    parser.add_argument('--sinks', default=None, help="Comma-separated sinks (default: OUTBOX_SINKS)")
+    parser.add_argument('--once', action='store_true', help="Deliver what is pending, then exit")
+    parser.add_argument('--interval', type=float, default=None,
+                        help="Seconds to sleep when idle (default: OUTBOX_POLL_INTERVAL)")
+    parser.add_argument('--batch-size', type=int, default=None, help="Events per batch (default: OUTBOX_BATCH_SIZE)")
+    parser.add_argument('--prune', action='store_true',
+                        help="Delete events older than OUTBOX_RETENTION_DAYS that the sinks (--sinks or "
+                             "OUTBOX_SINKS) have delivered, then exit")
+    parser.add_argument('--drop-cursor', metavar='SINK', default=None,
+                        help="Forget the delivery position of a sink that is no longer used, then exit")
+    return parser.parse_args()
+
+def run_dispatcher(args):
+    """Build the sinks and dispatch until interrupted (or once)."""
+    app = create_app(os.getenv('FLASK_ENV', 'default'))
+
+    with app.app_context():
+        # Creates the outbox tables on databases that predate them
+        db.create_all()
+
+        if args.drop_cursor:
+            if not drop_outbox_cursor(args.drop_cursor):
+                print(f"❌ No delivery position stored for sink '{args.drop_cursor}'")
+                return False
+            print(f"✅ Dropped the delivery position of sink '{args.drop_cursor}'")
+            return True
+
+        if args.prune:
+            names = [n.strip() for n in args.sinks.split(',') if n.strip()] if args.sinks else None
+            removed = prune_outbox(app.config.get('OUTBOX_RETENTION_DAYS', 7), names)
+            print(f"✅ Pruned {removed} delivered outbox events")
+            return True
+
+        try:
+            names = [n.strip() for n in args.sinks.split(',') if n.strip()] if args.sinks else None
+            sinks = build_sinks(app.config, names)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return False
+        if not sinks:
+            print("❌ No sinks configured: set OUTBOX_SINKS or pass --sinks")
+            return False
+
+        dispatcher = OutboxDispatcher(
+            sinks,
+            batch_size=args.batch_size or app.config.get('OUTBOX_BATCH_SIZE', 200),
+            logger=app.logger,
+        )
+        try:
+            if args.once:
+                total = 0
+                while True:
+                    delivered = sum(dispatcher.dispatch_once().values())
+                    if not delivered:
+                        break
+                    total += delivered
+                print(f"✅ Dispatched {total} outbox events to {', '.join(s.name for s in sinks)}")
+                return True
+
+            stopping = []
+            signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+            print(f"Dispatching outbox events to {', '.join(s.name for s in sinks)} (Ctrl+C to stop)")
+            try:
+                dispatcher.run(
+                    poll_interval=args.interval or app.config.get('OUTBOX_POLL_INTERVAL', 2.0),
+                    stop=lambda: bool(stopping),
+                )
+            except KeyboardInterrupt:
+                pass
+            return True
+        finally:
+            dispatcher.close()
+
+if __name__ == '__main__':
+    if not run_dispatcher(parse_args()):
+        sys.exit(1)
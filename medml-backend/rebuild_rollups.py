@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Script to rebuild the population risk rollup table (risk_rollups) from
+risk_predictions. Predictions saved through the API update the rollups
+incrementally; run this after bulk imports or to repair the table:
+
+    python rebuild_rollups.py
+"""
+
+import os
+import sys
+import time
+
+from app import create_app
+from app.extensions import db
+from app.rollups import rebuild_risk_rollups
+
+def rebuild_rollups():
+    """Create the rollup table if needed and recompute it."""
+    app = create_app(os.getenv('FLASK_ENV', 'default'))
+
+    with app.app_context():
+        try:
+            # Creates risk_rollups on databases that predate it
+            db.create_all()
+            started = time.time()
+            rows = rebuild_risk_rollups()
+            print(f"✅ Rebuilt risk rollups: {rows} rows in {time.time() - started:.1f}s")
+            return True
+        except Exception as e:
+            print(f"❌ Error rebuilding risk rollups: {e}")
+            return False
+
+if __name__ == '__main__':
+    if not rebuild_rollups():
+        sys.exit(1)
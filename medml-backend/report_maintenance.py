@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Script to maintain asynchronous report jobs (report_jobs table and the PDFs
+under REPORT_ARTIFACT_DIR).
+
+    python report_maintenance.py --fail-stale   # fail jobs queued/running past REPORT_JOB_TIMEOUT_SECONDS
+    python report_maintenance.py --purge        # delete expired jobs and their PDFs
+
+The app already runs both every REPORT_JOB_SWEEP_INTERVAL seconds; use this
+for ad-hoc cleanup, e.g. --fail-stale right after a restart: with the default
+thread backend, jobs queued or running in the old process are gone.
+"""
+
+import argparse
+import os
+import sys
+
+from app import create_app
+from app.extensions import db
+from app.report_jobs import fail_stale_report_jobs, purge_expired_report_jobs
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Maintain asynchronous report jobs.")
+    parser.add_argument('--fail-stale', action='store_true',
+                        help="Mark jobs queued/running longer than REPORT_JOB_TIMEOUT_SECONDS as failed")
+    parser.add_argument('--purge', action='store_true', help="Delete expired jobs and their PDF files")
+    return parser.parse_args()
+
+def report_maintenance(args):
+    """Create the tables if needed, then run the requested maintenance."""
+    if not (args.fail_stale or args.purge):
+        print("Nothing to do: pass --fail-stale and/or --purge")
+        return False
+
+    app = create_app(os.getenv('FLASK_ENV', 'default'))
+
+    with app.app_context():
+        try:
+            db.create_all()
+            if args.fail_stale:
+                failed = fail_stale_report_jobs()
+                print(f"✅ Marked {failed} stale report jobs as failed")
+            if args.purge:
+                removed = purge_expired_report_jobs()
+                print(f"✅ Purged {removed} expired report jobs")
+            return True
+        except Exception as e:
+            print(f"❌ Error maintaining report jobs: {e}")
+            return False
+
+if __name__ == '__main__':
+    if not report_maintenance(parse_args()):
+        sys.exit(1)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Script to maintain the offline-sync tables: the delta-sync change log
+(change_log) and stored idempotency keys (idempotency_keys).
+
+    python sync_maintenance.py --backfill   # log existing rows so a first sync returns them
+    python sync_maintenance.py --compact    # drop superseded entries older than SYNC_COMPACT_AFTER_DAYS
+    python sync_maintenance.py --purge-idempotency-keys   # drop keys older than IDEMPOTENCY_KEY_TTL_HOURS
+
+Run --backfill once after deploying delta sync on an existing database;
+--compact and --purge-idempotency-keys can run from cron.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from app import create_app
+from app.extensions import db
+from app.sync import backfill_change_log, compact_change_log
+from app.idempotency import purge_idempotency_keys
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Maintain the change log and idempotency keys.")
+    parser.add_argument('--backfill', action='store_true', help="Log an insert for every row not yet in the change log")
+    parser.add_argument('--compact', action='store_true', help="Delete superseded entries older than --days")
+    parser.add_argument('--days', type=int, default=None,
+                        help="Age in days for --compact (default: SYNC_COMPACT_AFTER_DAYS)")
+    parser.add_argument('--purge-idempotency-keys', action='store_true',
+                        help="Delete idempotency keys older than IDEMPOTENCY_KEY_TTL_HOURS")
+    return parser.parse_args()
+
+def sync_maintenance(args):
+    """Create the tables if needed, then run the requested maintenance."""
+    if not (args.backfill or args.compact or args.purge_idempotency_keys):
+        print("Nothing to do: pass --backfill, --compact and/or --purge-idempotency-keys")
+        return False
+
+    app = create_app(os.getenv('FLASK_ENV', 'default'))
+
+    with app.app_context():
+        try:
+            # Creates change_log / idempotency_keys on databases that predate them
+            db.create_all()
+            if args.backfill:
+                started = time.time()
+                added = backfill_change_log()
+                print(f"✅ Backfilled change log: {added} entries in {time.time() - started:.1f}s")
+            if args.compact:
+                days = args.days if args.days is not None else app.config.get('SYNC_COMPACT_AFTER_DAYS', 30)
+                removed = compact_change_log(days)
+                print(f"✅ Compacted change log: removed {removed} superseded entries older than {days} days")
+            if args.purge_idempotency_keys:
+                ttl = app.config.get('IDEMPOTENCY_KEY_TTL_HOURS', 24 * 14)
+                removed = purge_idempotency_keys(ttl)
+                print(f"✅ Purged {removed} idempotency keys older than {ttl} hours")
+            return True
+        except Exception as e:
+            print(f"❌ Error maintaining sync tables: {e}")
+            return False
+
+if __name__ == '__main__':
+    if not sync_maintenance(parse_args()):
+        sys.exit(1)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Script to maintain the JWT blocklist (token_blocklist table and the
+REVOCATION_SIGNAL_FILE shared by the app processes).
+
+    python token_maintenance.py --purge   # delete expired revocations, compact the signal file
+
+Run it from cron (e.g. hourly). Requests only read the blocklist; nothing
+else removes expired rows.
+"""
+
+import argparse
+import os
+import sys
+
+from app import create_app
+from app.extensions import db
+from app.token_revocation import revocation_cache
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Maintain the JWT blocklist.")
+    parser.add_argument('--purge', action='store_true',
+                        help="Delete expired revocations and compact the signal file")
+    return parser.parse_args()
+
+def token_maintenance(args):
+    """Create the tables if needed, then run the requested maintenance."""
+    if not args.purge:
+        print("Nothing to do: pass --purge")
+        return False
+
+    app = create_app(os.getenv('FLASK_ENV', 'default'))
+
+    with app.app_context():
+        try:
+            # Creates token_blocklist on databases that predate it
+            db.create_all()
+            removed = revocation_cache.purge()
+            print(f"✅ Purged {removed} expired revocations from the blocklist")
+            return True
+        except Exception as e:
+            print(f"❌ Error maintaining the blocklist: {e}")
+            return False
+
+if __name__ == '__main__':
+    if not token_maintenance(parse_args()):
+        sys.exit(1)
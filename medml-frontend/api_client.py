@@ -1,10 +1,67 @@
+import os
 import streamlit as st
 import requests
 import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import msgpack
+except ImportError:  # Optional: responses are requested as JSON without it
+    msgpack = None
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # Older/newer Streamlit layouts: pool threads run without the session context
+    add_script_run_ctx = get_script_run_ctx = None
 
 # --- FIX: Updated BASE_URL to include /v1 ---
 BASE_URL = "http://127.0.0.1:5000/api/v1"
 
+# --- ADDED: Shared HTTP session ---
+# One pooled session per Streamlit server process: connections to the backend
+# are kept alive and reused across reruns, users and threads.
+HTTP_POOL_SIZE = int(os.environ.get("MEDML_HTTP_POOL_SIZE", 20))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("MEDML_HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.environ.get("MEDML_HTTP_READ_TIMEOUT", 30))
+HTTP_GET_RETRIES = int(os.environ.get("MEDML_HTTP_GET_RETRIES", 3))
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+@st.cache_resource
+def get_http_session():
+    """
+    The process-wide requests.Session. Failed connections are retried for
+    every method (nothing was sent); read errors and 502/503/504 responses
+    only for idempotent methods, with exponential backoff.
+    """
+    retry = Retry(
+        total=HTTP_GET_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # Shared by every user of this process: never keep cookies
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+def _get(url, timeout=DEFAULT_TIMEOUT, **kwargs):
+    return get_http_session().get(url, timeout=timeout, **kwargs)
+
+def _post(url, timeout=DEFAULT_TIMEOUT, **kwargs):
+    return get_http_session().post(url, timeout=timeout, **kwargs)
+
+def _put(url, timeout=DEFAULT_TIMEOUT, **kwargs):
+    return get_http_session().put(url, timeout=timeout, **kwargs)
+
 def get_token():
     """Retrieves the auth token from session state."""
     return st.session_state.get("token")
@@ -17,12 +74,171 @@ def get_auth_headers():
         return headers
     return {}
 
+# --- ADDED: MessagePack payloads ---
+# Compact responses for slow links: set MEDML_PAYLOAD_FORMAT=json to turn off.
+MSGPACK_MIMETYPE = "application/x-msgpack"
+COLUMNAR_EXT = 1  # Column-wise list of records: [field_names, columns]
+DICTIONARY_EXT = 2  # Dictionary-encoded column: [distinct_values, indexes]
+USE_MSGPACK = msgpack is not None and os.environ.get("MEDML_PAYLOAD_FORMAT", "msgpack") == "msgpack"
+
+def get_read_headers():
+    """Authorization headers plus Accept, preferring MessagePack when available."""
+    headers = get_auth_headers()
+    if USE_MSGPACK:
+        headers["Accept"] = f"{MSGPACK_MIMETYPE}, application/json;q=0.9"
+    return headers
+
+def _msgpack_ext_hook(code, data):
+    if code == COLUMNAR_EXT:
+        fields, columns = msgpack.unpackb(data, ext_hook=_msgpack_ext_hook, raw=False, strict_map_key=False)
+        return [dict(zip(fields, values)) for values in zip(*columns)]
+    if code == DICTIONARY_EXT:
+        values, codes = msgpack.unpackb(data, raw=False)
+        return [values[i] for i in codes]
+    return msgpack.ExtType(code, data)
+
+def decode_response(response):
+    """Response body as Python objects, whether it came back as JSON or MessagePack."""
+    if msgpack is not None and response.headers.get("Content-Type", "").startswith(MSGPACK_MIMETYPE):
+        return msgpack.unpackb(response.content, ext_hook=_msgpack_ext_hook, raw=False, strict_map_key=False)
+    return response.json()
+
+# --- ADDED: Conditional GET cache ---
+HTTP_CACHE_ENTRIES = int(os.environ.get("MEDML_HTTP_CACHE_ENTRIES", 200))
+# Fetches of one session may run on several pool threads
+_http_cache_lock = threading.Lock()
+
+def _conditional_get(url, params=None):
+    """
+    GET that revalidates against a per-session response cache: the stored
+    ETag / Last-Modified are sent and a 304 reuses the cached body. The cache
+    keeps the HTTP_CACHE_ENTRIES most recently used responses.
+    Raises requests exceptions like response.raise_for_status().
+    """
+    cache = st.session_state.get("_http_cache")
+    if not isinstance(cache, OrderedDict):
+        cache = st.session_state["_http_cache"] = OrderedDict(cache or {})
+    key = (url, tuple(sorted((params or {}).items())))
+    with _http_cache_lock:
+        cached = cache.get(key)
+        if cached:
+            cache.move_to_end(key)
+
+    headers = get_read_headers()
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    response = _get(url, headers=headers, params=params)
+    if response.status_code == 304 and cached:
+        return cached["body"]
+    response.raise_for_status()
+    body = decode_response(response)
+    if response.headers.get("ETag") or response.headers.get("Last-Modified"):
+        with _http_cache_lock:
+            cache[key] = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "body": body,
+            }
+            cache.move_to_end(key)
+            while len(cache) > HTTP_CACHE_ENTRIES:
+                cache.popitem(last=False)
+    return body
+
+# --- ADDED: Cached reads ---
+# Streamlit reruns the whole page on every interaction. Reads are served from
+# st.cache_data, keyed per user (the token) and per data version; the writes
+# below bump the versions of what they change, which invalidates those
+# entries for every session of this server process. The TTLs bound staleness
+# for changes made elsewhere (another server process, background scoring).
+CACHE_TTL = int(os.environ.get("MEDML_CACHE_TTL", 60))
+CACHE_TTL_RECOMMENDATIONS = int(os.environ.get("MEDML_CACHE_TTL_RECOMMENDATIONS", 600))
+CACHE_MAX_ENTRIES = int(os.environ.get("MEDML_CACHE_MAX_ENTRIES", 2000))
+
+class _DataVersions:
+    """Process-wide counters: 'all' for directory-level data, 'patient:<id>' per patient."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+
+    def get(self, scope):
+        return self._versions.get(scope, 0)
+
+    def bump(self, *scopes):
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+
+@st.cache_resource
+def _data_versions():
+    return _DataVersions()
+
+def invalidate_cache(patient_id=None):
+    """Drops cached reads of the directory and stats, and of one patient's record."""
+    scopes = ["all"] if patient_id is None else ["all", f"patient:{patient_id}"]
+    _data_versions().bump(*scopes)
+
+def _cache_key(patient_id=None):
+    """(token, version) arguments that key a cached read to the user and the data it depends on."""
+    scope = "all" if patient_id is None else f"patient:{patient_id}"
+    return get_token(), _data_versions().get(scope)
+
+def _fetch(url, params, missing_ok):
+    try:
+        return _conditional_get(url, params=dict(params) if params else None)
+    except requests.exceptions.HTTPError as e:
+        if missing_ok and e.response is not None and e.response.status_code == 404:
+            return None
+        raise
+
+# token and version are only part of the cache key; errors are raised, not cached
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_get(url, params, token, version, missing_ok=False):
+    return _fetch(url, params, missing_ok)
+
+@st.cache_data(ttl=CACHE_TTL_RECOMMENDATIONS, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_get_long(url, params, token, version, missing_ok=False):
+    return _fetch(url, params, missing_ok)
+
+# --- ADDED: Concurrent fetches ---
+# Independent reads for one page are issued in parallel on a shared thread
+# pool; each task runs with the calling session's Streamlit context, so it
+# sees the same token, session cache and st.* output.
+FETCH_WORKERS = int(os.environ.get("MEDML_FETCH_WORKERS", 8))
+PREFETCH_COUNT = int(os.environ.get("MEDML_PREFETCH_COUNT", 3))
+
+@st.cache_resource
+def _fetch_pool():
+    return ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="medml-fetch")
+
+def _in_session_context(fn):
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    def run():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return fn()
+    return run
+
+def fetch_concurrently(calls):
+    """
+    Runs independent api_client calls in parallel and returns their results
+    under the same keys. calls: {name: zero-argument callable}, e.g.
+    {"patient": functools.partial(get_patient_details, 7)}.
+    """
+    pool = _fetch_pool()
+    futures = {name: pool.submit(_in_session_context(call)) for name, call in calls.items()}
+    return {name: future.result() for name, future in futures.items()}
+
 # --- Authentication ---
 
 def patient_login(abha_id, password):
     """Logs in a patient."""
     try:
-        response = requests.post(f"{BASE_URL}/auth/patient/login", json={
+        response = _post(f"{BASE_URL}/auth/patient/login", json={
             "abha_id": abha_id,
             "password": password
         })
@@ -42,7 +258,7 @@ def patient_login(abha_id, password):
 def admin_login(username, password):
     """Logs in an admin."""
     try:
-        response = requests.post(f"{BASE_URL}/auth/admin/login", json={
+        response = _post(f"{BASE_URL}/auth/admin/login", json={
             "username": username,
             "password": password
         })
@@ -64,17 +280,30 @@ def admin_login(username, password):
 def get_dashboard_stats():
     """Fetches admin dashboard analytics."""
     try:
-        response = requests.get(f"{BASE_URL}/dashboard/stats", headers=get_auth_headers())
-        response.raise_for_status()
-        return response.json()
+        return _cached_get(f"{BASE_URL}/dashboard/stats", None, *_cache_key())
     except requests.exceptions.RequestException as e:
         st.error(f"Error fetching stats: {e}")
         return None
 
+def get_risk_rollups(group_by=("disease", "risk_level"), **filters):
+    """
+    Fetches population risk counts from the rollup tables.
+    filters: disease, risk_level, state, facility, from, to (ISO dates).
+    """
+    try:
+        params = {"group_by": ",".join(group_by)}
+        params.update({k: v for k, v in filters.items() if v})
+        data = _cached_get(f"{BASE_URL}/dashboard/rollups", tuple(sorted(params.items())), *_cache_key())
+        return data.get("rows", [])
+    except requests.exceptions.RequestException as e:
+        st.error(f"Error fetching risk rollups: {e}")
+        return []
+
 def add_patient(data):
     """Adds a new patient (Step 1)."""
     try:
-        response = requests.post(f"{BASE_URL}/patients", json=data, headers=get_auth_headers())
+        response = _post(f"{BASE_URL}/patients", json=data, headers=get_auth_headers())
+        invalidate_cache()
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -102,13 +331,29 @@ def add_patient(data):
 def update_patient(patient_id, data):
     """Updates an existing patient's basic info."""
     try:
-        response = requests.put(f"{BASE_URL}/patients/{patient_id}", json=data, headers=get_auth_headers())
+        response = _put(f"{BASE_URL}/patients/{patient_id}", json=data, headers=get_auth_headers())
+        invalidate_cache(patient_id)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
         st.error(f"Error updating patient: {e.response.json().get('message', 'Check fields')}")
         return None
 
+def export_patient_directory(fmt="csv"):
+    """
+    Downloads the full patient directory (with latest risk levels) as CSV or
+    NDJSON. The backend streams it; the body is read in chunks.
+    """
+    accept = {"csv": "text/csv", "ndjson": "application/x-ndjson"}[fmt]
+    try:
+        url = f"{BASE_URL}/patients/export"
+        with _get(url, headers={**get_auth_headers(), "Accept": accept}, stream=True) as response:
+            response.raise_for_status()
+            return b"".join(response.iter_content(chunk_size=64 * 1024))
+    except requests.exceptions.RequestException as e:
+        st.error(f"Error exporting patient directory: {e}")
+        return None
+
 def get_patients(category=None, sort=None):
     """Gets a list of registered patients with filters."""
     params = {}
@@ -126,9 +371,7 @@ def get_patients(category=None, sort=None):
         params['sort'] = sort.lower().replace(" ", "_")
         
     try:
-        response = requests.get(f"{BASE_URL}/patients", headers=get_auth_headers(), params=params)
-        response.raise_for_status()
-        data = response.json()
+        data = _cached_get(f"{BASE_URL}/patients", tuple(sorted(params.items())), *_cache_key())
         # Backend may wrap list responses under {"data": [...]} via unified ok()
         if isinstance(data, dict) and 'data' in data and isinstance(data['data'], list):
             return data['data']
@@ -137,13 +380,35 @@ def get_patients(category=None, sort=None):
         st.error(f"Error fetching patients: {e}")
         return []
 
+def get_patient_directory_page(limit=50, cursor=None, sort="-created_at", disease=None, risk_level=None, search=None):
+    """
+    Gets one page of the patient directory table, sorted and filtered by the
+    backend: {"items", "has_more", "next_cursor", "total"}.
+    sort: created_at, name, age or patient_id, '-' prefix for descending.
+    """
+    params = {"limit": limit, "sort": sort}
+    if cursor:
+        params["cursor"] = cursor
+    if disease:
+        params["disease"] = disease
+    if risk_level:
+        params["risk_level"] = risk_level
+    if search:
+        params["q"] = search
+    try:
+        return _cached_get(f"{BASE_URL}/patients/directory", tuple(sorted(params.items())), *_cache_key())
+    except requests.exceptions.RequestException as e:
+        st.error(f"Error fetching patient directory: {e}")
+        return None
+
 # --- Admin: Assessments ---
 
 def add_assessment(patient_id, assessment_type, data):
     """Adds a new assessment for a patient."""
     try:
         url = f"{BASE_URL}/patients/{patient_id}/assessments/{assessment_type}"
-        response = requests.post(url, json=data, headers=get_auth_headers())
+        response = _post(url, json=data, headers=get_auth_headers())
+        invalidate_cache(patient_id)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -154,7 +419,8 @@ def trigger_prediction(patient_id):
     """Triggers the ML prediction pipeline for a patient."""
     try:
         url = f"{BASE_URL}/patients/{patient_id}/predict"
-        response = requests.post(url, headers=get_auth_headers())
+        response = _post(url, headers=get_auth_headers())
+        invalidate_cache(patient_id)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -165,7 +431,8 @@ def retry_prediction(patient_id):
     """Retry ML prediction for a patient."""
     try:
         url = f"{BASE_URL}/patients/{patient_id}/predict"
-        response = requests.post(url, headers=get_auth_headers())
+        response = _post(url, headers=get_auth_headers())
+        invalidate_cache(patient_id)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -183,7 +450,8 @@ def book_consultation(patient_id, disease, risk_level):
     }
     try:
         url = f"{BASE_URL}/consultations"
-        response = requests.post(url, json=data, headers=get_auth_headers())
+        response = _post(url, json=data, headers=get_auth_headers())
+        invalidate_cache(patient_id)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -194,7 +462,8 @@ def add_consultation_notes(patient_id, notes):
     """Adds admin notes for the doctor."""
     try:
         url = f"{BASE_URL}/consultations/notes"
-        response = requests.post(url, json={"patient_id": patient_id, "notes": notes}, headers=get_auth_headers())
+        response = _post(url, json={"patient_id": patient_id, "notes": notes}, headers=get_auth_headers())
+        invalidate_cache(patient_id)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -203,58 +472,201 @@ def add_consultation_notes(patient_id, notes):
 
 # --- Patient & Shared ---
 
-def get_patient_details(patient_id):
-    """Fetches all details for a single patient."""
+def _patient_details_request(patient_id, fields=None, include=None):
+    params = {}
+    if fields:
+        params['fields'] = ",".join(fields)
+    if include:
+        params['include'] = ",".join(include)
+    return f"{BASE_URL}/patients/{patient_id}", tuple(sorted(params.items()))
+
+def get_patient_details(patient_id, fields=None, include=None):
+    """
+    Fetches details for a single patient.
+    `fields` and `include` (lists, e.g. ["name", "bmi"] and
+    ["risk_predictions:5"]) request a sparse payload instead of the full record.
+    """
     try:
-        url = f"{BASE_URL}/patients/{patient_id}"
-        response = requests.get(url, headers=get_auth_headers())
-        response.raise_for_status()
-        return response.json()
+        url, params = _patient_details_request(patient_id, fields, include)
+        return _cached_get(url, params, *_cache_key(patient_id))
     except requests.exceptions.RequestException as e:
         st.error(f"Error fetching patient details: {e}")
         return None
 
+# What the admin patient-detail view shows above its tabs
+DETAIL_VIEW_INCLUDE = ["consultation_notes"]
+
+def _warm_patient_detail(patient_id):
+    try:
+        url, params = _patient_details_request(patient_id, include=DETAIL_VIEW_INCLUDE)
+        _cached_get(url, params, *_cache_key(patient_id))
+        _cached_get(f"{BASE_URL}/patients/{patient_id}/predictions/latest", None,
+                    *_cache_key(patient_id), missing_ok=True)
+    except requests.exceptions.RequestException:
+        pass  # Only a prefetch: the view fetches (and reports errors) itself
+
+def prefetch_patient_details(patient_ids):
+    """
+    Loads the detail view data (record with notes, latest prediction) of
+    these patients into the read cache in the background; returns at once.
+    """
+    pool = _fetch_pool()
+    for patient_id in patient_ids:
+        pool.submit(_in_session_context(lambda patient_id=patient_id: _warm_patient_detail(patient_id)))
+
+def get_patient_dashboard(patient_id, history=20, predictions=5):
+    """
+    Fetches everything the patient dashboard shows in one request:
+    {"patient", "latest_prediction", "recent_predictions", "risk_trend",
+    "recommendations"}. `history` is the number of assessments per type.
+    """
+    try:
+        url = f"{BASE_URL}/patients/{patient_id}/dashboard"
+        params = (("history", history), ("predictions", predictions))
+        return _cached_get(url, params, *_cache_key(patient_id))
+    except requests.exceptions.RequestException as e:
+        st.error(f"Error fetching dashboard: {e}")
+        return None
+
+def get_assessment_history(patient_id, assessment_type, limit=20, cursor=None, since=None):
+    """
+    Fetches one page of a patient's history for one assessment type, newest first.
+    Returns {"items": [...], "has_more": bool, "next_cursor": str|None}.
+    """
+    try:
+        url = f"{BASE_URL}/patients/{patient_id}/assessments/{assessment_type}/history"
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        if since:
+            params["since"] = since.isoformat()
+        response = _get(url, headers=get_read_headers(), params=params)
+        response.raise_for_status()
+        return decode_response(response)
+    except requests.exceptions.RequestException as e:
+        st.error(f"Error fetching assessment history: {e}")
+        return None
+
+def get_patient_timeline(patient_id, limit=20, cursor=None, event_types=None):
+    """
+    Fetches one page of the patient's merged timeline, newest first.
+    Returns {"items": [...], "has_more": bool, "next_cursor": str|None}.
+    """
+    try:
+        url = f"{BASE_URL}/patients/{patient_id}/timeline"
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        if event_types:
+            params["types"] = ",".join(event_types)
+        response = _get(url, headers=get_read_headers(), params=params)
+        response.raise_for_status()
+        return decode_response(response)
+    except requests.exceptions.RequestException as e:
+        st.error(f"Error fetching patient timeline: {e}")
+        return None
+
 def get_latest_prediction(patient_id):
     """Fetches the latest risk prediction for a patient."""
     try:
         url = f"{BASE_URL}/patients/{patient_id}/predictions/latest"
-        response = requests.get(url, headers=get_auth_headers())
-        response.raise_for_status()
-        return response.json()
+        # It's ok if no prediction exists yet (404 -> None, cached too)
+        return _cached_get(url, None, *_cache_key(patient_id), missing_ok=True)
     except requests.exceptions.RequestException as e:
-        # It's ok if no prediction exists yet
-        if e.response.status_code == 404:
-            return None
         st.error(f"Error fetching predictions: {e}")
         return None
 
+def get_risk_trend(patient_id, bucket="month", diseases=None):
+    """
+    Fetches bucketed risk score series per disease (min/max/last/smoothed per
+    bucket plus a slope), instead of the raw prediction history.
+    """
+    try:
+        url = f"{BASE_URL}/patients/{patient_id}/predictions/trend"
+        params = {"bucket": bucket}
+        if diseases:
+            params["diseases"] = ",".join(diseases)
+        return _cached_get(url, tuple(sorted(params.items())), *_cache_key(patient_id)).get("series", {})
+    except requests.exceptions.RequestException as e:
+        st.error(f"Error fetching risk trend: {e}")
+        return {}
+
 def get_recommendations(patient_id):
     """Fetches lifestyle recommendations for a patient."""
     try:
         url = f"{BASE_URL}/patients/{patient_id}/recommendations"
-        response = requests.get(url, headers=get_auth_headers())
-        response.raise_for_status()
-        return response.json()
+        return _cached_get_long(url, None, *_cache_key(patient_id))
     except requests.exceptions.RequestException as e:
         st.error(f"Error fetching recommendations: {e}")
         return {"diet": [], "exercise": [], "sleep": [], "lifestyle": []}
 
-def get_pdf_report(patient_id, sections):
-    """Downloads the patient report as a PDF."""
+def start_pdf_report_job(patient_id, sections):
+    """Queues an asynchronous PDF report job and returns the job dict."""
     try:
         url = f"{BASE_URL}/patients/{patient_id}/report/pdf"
-        response = requests.post(url, json={"sections": sections}, headers=get_auth_headers())
+        response = _post(url, json={"sections": sections, "async": True}, headers=get_auth_headers())
+        response.raise_for_status()
+        return response.json().get("job")
+    except requests.exceptions.RequestException as e:
+        st.error(f"Error queuing PDF report: {e}")
+        return None
+
+def get_report_job(job_id, wait=0):
+    """Fetches the status of a report job, optionally waiting up to `wait` seconds."""
+    try:
+        url = f"{BASE_URL}/reports/jobs/{job_id}"
+        # The backend holds the request open for up to `wait` seconds
+        response = _get(url, params={"wait": wait}, headers=get_auth_headers(),
+                        timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT + wait))
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        st.error(f"Error fetching report status: {e}")
+        return None
+
+def download_report_job(job_id):
+    """Downloads the PDF of a completed report job."""
+    try:
+        url = f"{BASE_URL}/reports/jobs/{job_id}/download"
+        response = _get(url, headers=get_auth_headers())
         response.raise_for_status()
         return response.content
     except requests.exceptions.RequestException as e:
-        st.error(f"Error generating PDF: {e}")
+        st.error(f"Error downloading PDF: {e}")
         return None
 
-def share_patient_details(patient_id, sections):
+def get_pdf_report(patient_id, sections, max_wait=120):
+    """
+    Downloads the patient report as a PDF. The report is rendered as a
+    background job on the backend; this polls until it is ready.
+    """
+    job = start_pdf_report_job(patient_id, sections)
+    if not job:
+        return None
+
+    waited = 0
+    while waited < max_wait:
+        status = get_report_job(job["job_id"], wait=10)
+        if not status:
+            return None
+        if status.get("status") == "completed":
+            return download_report_job(job["job_id"])
+        if status.get("status") == "failed":
+            st.error(f"Error generating PDF: {status.get('error') or 'Unknown error'}")
+            return None
+        waited += 10
+
+    st.error("Report generation is taking longer than expected. Please try again later.")
+    return None
+
+def share_patient_details(patient_id, sections, share_format="json", expires_in_days=None):
     """Requests a backend-generated share link for selected sections."""
+    payload = {"sections": sections, "format": share_format}
+    if expires_in_days:
+        payload["expires_in_days"] = expires_in_days
     try:
         url = f"{BASE_URL}/patients/{patient_id}/share"
-        response = requests.post(url, json={"sections": sections}, headers=get_auth_headers())
+        response = _post(url, json=payload, headers=get_auth_headers())
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
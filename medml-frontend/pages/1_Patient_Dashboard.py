@@ -23,11 +23,13 @@ create_navbar(st.session_state.user_name, st.session_state.user_role)
 if "patient_view" not in st.session_state:
     st.session_state.patient_view = "overview"
 
-# Get patient data
+# Get patient data (profile, history, risk and tips in one request)
 with st.spinner("Loading your health data..."):
-    patient_data = api_client.get_patient_details(st.session_state.user_id)
-    risk_data = api_client.get_latest_prediction(st.session_state.user_id)
-    recommendations = api_client.get_recommendations(st.session_state.user_id)
+    dashboard = api_client.get_patient_dashboard(st.session_state.user_id, history=20) or {}
+    patient_data = dashboard.get("patient")
+    risk_data = dashboard.get("latest_prediction")
+    risk_trend = dashboard.get("risk_trend") or {}
+    recommendations = dashboard.get("recommendations")
 
 if not patient_data:
     st.error("Failed to load patient data. Please try logging in again.")
@@ -249,6 +251,17 @@ def render_disease_tab(disease_name, risk_key, score_key, icon):
         badge_html = utils.create_risk_badge(risk_level)
         st.markdown(f"**Your calculated risk level is:**<br><br>{badge_html}", unsafe_allow_html=True)
     
+    # Risk trend (monthly buckets computed by the backend)
+    trend = (risk_trend or {}).get(score_key.replace("_risk_score", ""), {})
+    if len(trend.get("points", [])) > 1:
+        st.subheader("📈 Your Risk Over Time")
+        trend_df = pd.DataFrame(trend["points"]).set_index("bucket_start")[["last", "smoothed"]]
+        st.line_chart(trend_df.rename(columns={"last": "Monthly score", "smoothed": "Trend"}))
+        slope = trend.get("slope")
+        if slope is not None:
+            direction = "rising" if slope > 0.005 else "falling" if slope < -0.005 else "stable"
+            st.caption(f"Your risk score is {direction} ({slope:+.3f} per month).")
+    
     st.divider()
     
     # Next Recommended Action Steps
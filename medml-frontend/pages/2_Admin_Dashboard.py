@@ -1,5 +1,6 @@
 import streamlit as st
 import time
+from functools import partial
 import api_client
 import utils
 import pandas as pd
@@ -36,14 +37,52 @@ if "edit_patient_data" not in st.session_state:
     st.session_state.edit_patient_data = None
 
 
+HISTORY_TYPES = ("diabetes", "liver", "heart", "mental_health")
+
 # --- Navigation Callbacks ---
 def set_view(view_name):
     st.session_state.admin_view = view_name
     
 def go_to_patient_detail(patient_id):
     st.session_state.view_patient_id = patient_id
+    # Start the assessment history tab from the first page again
+    for a_type in HISTORY_TYPES:
+        st.session_state.pop(f"history_{a_type}", None)
+    st.session_state.pop("patient_timeline", None)
     st.session_state.admin_view = "patient_detail"
 
+# --- Patient directory table ---
+DIRECTORY_PAGE_SIZE = 50
+DIRECTORY_CATEGORIES = {"All Users": None, "Diabetes": "diabetes", "Liver": "liver", "Heart": "heart", "Mental Health": "mental_health"}
+DIRECTORY_RISK_LEVELS = {"Any Risk": None, "High Risk": "High", "Medium Risk": "Medium", "Low Risk": "Low"}
+DIRECTORY_SORTS = {
+    "Recently Added": "-created_at", "Oldest First": "created_at",
+    "Name (A-Z)": "name", "Name (Z-A)": "-name",
+    "Age (Youngest)": "age", "Age (Oldest)": "-age",
+}
+DIRECTORY_TABLE_COLUMNS = {
+    "name": "Name", "abha_id": "ABHA ID", "age": "Age", "gender": "Gender", "state_name": "State",
+    "diabetes_risk_level": "Diabetes", "liver_risk_level": "Liver",
+    "heart_risk_level": "Heart", "mental_health_risk_level": "Mental Health",
+}
+
+def _new_directory_table():
+    # A fresh table key drops the row selection of the previous page
+    st.session_state.directory_table_version = st.session_state.get("directory_table_version", 0) + 1
+
+def reset_directory_paging():
+    st.session_state.directory_cursors = [None]
+    _new_directory_table()
+
+def directory_next_page(cursor):
+    st.session_state.directory_cursors.append(cursor)
+    _new_directory_table()
+
+def directory_previous_page():
+    if len(st.session_state.directory_cursors) > 1:
+        st.session_state.directory_cursors.pop()
+    _new_directory_table()
+
 def go_to_edit_patient(patient_id):
     patient_data = api_client.get_patient_details(patient_id)
     if patient_data:
@@ -417,87 +456,106 @@ elif st.session_state.admin_view == "view_patients":
     
     st.title("👥 Patient Directory")
     
-    # Initialize session state for filters
-    st.session_state.patient_category = st.session_state.get("patient_category", "All Users")
-    st.session_state.patient_sort = st.session_state.get("patient_sort", "Recently Added")
+    # Full directory export (streamed by the backend)
+    if st.button("📥 Prepare CSV Export"):
+        with st.spinner("Exporting patient directory..."):
+            st.session_state.directory_export = api_client.export_patient_directory("csv")
+    if st.session_state.get("directory_export"):
+        st.download_button(
+            "Download Patient Directory (CSV)",
+            data=st.session_state.directory_export,
+            file_name="patient_directory.csv",
+            mime="text/csv",
+        )
     
-    # Filter and Sort Panel
+    # Filtering, sorting and paging happen in the backend: only the current
+    # page is fetched and drawn, as one table widget
     st.subheader("🔍 Filter & Sort")
-    filter_col1, filter_col2 = st.columns(2)
+    filter_col1, filter_col2, filter_col3, filter_col4 = st.columns([2, 2, 2, 3])
     
     with filter_col1:
         category = st.selectbox(
-            "Filter by Condition",
-            ["All Users", "Diabetes", "Liver", "Heart", "Mental Health"],
-            key="category_selector"
+            "Filter by Condition", list(DIRECTORY_CATEGORIES),
+            key="category_selector", on_change=reset_directory_paging
         )
-        st.session_state.patient_category = category
-    
     with filter_col2:
+        risk_option = st.selectbox(
+            "Risk Level", list(DIRECTORY_RISK_LEVELS),
+            key="risk_selector", on_change=reset_directory_paging
+        )
+    with filter_col3:
         sort_option = st.selectbox(
-            "Sort by",
-            ["Recently Added", "High Risk", "Medium Risk", "Low Risk"],
-            key="sort_selector"
+            "Sort by", list(DIRECTORY_SORTS),
+            key="sort_selector", on_change=reset_directory_paging
+        )
+    with filter_col4:
+        search = st.text_input(
+            "Search", placeholder="Name or ABHA ID",
+            key="directory_search", on_change=reset_directory_paging
         )
-        st.session_state.patient_sort = sort_option
     
     st.divider()
     
-    # Get patients data
+    # Cursor of every page visited so far; the last one is on screen
+    cursors = st.session_state.setdefault("directory_cursors", [None])
     with st.spinner("Fetching patient list..."):
-        patients = api_client.get_patients(
-            category=st.session_state.patient_category, 
-            sort=st.session_state.patient_sort
+        page = api_client.get_patient_directory_page(
+            limit=DIRECTORY_PAGE_SIZE,
+            cursor=cursors[-1],
+            sort=DIRECTORY_SORTS[sort_option],
+            disease=DIRECTORY_CATEGORIES[category],
+            risk_level=DIRECTORY_RISK_LEVELS[risk_option],
+            search=search.strip() or None,
         )
     
-    if not patients:
+    if not page or not page.get("items"):
         st.info(f"📭 No patients found for the selected filters.")
     else:
-        st.markdown(f"**Found {len(patients)} patients**")
+        items = page["items"]
+        page_count = max(1, -(-page["total"] // DIRECTORY_PAGE_SIZE))
+        st.markdown(f"**Found {page['total']} patients** · page {len(cursors)} of {page_count}")
+        # Directory order, for prefetching the next profiles from the detail view
+        st.session_state.directory_patient_ids = [p['patient_id'] for p in items]
         
-        # Display patients as clean, native Streamlit components
-        for p in patients:
-            with st.container():
-                st.markdown("---") # Visual separator
-                col1, col2, col3 = st.columns([4, 1, 1])
-                
-                with col1:
-                    st.markdown(
-                        f"<h4 style='margin: 0; color: var(--color-primary);'>👤 {p.get('name', 'N/A').title()}</h4>", 
-                        unsafe_allow_html=True
-                    )
-                    st.markdown(
-                        f"**ABHA ID:** {p.get('abha_id', 'N/A')} | **Age:** {p.get('age', 'N/A')} | **Gender:** {p.get('gender', 'N/A')}"
-                    )
-                    
-                    # Display risk pill if filtered
-                    if st.session_state.patient_category != "All Users":
-                        category_key_map = {
-                            "diabetes": "diabetes_risk_level", "liver": "liver_risk_level",
-                            "heart": "heart_risk_level", "mental health": "mental_health_risk_level",
-                        }
-                        cat_lower = st.session_state.patient_category.lower()
-                        risk_key = category_key_map.get(cat_lower, "")
-                        level = p.get('latest_prediction', {}).get(risk_key, 'N/A')
-                        st.markdown(utils.create_risk_badge(level), unsafe_allow_html=True)
-                
-                with col2:
-                    st.button(
-                        "✏️ Edit",
-                        key=f"edit_{p['patient_id']}",
-                        on_click=go_to_edit_patient,
-                        args=(p['patient_id'],),
-                        use_container_width=True
-                    )
-                with col3:
-                    st.button(
-                        "👁️ View Profile",
-                        key=f"view_{p['patient_id']}",
-                        on_click=go_to_patient_detail,
-                        args=(p['patient_id'],),
-                        use_container_width=True,
-                        type="primary"
-                    )
+        table = pd.DataFrame(items)[list(DIRECTORY_TABLE_COLUMNS)].rename(columns=DIRECTORY_TABLE_COLUMNS)
+        table["Name"] = table["Name"].str.title()
+        selection = st.dataframe(
+            table,
+            key=f"directory_table_{st.session_state.get('directory_table_version', 0)}",
+            on_select="rerun",
+            selection_mode="single-row",
+            hide_index=True,
+            use_container_width=True,
+        )
+        
+        nav_col1, nav_col2, nav_col3 = st.columns([1, 1, 4])
+        with nav_col1:
+            st.button("⬅️ Previous", on_click=directory_previous_page, disabled=len(cursors) == 1, use_container_width=True)
+        with nav_col2:
+            st.button("Next ➡️", on_click=directory_next_page, args=(page.get("next_cursor"),),
+                      disabled=not page.get("has_more"), use_container_width=True)
+        
+        if selection.selection.rows:
+            p = items[selection.selection.rows[0]]
+            st.markdown(f"**Selected:** 👤 {p.get('name', 'N/A').title()} (ABHA ID: {p.get('abha_id', 'N/A')})")
+            action_col1, action_col2, action_col3 = st.columns([1, 1, 4])
+            with action_col1:
+                st.button(
+                    "👁️ View Profile",
+                    on_click=go_to_patient_detail,
+                    args=(p['patient_id'],),
+                    use_container_width=True,
+                    type="primary"
+                )
+            with action_col2:
+                st.button(
+                    "✏️ Edit",
+                    on_click=go_to_edit_patient,
+                    args=(p['patient_id'],),
+                    use_container_width=True
+                )
+        else:
+            st.caption("Select a row to open or edit the patient.")
 
 # --- View: Patient Detail ---
 elif st.session_state.admin_view == "patient_detail":
@@ -507,9 +565,28 @@ elif st.session_state.admin_view == "patient_detail":
     if not patient_id:
         st.error("No patient selected."); st.stop()
         
-    # Get fresh data
-    patient_data = api_client.get_patient_details(patient_id)
-    risk_data = api_client.get_latest_prediction(patient_id)
+    # Get fresh data for the header and every tab in parallel; history and
+    # timeline pages are only fetched when not already held in session state
+    history_since = st.session_state.get(f"history_since_{patient_id}")
+    calls = {
+        "patient": partial(api_client.get_patient_details, patient_id, include=api_client.DETAIL_VIEW_INCLUDE),
+        "risk": partial(api_client.get_latest_prediction, patient_id),
+    }
+    for a_type in HISTORY_TYPES:
+        page_state = st.session_state.get(f"history_{a_type}")
+        if not page_state or page_state["patient_id"] != patient_id or page_state["since"] != history_since:
+            calls[f"history_{a_type}"] = partial(api_client.get_assessment_history, patient_id, a_type, since=history_since)
+    timeline = st.session_state.get("patient_timeline")
+    if not timeline or timeline["patient_id"] != patient_id:
+        calls["timeline"] = partial(api_client.get_patient_timeline, patient_id)
+    fetched = api_client.fetch_concurrently(calls)
+    patient_data, risk_data = fetched["patient"], fetched["risk"]
+
+    # Warm the cache for the next patients in the directory while this one is read
+    directory_ids = st.session_state.get("directory_patient_ids", [])
+    if patient_id in directory_ids:
+        position = directory_ids.index(patient_id)
+        api_client.prefetch_patient_details(directory_ids[position + 1:position + 1 + api_client.PREFETCH_COUNT])
     
     if not patient_data:
         st.error("Failed to load patient data."); st.stop()
@@ -525,7 +602,7 @@ elif st.session_state.admin_view == "patient_detail":
     st.divider()
     
     # --- Main Detail View (Tabs) ---
-    tab1, tab2, tab3 = st.tabs(["🩺 Consult & Act", "📋 Patient Information", "🗂️ Assessment History"])
+    tab1, tab2, tab3, tab4 = st.tabs(["🩺 Consult & Act", "📋 Patient Information", "🗂️ Assessment History", "🕒 Timeline"])
     
     # --- Tab 1: Consult & Act ---
     with tab1:
@@ -539,6 +616,8 @@ elif st.session_state.admin_view == "patient_detail":
                 with st.spinner("🔄 Retrying ML prediction..."):
                     result = api_client.retry_prediction(patient_id)
                     if result:
+                        # The new prediction is a timeline event; reload it from the first page
+                        st.session_state.pop("patient_timeline", None)
                         st.success("✅ Prediction retry successful!"); st.rerun()
                     else:
                         st.error("❌ Prediction retry failed. Check if all assessments are complete.")
@@ -562,6 +641,7 @@ elif st.session_state.admin_view == "patient_detail":
                 with st.spinner(f"Booking consultation for {disease}..."):
                     res = api_client.book_consultation(patient_id, disease, level)
                     if res:
+                        st.session_state.pop("patient_timeline", None)
                         st.session_state.appointment_success = {
                             'disease': disease,
                             'type': 'In-Person (High Risk)' if level == 'High' else 'Teleconsultation (Medium Risk)',
@@ -626,6 +706,7 @@ elif st.session_state.admin_view == "patient_detail":
                     with st.spinner("Saving notes..."):
                         success = api_client.add_consultation_notes(patient_id, notes)
                         if success:
+                            st.session_state.pop("patient_timeline", None)
                             st.success("✅ Notes saved successfully!"); st.rerun()
                         else:
                             st.error("❌ Failed to save notes.")
@@ -661,28 +742,68 @@ elif st.session_state.admin_view == "patient_detail":
     # --- Tab 3: Assessment History ---
     with tab3:
         st.header("🗂️ Patient Assessment History")
-        st.markdown("View all historical assessment data submitted for this patient.")
-        
-        with st.expander("🩺 Diabetes Assessment History", expanded=True):
-            if p.get('diabetes_assessments'):
-                st.dataframe(p['diabetes_assessments'], use_container_width=True)
-            else:
-                st.info("No diabetes assessment data found.")
-                
-        with st.expander("🫀 Liver Assessment History"):
-            if p.get('liver_assessments'):
-                st.dataframe(p['liver_assessments'], use_container_width=True)
-            else:
-                st.info("No liver assessment data found.")
+        st.markdown("View historical assessment data submitted for this patient, newest first.")
+        history_since = st.date_input("Show assessments since", value=None, key=f"history_since_{patient_id}")
 
-        with st.expander("❤️ Heart Assessment History"):
-            if p.get('heart_assessments'):
-                st.dataframe(p['heart_assessments'], use_container_width=True)
-            else:
-                st.info("No heart assessment data found.")
+        history_sections = [
+            ("diabetes", "🩺 Diabetes Assessment History", "diabetes"),
+            ("liver", "🫀 Liver Assessment History", "liver"),
+            ("heart", "❤️ Heart Assessment History", "heart"),
+            ("mental_health", "🧠 Mental Health Assessment History", "mental health"),
+        ]
+        for i, (a_type, title, label) in enumerate(history_sections):
+            with st.expander(title, expanded=(i == 0)):
+                # Pages loaded so far are kept until the patient or date filter changes
+                state_key = f"history_{a_type}"
+                page_state = st.session_state.get(state_key)
+                if not page_state or page_state["patient_id"] != patient_id or page_state["since"] != history_since:
+                    if state_key in fetched:
+                        page = fetched[state_key] or {}
+                    else:
+                        page = api_client.get_assessment_history(patient_id, a_type, since=history_since) or {}
+                    page_state = {
+                        "patient_id": patient_id,
+                        "since": history_since,
+                        "items": page.get("items", []),
+                        "next_cursor": page.get("next_cursor"),
+                    }
+                    st.session_state[state_key] = page_state
 
-        with st.expander("🧠 Mental Health Assessment History"):
-            if p.get('mental_health_assessments'):
-                st.dataframe(p['mental_health_assessments'], use_container_width=True)
-            else:
-                st.info("No mental health assessment data found.")
\ No newline at end of file
+                if page_state["items"]:
+                    st.dataframe(page_state["items"], use_container_width=True)
+                else:
+                    st.info(f"No {label} assessment data found.")
+
+                if page_state["next_cursor"] and st.button("Load more", key=f"history_more_{a_type}"):
+                    page = api_client.get_assessment_history(
+                        patient_id, a_type, cursor=page_state["next_cursor"], since=history_since
+                    ) or {}
+                    page_state["items"] += page.get("items", [])
+                    page_state["next_cursor"] = page.get("next_cursor")
+                    st.rerun()
+
+    # --- Tab 4: Timeline ---
+    with tab4:
+        st.header("🕒 Patient Timeline")
+        st.markdown("Assessments, risk predictions, consultations and notes in one view, newest first.")
+
+        timeline = st.session_state.get("patient_timeline")
+        if not timeline or timeline["patient_id"] != patient_id:
+            page = (fetched["timeline"] if "timeline" in fetched else api_client.get_patient_timeline(patient_id)) or {}
+            timeline = {"patient_id": patient_id, "items": page.get("items", []), "next_cursor": page.get("next_cursor")}
+            st.session_state.patient_timeline = timeline
+
+        if timeline["items"]:
+            st.dataframe(
+                pd.DataFrame(timeline["items"])[["occurred_at", "event_type", "summary"]],
+                use_container_width=True,
+                hide_index=True,
+            )
+        else:
+            st.info("No events recorded for this patient yet.")
+
+        if timeline["next_cursor"] and st.button("Load more", key="timeline_more"):
+            page = api_client.get_patient_timeline(patient_id, cursor=timeline["next_cursor"]) or {}
+            timeline["items"] += page.get("items", [])
+            timeline["next_cursor"] = page.get("next_cursor")
+            st.rerun()
\ No newline at end of file
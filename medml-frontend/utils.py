@@ -45,8 +45,9 @@ def logout():
         "admin_view", "add_user_step", "new_patient_id", "new_patient_name",
         "assessment_status", "view_patient_id", "edit_patient_data",
         "patient_view", "show_pdf_download", "show_share_options",
-        "patient_category", "patient_sort", "appointment_success", 
-        "show_appointment_modal"
+        "directory_cursors", "directory_table_version", "directory_patient_ids", "appointment_success", 
+        "show_appointment_modal", "_http_cache", "directory_export", "patient_timeline",
+        "history_diabetes", "history_liver", "history_heart", "history_mental_health"
     ]
     for key in keys_to_clear:
         if key in st.session_state: